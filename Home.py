@@ -1,10 +1,12 @@
 import streamlit as st
 
+from utils import images
+
 def main():
     st.title("Vietnam War Weaponry and Herbicide")
     st.write("Welcome! This site explores the Vietnam War's weapon and herbicide data.")
     st.write("To explore, click on the sidebar (left) to view the different pages.")
-    st.image("https://www.usni.org/sites/default/files/styles/hero_image/public/Morris-NH-JA-20%201.jpg?itok=zwwjgYdT")
+    images.show("home-hero")
 
 if __name__ == "__main__":
     main()
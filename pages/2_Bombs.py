@@ -1,26 +1,358 @@
+import time
+
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
-import pydeck as pdk
 import altair as alt
 
-def load_data():
-    df = pd.read_csv("data/vietnam_bombing_trimmed.csv", usecols=[
-        "TGTLATDD_DDD_WGS84",
-        "TGTLONDDD_DDD_WGS84",
-        "NUMWEAPONSDELIVERED"
-    ])
+from utils.lazydeps import require
+
+require("pydeck", "PIL")
+import pydeck as pdk
+
+from utils import budget, columnar, deck_binary, hexbin, images, profiling, query, raster, sampling, spatial, store, tiles
+from utils.columnar import DATE, LAT, LON, WEAPONS
+
+SCATTER_BUDGET = 1000
+FRAME_SECONDS = 0.25
+RASTER_PIXELS = 600
+
+# The aggregates come from utils.query, shared with the HTTP service
+# (utils.serve) and cached once per server process in utils.store; cached
+# values must not be mutated.
 
-    df.dropna(subset=["TGTLATDD_DDD_WGS84", "TGTLONDDD_DDD_WGS84"], inplace=True)
-    df["TGTLATDD_DDD_WGS84"] = pd.to_numeric(df["TGTLATDD_DDD_WGS84"], errors="coerce")
-    df["TGTLONDDD_DDD_WGS84"] = pd.to_numeric(df["TGTLONDDD_DDD_WGS84"], errors="coerce")
-    df.dropna(subset=["TGTLATDD_DDD_WGS84", "TGTLONDDD_DDD_WGS84"], inplace=True)
-    df = df.iloc[::10].copy()
+load_bitmaps = query.bitmaps
+load_region = profiling.timed("load_region")(query.strikes)
+load_hex_cells = profiling.timed("load_hex_cells")(query.hex_cells)
+load_histogram = profiling.timed("load_histogram")(query.histogram)
+load_time_cube = profiling.timed("load_time_cube")(query.time_cube)
+
+@profiling.timed()
+@store.cached()
+def load_data(ratio=None, budget=None, region=None, filters=(), version=None):
+    df = load_region((LAT, LON, WEAPONS), region, filters, version)
+    rows, weights = sampling.stratified_sample(df[LAT], df[LON], ratio=ratio, budget=budget)
+    df = df.iloc[rows].copy()
+    df["weight"] = weights
 
     return df
 
+@profiling.timed()
+@store.cached()
+def load_region_extent(region, filters, version):
+    df = load_region((LAT, LON), region, filters, version)
+    return raster.extent_of(df[LAT].to_numpy(), df[LON].to_numpy())
+
+@profiling.timed()
+@store.cached()
+def load_raster(extent, weighted, how, region, filters, version):
+    # Every strike in the region is binned; only the PNG reaches the browser.
+    df = load_region((LAT, LON, WEAPONS), region, filters, version)
+    weights = df[WEAPONS].to_numpy() if weighted else None
+    grid = raster.rasterize(df[LAT].to_numpy(), df[LON].to_numpy(), extent, RASTER_PIXELS, RASTER_PIXELS, weights)
+    return raster.data_url(raster.to_png(raster.shade(grid, how))), float(grid.sum())
+
+def raster_chart(region, filters):
+    # Returns the chart and its caption; the controls are drawn right away.
+    version = columnar.version()
+    west, south, east, north = load_region_extent(region, filters, version)
+    col_shade, col_weight = st.columns(2)
+    how = col_shade.selectbox("Shading", ["log", "eq_hist", "linear"])
+    weighted = col_weight.toggle("Weight by weapons delivered", value=False)
+    if st.toggle("Zoom / pan", value=False):
+        # Re-rasterizes the chosen window at full resolution instead of
+        # stretching the overview image.
+        step = round(max(east - west, north - south) / 200, 3) or 0.001
+        west, east = st.slider("Longitude range", west, east, (west, east), step=step)
+        south, north = st.slider("Latitude range", south, north, (south, north), step=step)
+    extent = (west, south, east, north)
+    url, total = load_raster(extent, weighted, how, region, filters, version)
+
+    image = pd.DataFrame([{"url": url, "west": west, "east": east, "south": south, "north": north}])
+    chart = (
+        alt.Chart(image)
+        .mark_image(aspect=False)
+        .encode(
+            x=alt.X("west:Q", scale=alt.Scale(domain=[west, east], nice=False, zero=False), title="Longitude"),
+            x2="east:Q",
+            y=alt.Y("north:Q", scale=alt.Scale(domain=[south, north], nice=False, zero=False), title="Latitude"),
+            y2="south:Q",
+            url="url:N"
+        )
+        .properties(width="container", height=400)
+    )
+    unit = "weapons delivered" if weighted else "strikes"
+    return chart, f"{total:,.0f} {unit} rasterized to {RASTER_PIXELS}x{RASTER_PIXELS} pixels ({len(url) / 1e3:,.0f} kB)."
+
+def scatter_chart(df):
+    return (
+        alt.Chart(df)
+        .mark_circle(size=60, opacity=0.5)
+        .encode(
+            x=alt.X("TGTLONDDD_DDD_WGS84:Q", title="Longitude"),
+            y=alt.Y("TGTLATDD_DDD_WGS84:Q", title="Latitude"),
+            color=alt.Color("NUMWEAPONSDELIVERED:Q", scale=alt.Scale(scheme="reds"), title="Weapons Delivered"),
+            tooltip=["TGTLATDD_DDD_WGS84", "TGTLONDDD_DDD_WGS84", "NUMWEAPONSDELIVERED"]
+        )
+        .properties(width="container", height=400)
+        .interactive()
+    )
+
+def draw_altair(chart):
+    st.altair_chart(chart, use_container_width=True)
+
+def draw_captioned(spec):
+    chart, caption = spec
+    draw_altair(chart)
+    st.caption(caption)
+
+def draw_html(spec):
+    html, caption = spec
+    components.html(html, height=500)
+    st.caption(caption)
+
+def time_cube_deck(cube, index):
+    frame = cube.frame(index)
+    frame["norm"] = (frame["count"] / max(cube.max_count, 1)).round(3)
+    # Half the cell diagonal in meters, so square columns tile the grid.
+    radius = cube.cell_deg * 111_320 / 2 ** 0.5
+    layer = pdk.Layer(
+        "ColumnLayer",
+        data=frame,
+        get_position="[lon, lat]",
+        get_elevation="norm * 3000",
+        get_fill_color="[255, 180 - norm * 180, 0, 200]",
+        radius=radius,
+        disk_resolution=4,
+        angle=45,
+        coverage=0.9,
+        elevation_scale=50,
+        extruded=True,
+        pickable=True
+    )
+    return pdk.Deck(
+        initial_view_state=pdk.ViewState(latitude=15.0, longitude=105.0, zoom=5, pitch=45),
+        layers=[layer],
+        tooltip={"text": "Strikes: {count}\nWeapons Delivered: {weapons}"}
+    )
+
+def hex_deck(view_state, region, filters):
+    radius_options = ["Auto"] + [f"{r / 1000:g} km" for r in hexbin.RADII]
+    col_radius, col_height = st.columns(2)
+    radius_choice = col_radius.select_slider("Hex size", options=radius_options, value="Auto")
+    elevation_scale = col_height.slider("Column height", 10, 150, 50, step=10)
+    if radius_choice == "Auto":
+        radius = hexbin.radius_for_zoom(view_state.zoom)
+    else:
+        radius = hexbin.RADII[radius_options.index(radius_choice) - 1]
+
+    cells = load_hex_cells(radius, region, filters, columnar.version())
+
+    hex_layer = pdk.Layer(
+        "ColumnLayer",
+        data=cells,
+        get_position="[lon, lat]",
+        get_elevation="norm * 3000",
+        get_fill_color="[255, 180 - norm * 180, 0, 200]",
+        radius=radius,
+        disk_resolution=6,
+        # deck.gl puts a hexagon's first vertex on the x axis (flat-top);
+        # turned 90 degrees it matches utils.hexbin's pointy-top lattice.
+        angle=90,
+        coverage=0.95,
+        elevation_scale=elevation_scale,
+        extruded=True,
+        pickable=True
+    )
+
+    deck = pdk.Deck(
+        initial_view_state=view_state,
+        layers=[hex_layer],
+        tooltip={"text": "Strikes: {count}\nWeapons Delivered: {weapons}"}
+    )
+    return deck
+
+def tiled_deck(view_state):
+    # Only the tiles under the viewport are fetched: aggregated bins at low
+    # zoom, raw strikes from tiles.RAW_ZOOM on.
+    tile_layer = pdk.Layer(
+        "TileLayer",
+        data=tiles.url_template(),
+        min_zoom=tiles.MIN_ZOOM,
+        max_zoom=tiles.RAW_ZOOM,
+        tile_size=256,
+        point_type="circle",
+        get_point_radius="properties.r",
+        point_radius_units="pixels",
+        get_fill_color="[255, 180 - properties.n * 180, 0, 180]",
+        stroked=False,
+        pickable=True
+    )
+    return pdk.Deck(
+        initial_view_state=view_state,
+        layers=[tile_layer],
+        tooltip={"text": "Strikes: {count}\nWeapons Delivered: {weapons}"}
+    )
+
+def strikes_map(view_state, region, filters, transport="binary"):
+    # Every strike in the region, shipped as float32/uint16 buffers, or as
+    # JSON row objects to compare against; both report their first frame.
+    df = load_region((LAT, LON, WEAPONS), region, filters, columnar.version())
+    view = {"latitude": view_state.latitude, "longitude": view_state.longitude, "zoom": view_state.zoom}
+    html, stats = deck_binary.scatter_html(df[LAT], df[LON], df[WEAPONS], view, transport)
+    return html, (
+        f"{len(df):,} strikes: {stats['bytes'] / 1e6:.1f} MB as {transport}, "
+        f"encoded in {stats['seconds'] * 1000:,.0f} ms."
+    )
+
+def region_selector():
+    options = ["All strikes"] + list(spatial.REGIONS) + ["Custom box"]
+    choice = st.selectbox("Region", options)
+    if choice == "All strikes":
+        return None
+    if choice != "Custom box":
+        return spatial.REGIONS[choice]
+    col_lat, col_lon = st.columns(2)
+    south, north = col_lat.slider("Latitude", 8.0, 24.0, (15.0, 18.0), step=0.1)
+    west, east = col_lon.slider("Longitude", 100.0, 110.0, (105.0, 108.0), step=0.1)
+    return ("bbox", (south, west, north, east))
+
+def filter_selector():
+    # Resolved against the bitmap index, and applied to the map, histogram,
+    # scatter and timeline alike.
+    version = columnar.version()
+    index = load_bitmaps(version)
+    dimensions = [(name, label) for name, label in query.FILTERS if name in index.labels]
+    filters = []
+    with st.expander("Filters"):
+        for col, (name, label) in zip(st.columns(len(dimensions) or 1), dimensions):
+            counts = dict(index.values(name))
+            chosen = col.multiselect(label, list(counts), format_func=lambda value, counts=counts: f"{value} ({counts[value]:,})")
+            if chosen:
+                filters.append((name, tuple(sorted(chosen))))
+        filters = tuple(filters)
+        if filters:
+            started = time.perf_counter()
+            matched = index.count(filters)
+            st.caption(f"{matched:,} of {index.n_rows:,} strikes match ({(time.perf_counter() - started) * 1000:.1f} ms).")
+    return filters
+
+@profiling.fragment("Bombs", "map")
+def map_section(region, filters):
+    view_state = pdk.ViewState(
+        latitude=15.0,
+        longitude=105.0,
+        zoom=5,
+        pitch=45
+    )
+
+    map_modes = ["Auto", "Hex columns"]
+    has_deck = deck_binary.deck_script() is not None
+    if has_deck:
+        map_modes += ["All strikes (binary)", "All strikes (JSON)"]
+    if region is None and not filters and tiles.available(columnar.version()):
+        map_modes.append("Tiled strikes")
+    map_mode = st.radio("Map", map_modes, horizontal=True)
+    if not has_deck:
+        st.caption("Run `python -m utils.bundle` to vendor deck.gl for the all-strikes map modes.")
+
+    strikes = budget.Level("raw", lambda: strikes_map(view_state, region, filters), draw_html)
+    hexes = budget.Level("binned", lambda: hex_deck(view_state, region, filters), st.pydeck_chart)
+    if map_mode == "Auto":
+        # Every strike when the page can afford it, hex columns otherwise.
+        levels = [hexes]
+        if has_deck:
+            rows = len(load_region((LAT,), region, filters, columnar.version()))
+            levels.insert(0, strikes._replace(estimate=deck_binary.html_bytes(rows)))
+        budget.show("map", levels, key=(region, filters))
+    elif map_mode == "All strikes (binary)":
+        budget.show("map", [strikes])
+    elif map_mode == "All strikes (JSON)":
+        budget.show("map", [budget.Level("raw", lambda: strikes_map(view_state, region, filters, "json"), draw_html)])
+    elif map_mode == "Tiled strikes":
+        budget.pydeck_chart("map", tiled_deck(view_state))
+    else:
+        budget.show("map", [hexes])
+
+@profiling.fragment("Bombs", "histogram")
+def histogram_section(region, filters):
+    st.markdown("**Distribution of Weapons Delivered**")
+    log_bins = st.toggle("Log-scaled bins", value=False)
+    bins = load_histogram(log_bins, region, filters, columnar.version())
+    x_scale = alt.Scale(type="symlog") if log_bins else alt.Undefined
+    hist_chart = (
+        alt.Chart(bins)
+        .mark_bar()
+        .encode(
+            x=alt.X("bin_start:Q", scale=x_scale, title="Number of Weapons Delivered (binned)"),
+            x2="bin_end:Q",
+            y=alt.Y("count:Q", title="Frequency"),
+            tooltip=[
+                alt.Tooltip("bin_start:Q", title="From", format=",.0f"),
+                alt.Tooltip("bin_end:Q", title="To", format=",.0f"),
+                alt.Tooltip("count:Q", title="Frequency", format=","),
+            ]
+        )
+        .properties(width="container", height=400)
+        .interactive()
+    )
+    budget.altair_chart("histogram", hist_chart, level="binned")
+
+@profiling.fragment("Bombs", "scatter")
+def scatter_section(region, filters):
+    st.markdown("**Geographic Distribution (2D Scatter)**")
+    scatter_mode = st.radio("Render", ["Auto", "Rasterized (all strikes)", f"Sampled points ({SCATTER_BUDGET:,})"], horizontal=True)
+    version = columnar.version()
+    sampled = budget.Level(
+        "sampled",
+        lambda: scatter_chart(load_data(budget=SCATTER_BUDGET, region=region, filters=filters, version=version)),
+        draw_altair,
+    )
+    rasterized = budget.Level("rasterized", lambda: raster_chart(region, filters), draw_captioned)
+    if scatter_mode == "Auto":
+        # Raw points for small selections, then a sample, then the raster.
+        df = load_region((LAT, LON, WEAPONS), region, filters, version)
+        raw = budget.Level("raw", lambda: scatter_chart(df), draw_altair, estimate=budget.rows_bytes(df))
+        budget.show("scatter", [raw, sampled, rasterized], key=(region, filters))
+    elif scatter_mode.startswith("Rasterized"):
+        budget.show("scatter", [rasterized])
+    else:
+        budget.show("scatter", [sampled])
+
+@profiling.fragment("Bombs")
+def timeline(region, filters):
+    if DATE not in columnar.available():
+        st.info("The loaded dataset has no MSNDATE column, so the timeline is unavailable.")
+        return
+
+    cube = load_time_cube(region, filters, columnar.version())
+    if len(cube) == 0:
+        st.info("No dated strikes match the selected region and filters.")
+        return
+
+    col5, col6 = st.columns([3, 1])
+    with col5:
+        month = st.select_slider("Month", options=cube.labels, value=cube.labels[0])
+    with col6:
+        play = st.button("Play timeline")
+
+    label_slot = st.empty()
+    map_slot = st.empty()
+    if play:
+        for index, label in enumerate(cube.labels):
+            label_slot.caption(label)
+            budget.pydeck_chart("timeline", time_cube_deck(cube, index), slot=map_slot)
+            time.sleep(FRAME_SECONDS)
+    else:
+        budget.pydeck_chart("timeline", time_cube_deck(cube, cube.labels.index(month)), slot=map_slot)
+
+    st.area_chart(cube.totals(), x="month", y="count", height=150)
+
 def main():
     st.set_page_config(page_title="Vietnam War Bombing Map", layout="wide")
-    st.title("3D Visualization of Vietnam War Bombing (Stratified downsample by 50x)")
+    profiling.start("Bombs")
+    budget.start("Bombs")
+    st.title("3D Visualization of Vietnam War Bombing")
 
     st.markdown(""" 
     During the Vietnam War, U.S. bombing campaigns, like Operation Rolling Thunder,
@@ -30,46 +362,28 @@ def main():
     provides geographical context, showing how terrain influenced bombing strategies.
     """)
 
+    if not columnar.has_source():
+        # E.g. a static (stlite) deployment bundled before the data build ran.
+        st.info(
+            f"No bombing data is deployed: neither `{columnar.SOURCE_CSV}` nor prebuilt columns "
+            "were found. Run `python -m utils.build` and then `python -m utils.bundle` to ship them."
+        )
+        return
+
+    region = region_selector()
+    with profiling.section("filters"):
+        filters = filter_selector()
+
     # -------------------------------------------------------------
     # Side-by-Side Layout: Topographical Map and 3D Bombing Map
     # -------------------------------------------------------------
     col1, col2 = st.columns([1, 2])
 
-    with col1:
-        st.image(
-            "https://preview.redd.it/4ovwkaqdqfg61.jpg?auto=webp&s=5fc960c9b4d813cceafc2a71665fe0e2b06f0dff", 
-            caption="Topographical Map of Vietnam", 
-            width=400
-        )
+    with col1, profiling.section("topo image"):
+        images.show("topo-map", caption="Topographical Map of Vietnam", width=400)
 
     with col2:
-        df = load_data()
-
-        view_state = pdk.ViewState(
-            latitude=15.0,
-            longitude=105.0,
-            zoom=5,
-            pitch=45
-        )
-
-        hex_layer = pdk.Layer(
-            "HexagonLayer",
-            data=df,
-            get_position='[TGTLONDDD_DDD_WGS84, TGTLATDD_DDD_WGS84]',
-            radius=2000,
-            elevation_scale=50,
-            elevation_range=[0, 3000],
-            extruded=True,
-            pickable=True
-        )
-
-        deck = pdk.Deck(
-            initial_view_state=view_state,
-            layers=[hex_layer],
-            tooltip={"text": "Weapons Delivered: {NUMWEAPONSDELIVERED}"}
-        )
-
-        st.pydeck_chart(deck)
+        map_section(region, filters)
 
     # --------------------------------------------------------------
     # Additional 2D Charts: Histogram and Scatter Plot
@@ -79,35 +393,10 @@ def main():
     col3, col4 = st.columns(2)
 
     with col3:
-        st.markdown("**Distribution of Weapons Delivered**")
-        hist_chart = (
-            alt.Chart(df)
-            .mark_bar()
-            .encode(
-                x=alt.X("NUMWEAPONSDELIVERED:Q", bin=alt.Bin(maxbins=40), title="Number of Weapons Delivered (binned)"),
-                y=alt.Y("count()", title="Frequency"),
-                tooltip=["count()"]
-            )
-            .properties(width="container", height=400)
-            .interactive()
-        )
-        st.altair_chart(hist_chart, use_container_width=True)
+        histogram_section(region, filters)
 
     with col4:
-        st.markdown("**Geographic Distribution (2D Scatter)**")
-        scatter_chart = (
-            alt.Chart(df.sample(n=1000, random_state=1))  # sample to avoid the site freezing (still takes like 10 seconds)
-            .mark_circle(size=60, opacity=0.5)
-            .encode(
-                x=alt.X("TGTLONDDD_DDD_WGS84:Q", title="Longitude"),
-                y=alt.Y("TGTLATDD_DDD_WGS84:Q", title="Latitude"),
-                color=alt.Color("NUMWEAPONSDELIVERED:Q", scale=alt.Scale(scheme="reds"), title="Weapons Delivered"),
-                tooltip=["TGTLATDD_DDD_WGS84", "TGTLONDDD_DDD_WGS84", "NUMWEAPONSDELIVERED"]
-            )
-            .properties(width="container", height=400)
-            .interactive()
-        )
-        st.altair_chart(scatter_chart, use_container_width=True)
+        scatter_section(region, filters)
 
     # --------------------------------------------------------------
     # Combined Analysis Paragraph for 2D Charts
@@ -119,5 +408,16 @@ def main():
     disrupting supply lines, and larger ones targeting area bombardment near key supply hubs or troop concentrations.
     """)
 
+    # --------------------------------------------------------------
+    # Timeline: monthly strike intensity from the precomputed cube
+    # --------------------------------------------------------------
+    st.subheader("Bombing Intensity Over Time")
+
+    timeline(region, filters)
+
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        # Also on st.stop() and reruns, so tracing is released.
+        profiling.report()
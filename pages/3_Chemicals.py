@@ -1,88 +1,21 @@
 import streamlit as st
-import pandas as pd
 import altair as alt
-import plotly.express as px
 
-def main():
-    st.set_page_config(
-        page_title="Chemical Agents in Vietnam",
-        layout="wide"
-    )
-    st.title("Chemical Agents Used in the Vietnam War")
+from utils.lazydeps import require
 
-    st.markdown("""
-    Tactical herbicides were used by the U.S. to strip away dense foliage that provided cover for enemy forces. 
-    Below are visual representations of their usage, contamination levels, 
-    and timelines.
-    """)
+require("plotly")
+import plotly.express as px
 
-    # ---------------------------------------------------------------------
-    # DATA SETUP FROM THE TABLE (3-1), FOCUSING ON USAGE & TCDD CONTAMINATION
-    # ---------------------------------------------------------------------
-    data = [
-        {
-            "Name": "Agent Green",
-            "Formulation": "2,4,5-T",
-            "AmountSprayedLiters": 75920,
-            "PeriodStart": 1962,
-            "PeriodEnd": 1964,
-            "TCDDppmMin": 65.6,
-            "TCDDppmMax": 65.6
-        },
-        {
-            "Name": "Agent Pink",
-            "Formulation": "2,4,5-T",
-            "AmountSprayedLiters": 273520,
-            "PeriodStart": 1962,
-            "PeriodEnd": 1964,
-            "TCDDppmMin": 65.6,
-            "TCDDppmMax": 65.6
-        },
-        {
-            "Name": "Agent Purple",
-            "Formulation": "2,4-D, 2,4,5-T",
-            "AmountSprayedLiters": 2594800,
-            "PeriodStart": 1962,
-            "PeriodEnd": 1964,
-            "TCDDppmMin": 0,
-            "TCDDppmMax": 45
-        },
-        {
-            "Name": "Agent Blue",
-            "Formulation": "Cacodylic acid, sodium cacodylate",
-            "AmountSprayedLiters": 6100640,
-            "PeriodStart": 1962,
-            "PeriodEnd": 1971,
-            "TCDDppmMin": 0,
-            "TCDDppmMax": 0
-        },
-        {
-            "Name": "Agent Orange",
-            "Formulation": "2,4-D (50%), 2,4,5-T (50%)",
-            "AmountSprayedLiters": 43332640,
-            "PeriodStart": 1965,
-            "PeriodEnd": 1970,
-            "TCDDppmMin": 0.05,
-            "TCDDppmMax": 50
-        },
-        {
-            "Name": "Agent White",
-            "Formulation": "2,4-D (39.6%), picloram (10.2%)",
-            "AmountSprayedLiters": 21798400,
-            "PeriodStart": 1965,
-            "PeriodEnd": 1971,
-            "TCDDppmMin": 0,
-            "TCDDppmMax": 0
-        },
-    ]
-    df = pd.DataFrame(data)
+from utils import budget, profiling, query
 
-    # --------------------------------------------------------------
-    # 1) BAR CHART & PIE CHART SIDE-BY-SIDE
-    # --------------------------------------------------------------
+# --------------------------------------------------------------
+# 1) BAR CHART & PIE CHART SIDE-BY-SIDE
+# --------------------------------------------------------------
+@profiling.fragment("Chemicals", "usage")
+def usage_section(df):
     col1, col2 = st.columns(2)
 
-    with col1:
+    with col1, profiling.section("bar"):
         st.subheader("Herbicide Usage (Liters)")
         bar_chart = (
             alt.Chart(df, title="Total Liters Sprayed by Herbicide")
@@ -95,25 +28,19 @@ def main():
             )
             .properties(width="container", height=400)
         )
-        st.altair_chart(bar_chart, use_container_width=True)
+        budget.altair_chart("usage bar", bar_chart)
 
-    with col2:
+    with col2, profiling.section("pie"):
         st.subheader("Proportion of Total Spray")
-        total_sum = df["AmountSprayedLiters"].sum()
-        df_pie = df.copy()
-        df_pie["PercentOfTotal"] = round(
-            (df_pie["AmountSprayedLiters"] / total_sum) * 100, 2
-        )
-
         fig_pie = px.pie(
-            df_pie,
+            df,
             names="Name",
             values="AmountSprayedLiters",
             title="Proportional Distribution of Sprayed Herbicides",
             hover_data=["PercentOfTotal"],
             color_discrete_sequence=px.colors.qualitative.Dark2
         )
-        st.plotly_chart(fig_pie, use_container_width=True)
+        budget.plotly_chart("usage pie", fig_pie)
 
     st.markdown("""
     The bar chart shows that **Agent Orange** accounted for the 
@@ -124,16 +51,15 @@ def main():
     earlier years, these contributed smaller amounts overall.
     """)
 
-    # --------------------------------------------------------------
-    # 2) BUBBLE CHART: TCDD RANGES VS. VOLUME
-    # --------------------------------------------------------------
+# --------------------------------------------------------------
+# 2) BUBBLE CHART: TCDD RANGES VS. VOLUME
+# --------------------------------------------------------------
+@profiling.fragment("Chemicals", "tcdd")
+def tcdd_section(df):
     st.subheader("TCDD Contamination vs. Amount Sprayed")
 
-    df_bubble = df.copy()
-    df_bubble["TCDDppmAvg"] = (df_bubble["TCDDppmMin"] + df_bubble["TCDDppmMax"]) / 2
-
     fig_bubble = px.scatter(
-        df_bubble,
+        df,
         x="TCDDppmAvg",
         y="AmountSprayedLiters",
         size="AmountSprayedLiters",
@@ -152,7 +78,7 @@ def main():
         size_max=60,
         color_discrete_sequence=px.colors.qualitative.Dark2,
     )
-    st.plotly_chart(fig_bubble, use_container_width=True)
+    budget.plotly_chart("tcdd bubble", fig_bubble)
 
     st.markdown(""" 
     The bubble chart combines TCDD concentration with total spray volume. 
@@ -165,9 +91,11 @@ def main():
     spraying ensured broad geographic dispersion of these chemicals.
     """)
 
-    # --------------------------------------------------------------
-    # 3) GANTT-STYLE BAR CHART: PERIOD OF USE
-    # --------------------------------------------------------------
+# --------------------------------------------------------------
+# 3) GANTT-STYLE BAR CHART: PERIOD OF USE
+# --------------------------------------------------------------
+@profiling.fragment("Chemicals", "periods")
+def periods_section(df):
     st.subheader("Periods of Use")
 
     df_gantt = df[["Name", "PeriodStart", "PeriodEnd"]].copy()
@@ -184,7 +112,7 @@ def main():
         )
         .properties(width="container", height=300)
     )
-    st.altair_chart(gantt_chart, use_container_width=True)
+    budget.altair_chart("periods gantt", gantt_chart)
 
     st.markdown(""" 
     This chart shows each agent's primary usage window. 
@@ -199,5 +127,34 @@ def main():
     on Agent Orange before its discontinuation in 1970.
     """)
 
+def main():
+    st.set_page_config(
+        page_title="Chemical Agents in Vietnam",
+        layout="wide"
+    )
+    profiling.start("Chemicals")
+    budget.start("Chemicals")
+    st.title("Chemical Agents Used in the Vietnam War")
+
+    st.markdown("""
+    Tactical herbicides were used by the U.S. to strip away dense foliage that provided cover for enemy forces. 
+    Below are visual representations of their usage, contamination levels, 
+    and timelines.
+    """)
+
+    # ---------------------------------------------------------------------
+    # DATA SETUP FROM THE TABLE (3-1), FOCUSING ON USAGE & TCDD CONTAMINATION
+    # ---------------------------------------------------------------------
+    with profiling.section("data"):
+        df = query.herbicides()
+
+    usage_section(df)
+    tcdd_section(df)
+    periods_section(df)
+
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        # Also on st.stop() and reruns, so tracing is released.
+        profiling.report()
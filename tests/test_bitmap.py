@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from utils import bitmap
+
+
+@pytest.fixture(scope="module")
+def columns():
+    rng = np.random.default_rng(0)
+    n = 20_000
+    # Skewed so both the bit and the row-number containers are exercised.
+    aircraft = rng.choice(5, n, p=[0.6, 0.3, 0.08, 0.015, 0.005]).astype(np.int64)
+    aircraft[rng.random(n) < 0.01] = -1
+    year = rng.integers(0, 8, n)
+    service = rng.choice(3, n, p=[0.97, 0.02, 0.01])
+    return {"aircraft": aircraft, bitmap.YEAR: year, "service": service}
+
+
+@pytest.fixture(scope="module")
+def index(columns):
+    labels = {
+        "aircraft": ["B-52", "F-4", "F-105", "A-1", "C-130"],
+        bitmap.YEAR: list(range(1965, 1973)),
+        "service": ["USAF", "USN", "USMC"],
+    }
+    return bitmap.BitmapIndex.build(columns, labels)
+
+
+def mask_select(index, columns, filters, rows=None):
+    mask = np.ones(index.n_rows, dtype=bool)
+    for name, values in filters:
+        codes = [index.labels[name].index(value) for value in values if value in index.labels[name]]
+        mask &= np.isin(columns[name], codes)
+    if rows is not None:
+        within = np.zeros(index.n_rows, dtype=bool)
+        within[rows] = True
+        mask &= within
+    return np.flatnonzero(mask)
+
+
+FILTERS = [
+    (("aircraft", ("B-52",)),),
+    (("aircraft", ("C-130",)),),
+    (("aircraft", ("A-1", "C-130")),),
+    (("aircraft", ("B-52", "C-130")), (bitmap.YEAR, (1968, 1969))),
+    (("service", ("USMC",)), ("aircraft", ("A-1",))),
+    (("service", ("USN", "USMC")), (bitmap.YEAR, (1972,)), ("aircraft", ("F-4", "F-105"))),
+    (("aircraft", ("Unknown",)),),
+]
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_select_matches_a_boolean_mask(index, columns, filters):
+    np.testing.assert_array_equal(index.select(filters), mask_select(index, columns, filters))
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+@pytest.mark.parametrize("density", [0.001, 0.5])
+def test_select_within_rows_matches_a_boolean_mask(index, columns, filters, density):
+    rng = np.random.default_rng(1)
+    rows = np.flatnonzero(rng.random(index.n_rows) < density)
+    np.testing.assert_array_equal(index.select(filters, rows), mask_select(index, columns, filters, rows))
+
+
+def test_no_filters_returns_the_rows_unchanged(index):
+    rows = np.arange(10)
+    assert index.select((), rows) is rows
+    assert index.select(()) is None
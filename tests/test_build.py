@@ -0,0 +1,33 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils import build, columnar, tiles
+from utils.ingest import LAT, LON, WEAPONS
+
+
+def test_tiles_without_strikes_still_write_their_index(tmp_path):
+    root = tmp_path / "tiles"
+    counts = tiles.build([], [], [], "abc", root=str(root))
+    assert sum(counts.values()) == 0
+    with open(root / tiles.META_FILE) as f:
+        assert json.load(f)["source"] == "abc"
+
+
+def test_a_build_into_another_root_keeps_every_artifact_under_it(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    rng = np.random.default_rng(0)
+    pd.DataFrame({
+        LAT: rng.uniform(10, 22, 300).round(4),
+        LON: rng.uniform(100, 110, 300).round(4),
+        WEAPONS: rng.integers(1, 50, 300),
+    }).to_csv(columnar.SOURCE_CSV, index=False)
+
+    manifest = build.run(root="out", names=["tiles"], log=lambda line: None)
+    assert set(manifest["artifacts"]) == {"bombing-columns", "tiles"}
+    assert os.path.exists(os.path.join("out", "tiles", tiles.META_FILE))
+    assert not os.path.exists(tiles.TILE_ROOT)
+    assert build.output_dir("tiles") == tiles.TILE_ROOT
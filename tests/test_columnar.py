@@ -0,0 +1,53 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils import columnar
+from utils.ingest import LAT, LON, WEAPONS
+
+
+def _source(tmp_path, monkeypatch, n=2000):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data")
+    rng = np.random.default_rng(0)
+    pd.DataFrame({
+        LAT: rng.uniform(10, 22, n).round(4),
+        LON: rng.uniform(100, 110, n).round(4),
+        WEAPONS: rng.integers(1, 50, n),
+    }).to_csv(columnar.SOURCE_CSV, index=False)
+
+
+def test_concurrent_callers_build_a_cold_cache_once(tmp_path, monkeypatch):
+    _source(tmp_path, monkeypatch)
+    builds = []
+    build = columnar.build
+    monkeypatch.setattr(columnar, "build", lambda *args, **kwargs: builds.append(1) or build(*args, **kwargs))
+
+    versions, errors = [], []
+
+    def call():
+        try:
+            versions.append(columnar.version())
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=call) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(set(versions)) == 1 and len(versions) == 6
+    assert len(builds) == 1
+    assert len(columnar.load_columns([WEAPONS])) == 2000
+
+
+def test_rebuilding_leaves_no_temporary_directories(tmp_path, monkeypatch):
+    _source(tmp_path, monkeypatch)
+    out = columnar.ensure()
+    columnar.build(columnar.SOURCE_CSV, out)
+    assert [name for name in os.listdir(columnar.CACHE_ROOT) if ".tmp-" in name or ".old-" in name] == []
+    assert columnar.read_meta(out)["rows"] == 2000
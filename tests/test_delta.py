@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils import aggregates, columnar, delta, hexbin, mapreduce
+from utils.ingest import AIRCRAFT, DATE, LAT, LON, WEAPONS
+
+
+def _strikes(n, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        LAT: rng.uniform(10, 22, n).round(4),
+        LON: rng.uniform(100, 110, n).round(4),
+        WEAPONS: rng.integers(1, 50, n),
+        AIRCRAFT: rng.choice(["F-4", "F-105", "B-52"] if seed == 0 else ["A-1", "B-52"], n),
+        DATE: pd.Timestamp("1966-01-01") + pd.to_timedelta(rng.integers(0, 2000, n), unit="D"),
+    })
+
+
+def _build(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    _strikes(500, 0).to_csv(columnar.SOURCE_CSV, index=False)
+    return columnar.build(chunk_rows=128)
+
+
+def _add_delta(name, df):
+    directory = delta.delta_dir()
+    os.makedirs(directory, exist_ok=True)
+    df.to_csv(f"{directory}/{name}", index=False)
+
+
+def test_readers_keep_consistent_columns_while_a_delta_applies(tmp_path, monkeypatch):
+    directory = _build(tmp_path, monkeypatch)
+    before = columnar.load_dir(directory)
+    mapped = before[WEAPONS].to_numpy().copy()
+
+    new = _strikes(200, 1)
+    _add_delta("0001.csv", new)
+    assert delta.apply(directory) is not None
+
+    # Columns mapped before the apply still see the old files.
+    np.testing.assert_array_equal(before[WEAPONS].to_numpy(), mapped)
+    after = columnar.load_dir(directory)
+    assert len(after) == columnar.read_meta(directory)["rows"] == 700
+    np.testing.assert_array_equal(after[WEAPONS].to_numpy()[500:], new[WEAPONS])
+    assert list(after[AIRCRAFT].iloc[500:]) == list(new[AIRCRAFT])
+    assert list(after[AIRCRAFT].iloc[:500]) == list(before[AIRCRAFT])
+
+
+def test_loaders_cut_swapped_columns_to_the_published_rows(tmp_path, monkeypatch):
+    directory = _build(tmp_path, monkeypatch)
+    # A longer column swapped in ahead of the metadata, as mid-apply.
+    grown = delta.grow_npy(f"{directory}/{LAT}.npy", np.full(10, 15.0, dtype=np.float32))
+    os.replace(grown, f"{directory}/{LAT}.npy")
+
+    df = columnar.load_dir(directory, [LAT, LON])
+    assert len(df) == 500
+    assert len(columnar.load_column(directory, LAT)) == 500
+
+
+def test_folded_aggregates_match_a_full_pass(tmp_path, monkeypatch):
+    directory = _build(tmp_path, monkeypatch)
+    # Stored before the deltas, so applying them folds rather than recomputes.
+    for name in aggregates.STATES:
+        aggregates.state(directory, name)
+    _add_delta("0001.csv", _strikes(200, 1))
+    _add_delta("0002.csv", _strikes(50, 2))
+    assert len(delta.apply(directory)) == 2
+    version = columnar.read_meta(directory)["version"]
+    for name in aggregates.STATES:
+        assert aggregates._read(directory, name, version) is not None
+
+    for radius in hexbin.RADII:
+        pd.testing.assert_frame_equal(aggregates.hex_cells(directory, radius), mapreduce.hex_cells(directory, radius))
+    for log in (False, True):
+        pd.testing.assert_frame_equal(aggregates.histogram_table(directory, log=log),
+                                      mapreduce.histogram_table(directory, log=log))
+    folded, full = aggregates.time_cube(directory), mapreduce.time_cube(directory, aggregates.CUBE_CELL_DEG)
+    np.testing.assert_array_equal(folded.months, full.months)
+    np.testing.assert_array_equal(folded.counts, full.counts)
+    np.testing.assert_allclose(folded.weapons, full.weapons)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from utils import hexbin
+
+RADIUS = 5000.0
+
+
+def centers(q, r, radius=RADIUS):
+    return radius * np.sqrt(3.0) * (q + r / 2), radius * 1.5 * r
+
+
+def nearest_cell(x, y, radius=RADIUS):
+    # Brute force: the closest center among the rounded cell and its ring.
+    q, r = hexbin.hex_cells(x, y, radius)
+    ring = np.array([(0, 0), (1, 0), (-1, 0), (0, 1), (0, -1), (1, -1), (-1, 1)])
+    cand_q, cand_r = q[:, None] + ring[:, 0], r[:, None] + ring[:, 1]
+    cx, cy = centers(cand_q, cand_r, radius)
+    best = np.argmin(np.hypot(cx - x[:, None], cy - y[:, None]), axis=1)
+    return cand_q[np.arange(len(x)), best], cand_r[np.arange(len(x)), best]
+
+
+@pytest.mark.parametrize("q, r", [(0, 0), (3, -2), (-7, 11), (250, -400)])
+@pytest.mark.parametrize("inset", [1e-6, -1e-6])
+def test_points_just_inside_an_edge_or_vertex_stay_in_their_cell(q, r, inset):
+    cx, cy = centers(np.float64(q), np.float64(r))
+    # Pointy-top: vertices at 30 + 60k degrees, edge midpoints at 60k.
+    angles = np.radians(np.arange(0, 360, 30))
+    reach = np.where(np.arange(12) % 2, RADIUS, RADIUS * np.sqrt(3.0) / 2) * (1 - inset)
+    x, y = cx + reach * np.cos(angles), cy + reach * np.sin(angles)
+
+    if inset < 0:
+        # Past a vertex lies on the edge between the two other cells there,
+        # a true tie; past an edge midpoint is inside the neighbour.
+        x, y = x[::2], y[::2]
+
+    got_q, got_r = hexbin.hex_cells(x, y, RADIUS)
+    inside = (got_q == q) & (got_r == r)
+    assert inside.all() if inset > 0 else not inside.any()
+    want_q, want_r = nearest_cell(x, y)
+    np.testing.assert_array_equal(got_q, want_q)
+    np.testing.assert_array_equal(got_r, want_r)
+
+
+def test_rounding_matches_the_nearest_center():
+    rng = np.random.default_rng(0)
+    x, y = rng.uniform(-1e6, 1e6, (2, 100_000))
+    got = hexbin.hex_cells(x, y, RADIUS)
+    want = nearest_cell(x, y)
+    np.testing.assert_array_equal(got[0], want[0])
+    np.testing.assert_array_equal(got[1], want[1])
+
+
+def test_partials_merge_to_the_whole():
+    rng = np.random.default_rng(1)
+    lat, lon = rng.uniform(10, 22, 5000), rng.uniform(102, 109, 5000)
+    weapons = rng.integers(0, 30, 5000)
+    whole = hexbin.partial(lat, lon, weapons, RADIUS)
+    merged = hexbin.merge([hexbin.partial(lat[s], lon[s], weapons[s], RADIUS) for s in (slice(0, 1234), slice(1234, None))])
+    for a, b in zip(whole, merged):
+        np.testing.assert_array_equal(a, b)
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from utils import ingest
+from utils.ingest import DATE, LAT, LON, WEAPONS
+
+
+def test_ingest_drops_rows_outside_the_theatre(tmp_path):
+    source = tmp_path / "strikes.csv"
+    pd.DataFrame({
+        LAT: [16.6, 0.0, None, 51.5, 21.0, "junk"],
+        LON: [106.7, 0.0, 105.0, -0.1, 105.8, 106.0],
+        WEAPONS: [1, 2, 3, 4, 5, 6],
+    }).to_csv(source, index=False)
+
+    stats = ingest.ingest_csv(str(source), str(tmp_path / "out"), chunk_rows=2)
+
+    assert stats["rows_read"] == 6
+    assert stats["rows"] == 2
+    assert stats["dropped"] == {"missing": 2, "null_island": 1, "outside_theatre": 1}
+    np.testing.assert_array_equal(np.load(tmp_path / "out" / f"{WEAPONS}.npy"), [1, 5])
+
+
+def test_ingest_clears_dates_outside_the_war(tmp_path):
+    source = tmp_path / "strikes.csv"
+    pd.DataFrame({
+        LAT: [16.6, 16.7, 16.8, 16.9],
+        LON: [106.7, 106.7, 106.7, 106.7],
+        DATE: ["1968-01-31", "1986-01-31", "1945-05-01", None],
+    }).to_csv(source, index=False)
+
+    stats = ingest.ingest_csv(str(source), str(tmp_path / "out"))
+
+    assert stats["rows"] == 4
+    assert stats["cleared"] == {"dates_outside_theatre": 2}
+    dates = np.load(tmp_path / "out" / f"{DATE}.npy")
+    assert dates[0] == np.datetime64("1968-01-31")
+    assert np.isnat(dates[1:]).all()
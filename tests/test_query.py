@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import columnar, query, spatial
+from utils.ingest import AIRCRAFT, DATE, LAT, LON, SERVICE, WEAPONS
+
+
+def _strikes(n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        LAT: rng.uniform(10, 22, n).round(4),
+        LON: rng.uniform(100, 110, n).round(4),
+        WEAPONS: rng.integers(1, 50, n),
+        AIRCRAFT: rng.choice(["F-4", "F-105", "B-52"], n),
+        SERVICE: rng.choice(["USAF", "USN", "USMC"], n),
+        DATE: pd.Timestamp("1966-01-01") + pd.to_timedelta(rng.integers(0, 2000, n), unit="D"),
+    })
+
+
+@pytest.fixture
+def strikes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    df = _strikes()
+    df.to_csv(columnar.SOURCE_CSV, index=False)
+    columnar.build(chunk_rows=128)
+    return df
+
+
+def test_region_names_and_shapes_normalize_to_one_key():
+    assert query.normalize_region(None) is None
+    assert query.normalize_region("DMZ (17th parallel)") == spatial.REGIONS["DMZ (17th parallel)"]
+    assert query.normalize_region(("bbox", [16, "106", 17.3, 107])) == ("bbox", (16.0, 106.0, 17.3, 107.0))
+    assert query.normalize_region(("polygon", [[104, 18], [106, 18], [105, 17]])) == (
+        "polygon", ((104.0, 18.0), (106.0, 18.0), (105.0, 17.0)))
+
+
+@pytest.mark.parametrize("region", ["Atlantis", ("square", (1, 2, 3, 4))])
+def test_unknown_regions_are_refused(region):
+    with pytest.raises(ValueError):
+        query.normalize_region(region)
+
+
+def test_filters_normalize_regardless_of_spelling_and_order(strikes):
+    version = columnar.version()
+    expected = ((AIRCRAFT, ("B-52", "F-4")), (SERVICE, ("USAF",)))
+    assert query.normalize_filters({"Aircraft": ["F-4", "B-52"], "service": "USAF"}, version) == expected
+    assert query.normalize_filters(((SERVICE, ["USAF"]), ("aircraft", ("B-52", "F-4", "B-52"))), version) == expected
+    assert query.normalize_filters({"year": ["1967"]}, version) == query.normalize_filters({"Year": [1967]}, version)
+    assert query.normalize_filters({"aircraft": []}, version) == ()
+    assert query.normalize_filters(None, version) == ()
+
+
+@pytest.mark.parametrize("filters", [{"colour": ["red"]}, {"aircraft": ["Zeppelin"]}, {"year": [1492]}])
+def test_unknown_filters_are_refused(strikes, filters):
+    with pytest.raises(ValueError):
+        query.normalize_filters(filters)
+
+
+def test_count_matches_a_full_scan(strikes):
+    south, west, north, east = 14.0, 102.0, 19.0, 107.0
+    inside = strikes[LAT].between(south, north) & strikes[LON].between(west, east)
+    f4 = strikes[AIRCRAFT] == "F-4"
+    year = strikes[DATE].dt.year == 1967
+
+    assert query.count() == len(strikes)
+    assert query.count(("bbox", (south, west, north, east))) == inside.sum()
+    assert query.count(filters={"aircraft": "F-4", "year": 1967}) == (f4 & year).sum()
+    assert query.count(("bbox", (south, west, north, east)), {"aircraft": ["F-4"]}) == (inside & f4).sum()
+
+
+def test_hex_cells_refuses_an_unknown_radius(strikes):
+    with pytest.raises(ValueError):
+        query.hex_cells(1234)
+
+
+def test_herbicide_totals_refuses_an_unknown_column():
+    with pytest.raises(ValueError):
+        query.herbicide_totals("Colour")
@@ -0,0 +1,17 @@
+import numpy as np
+
+from utils import raster
+
+
+def test_extent_ignores_a_stray_point():
+    rng = np.random.default_rng(0)
+    lat = np.append(rng.uniform(15, 18, 10_000), 0.0)
+    lon = np.append(rng.uniform(105, 108, 10_000), 0.0)
+    west, south, east, north = raster.extent_of(lat, lon)
+    assert 104.8 < west < 105.1 and 107.9 < east < 108.2
+    assert 14.8 < south < 15.1 and 17.9 < north < 18.2
+
+
+def test_extent_of_a_single_point():
+    west, south, east, north = raster.extent_of(np.array([16.0]), np.array([106.0]))
+    assert west < 106.0 < east and south < 16.0 < north
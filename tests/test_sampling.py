@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from utils import sampling
+
+
+def uniform_points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(8, 24, n), rng.uniform(100, 110, n)
+
+
+@pytest.mark.parametrize("budget", [1, 10, 100, 639, 640, 1000, 5000])
+def test_budget_is_a_hard_cap(budget):
+    lat, lon = uniform_points(50_000)
+    rows, weights = sampling.stratified_sample(lat, lon, budget=budget)
+    assert 0 < len(rows) <= budget
+    assert len(np.unique(rows)) == len(rows)
+    assert weights.sum() == pytest.approx(len(lat), rel=0.05)
+
+
+def test_budget_cap_with_a_larger_floor():
+    lat, lon = uniform_points(20_000)
+    rows, _ = sampling.stratified_sample(lat, lon, budget=50, min_per_stratum=3)
+    assert len(rows) <= 50
+
+
+def test_budget_is_deterministic():
+    lat, lon = uniform_points(20_000)
+    first, _ = sampling.stratified_sample(lat, lon, budget=100, seed=7)
+    second, _ = sampling.stratified_sample(lat, lon, budget=100, seed=7)
+    np.testing.assert_array_equal(first, second)
+
+
+def test_every_stratum_survives_when_the_budget_allows():
+    lat, lon = uniform_points(50_000)
+    ids = sampling.strata(lat, lon)
+    rows, _ = sampling.stratified_sample(lat, lon, budget=5000)
+    assert set(ids[rows]) == set(ids)
+
+
+def test_zero_budget_and_empty_input():
+    lat, lon = uniform_points(100)
+    assert len(sampling.stratified_sample(lat, lon, budget=0)[0]) == 0
+    assert len(sampling.stratified_sample(lat[:0], lon[:0], budget=10)[0]) == 0
+
+
+def test_budget_is_filled_with_every_stratum_floored():
+    lat, lon = uniform_points(50_000)
+    ids = sampling.strata(lat, lon)
+    rows, _ = sampling.stratified_sample(lat, lon, budget=1000)
+    assert len(rows) == 1000
+    assert set(ids[rows]) == set(ids)
+
+
+def test_small_budgets_drop_the_largest_strata_first():
+    # A dense cluster in one cell and 20 isolated strikes, each its own stratum.
+    rng = np.random.default_rng(0)
+    lat = np.concatenate((rng.uniform(16.0, 16.4, 10_000), 8.25 + np.arange(20) * 0.75))
+    lon = np.concatenate((rng.uniform(106.0, 106.4, 10_000), np.full(20, 101.25)))
+    rows, weights = sampling.stratified_sample(lat, lon, budget=20)
+    np.testing.assert_array_equal(rows, np.arange(10_000, 10_020))
+    assert weights.sum() == pytest.approx(len(lat))
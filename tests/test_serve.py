@@ -0,0 +1,111 @@
+import http.client
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import columnar, serve
+from utils.ingest import AIRCRAFT, DATE, LAT, LON, WEAPONS
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    rng = np.random.default_rng(1)
+    n = 400
+    pd.DataFrame({
+        LAT: rng.uniform(10, 22, n).round(4),
+        LON: rng.uniform(100, 110, n).round(4),
+        WEAPONS: rng.integers(1, 50, n),
+        AIRCRAFT: rng.choice(["F-4", "F-105", "B-52"], n),
+        DATE: pd.Timestamp("1966-01-01") + pd.to_timedelta(rng.integers(0, 2000, n), unit="D"),
+    }).to_csv(columnar.SOURCE_CSV, index=False)
+    columnar.build(chunk_rows=128)
+
+    httpd = serve.make_server(port=0, quiet=True)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_port
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def get(port, path, headers=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        connection.request("GET", path.replace(" ", "%20"), headers=headers or {})
+        response = connection.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        connection.close()
+
+
+def test_parse_region():
+    assert serve.parse_region(None) is None
+    assert serve.parse_region("all") is None
+    assert serve.parse_region("DMZ (17th parallel)") == "DMZ (17th parallel)"
+    assert serve.parse_region("bbox:16,106,17.3,107") == ("bbox", (16.0, 106.0, 17.3, 107.0))
+    assert serve.parse_region("radius:16.6,106.7,50") == ("radius", (16.6, 106.7, 50.0))
+    for value in ("bbox:16,106,17", "radius:a,b,c"):
+        with pytest.raises(ValueError):
+            serve.parse_region(value)
+
+
+def test_equivalent_queries_share_an_etag_and_revalidate(server):
+    status, headers, body = get(server, "/count?region=bbox:14,102,19,107&aircraft=F-4&aircraft=B-52")
+    assert status == 200
+    assert headers["Content-Type"] == serve.JSON_TYPE
+    assert json.loads(body)["strikes"] > 0
+
+    # Neither parameter nor value order changes the query.
+    status, same, _ = get(server, "/count?aircraft=B-52&aircraft=F-4&region=bbox:14,102,19,107")
+    assert status == 200
+    assert same["ETag"] == headers["ETag"]
+
+    status, _, body = get(server, "/count?region=bbox:14,102,19,107&aircraft=F-4&aircraft=B-52",
+                          {"If-None-Match": headers["ETag"]})
+    assert status == 304
+    assert body == b""
+
+    status, _, _ = get(server, "/count?region=bbox:14,102,19,107", {"If-None-Match": headers["ETag"]})
+    assert status == 200
+
+
+@pytest.mark.parametrize("path", [
+    "/count?colour=red",
+    "/count?region=bbox:1,2,3",
+    "/count?region=Atlantis",
+    "/count?aircraft=Zeppelin",
+    "/hex?radius=1234",
+    "/hex?radius=big",
+    "/herbicides?by=Colour",
+])
+def test_bad_parameters_are_400(server, path):
+    status, headers, body = get(server, path)
+    assert status == 400
+    assert headers["Content-Type"] == serve.JSON_TYPE
+    assert json.loads(body)["error"]
+
+
+def test_unknown_paths_are_404(server):
+    status, _, body = get(server, "/nope")
+    assert status == 404
+    assert "/count" in json.loads(body)["endpoints"]
+
+
+def test_metrics_count_requests_by_status(server):
+    before = json.loads(get(server, "/metrics")[2])["endpoints"].get("/count", {}).get("status", {})
+    _, headers, _ = get(server, "/count")
+    get(server, "/count", {"If-None-Match": headers["ETag"]})
+    get(server, "/count?colour=red")
+
+    metrics = json.loads(get(server, "/metrics")[2])
+    status = metrics["endpoints"]["/count"]["status"]
+    for code in ("200", "304", "400"):
+        assert status[code] == before.get(code, 0) + 1
+    assert metrics["endpoints"]["/count"]["p95_ms"] >= metrics["endpoints"]["/count"]["p50_ms"]
+    assert "/metrics" not in metrics["endpoints"]
+    assert metrics["responses"]["hits"] >= 1
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from utils import spatial
+
+
+@pytest.fixture(scope="module")
+def points():
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(8, 23, 50_000)
+    lon = rng.uniform(102, 110, 50_000)
+    # Points exactly on the DMZ box's edges and corners count as inside.
+    south, west, north, east = spatial.REGIONS["DMZ (17th parallel)"][1]
+    lat[:6] = [south, north, south, north, 17.0, 17.0]
+    lon[:6] = [west, east, east, west, west, east]
+    return lat, lon
+
+
+def brute_force(lat, lon, region):
+    kind, args = region
+    if kind == "bbox":
+        south, west, north, east = args
+        inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+    elif kind == "radius":
+        inside = spatial.haversine_km(args[0], args[1], lat, lon) <= args[2]
+    else:
+        inside = spatial.points_in_polygon(lon, lat, np.asarray(args))
+    return np.flatnonzero(inside)
+
+
+REGIONS = [
+    *spatial.REGIONS.values(),
+    ("bbox", (10.0, 104.0, 10.3, 104.2)),         # smaller than a few cells
+    ("radius", (15.0, 106.0, 3.0)),
+    ("polygon", ((103.0, 9.0), (109.0, 9.5), (104.0, 20.0))),
+    ("bbox", (30.0, 120.0, 31.0, 121.0)),         # away from every point
+]
+
+
+@pytest.mark.parametrize("cell_deg", [0.05, 0.3])
+@pytest.mark.parametrize("region", REGIONS)
+def test_region_query_matches_brute_force(points, region, cell_deg):
+    lat, lon = points
+    index = spatial.GridIndex(lat, lon, cell_deg)
+    np.testing.assert_array_equal(index.query(region), brute_force(lat, lon, region))
+
+
+def test_no_region_is_every_row(points):
+    assert spatial.GridIndex(*points).query(None) is None
@@ -0,0 +1,74 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import store
+
+
+class Stopped(BaseException):
+    """Stands in for Streamlit's StopException / RerunException."""
+
+
+def _race(leader_compute, waiter_compute):
+    # The leader starts computing, a waiter joins its flight, then the
+    # leader finishes with whatever leader_compute does.
+    cache = store.Store(1)
+    started, release = threading.Event(), threading.Event()
+    outcome = {}
+
+    def lead():
+        started.set()
+        release.wait()
+        return leader_compute()
+
+    def run(name, compute):
+        try:
+            outcome[name] = cache.get("key", compute)
+        except BaseException as error:
+            outcome[name] = error
+
+    leader = threading.Thread(target=run, args=("leader", lead))
+    leader.start()
+    started.wait()
+    waiter = threading.Thread(target=run, args=("waiter", waiter_compute))
+    waiter.start()
+    while cache.counters["waits"] == 0:
+        time.sleep(0.001)
+    release.set()
+    leader.join()
+    waiter.join()
+    return cache, outcome
+
+
+def test_waiters_share_the_leaders_errors():
+    def fail():
+        raise ValueError("bad query")
+
+    cache, outcome = _race(fail, lambda: "unused")
+    assert isinstance(outcome["leader"], ValueError)
+    assert outcome["waiter"] is outcome["leader"]
+
+
+def test_a_stopped_leader_hands_the_key_to_a_waiter():
+    def stop():
+        raise Stopped()
+
+    cache, outcome = _race(stop, lambda: "computed by the waiter")
+    assert isinstance(outcome["leader"], Stopped)
+    assert outcome["waiter"] == "computed by the waiter"
+    assert cache.get("key", lambda: pytest.fail("should be cached")) == "computed by the waiter"
+
+
+def test_sizeof_skips_memory_mapped_columns(tmp_path):
+    np.save(tmp_path / "values.npy", np.arange(100_000, dtype=np.float64))
+    mapped = np.load(tmp_path / "values.npy", mmap_mode="r")
+    series = pd.Series(mapped, copy=False)
+    frame = pd.DataFrame({"mapped": mapped, "held": np.arange(100_000, dtype=np.float64)}, copy=False)
+
+    assert store.sizeof(mapped[10:]) == 0
+    assert store.sizeof(series) < 1000
+    assert 800_000 <= store.sizeof(frame) < 801_000
+    assert store.sizeof(series.iloc[::2].copy()) >= 400_000
@@ -0,0 +1,137 @@
+"""Whole-dataset aggregates kept as additive partials next to the columns.
+
+The hex cells at every radius, the weapon value counts behind the histograms
+and the time cube are stored under ``<columns>/aggregates/`` as merged
+partials (keys, counts and totals). They are computed from the columns the
+first time they are asked for. After that, :mod:`utils.delta` folds each new
+batch of rows into them with the same ``merge`` functions the map-reduce
+uses, so an update costs time in the size of the batch, not the archive.
+
+Each file records the column version it was built for. A file that does not
+match the current columns is ignored and recomputed.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+from utils import columnar, hexbin, histogram, mapreduce, timecube
+from utils.columnar import DATE, WEAPONS
+
+STATE_DIR = "aggregates"
+CUBE_CELL_DEG = 0.25
+
+
+def _path(directory, name):
+    return os.path.join(directory, STATE_DIR, f"{name}.npz")
+
+
+def _read(directory, name, version):
+    try:
+        with np.load(_path(directory, name)) as data:
+            state = dict(data)
+    except (OSError, ValueError):
+        return None
+    return state if str(state.pop("version")) == version else None
+
+
+def _write(directory, name, version, state):
+    try:
+        os.makedirs(os.path.join(directory, STATE_DIR), exist_ok=True)
+        tmp = _path(directory, f"{name}.tmp-{os.getpid()}-{threading.get_ident()}")
+        with open(tmp, "wb") as f:
+            np.savez(f, version=version, **state)
+        os.replace(tmp, _path(directory, name))
+    except OSError:
+        pass  # read-only deployment; the caller still gets its result
+
+
+# name -> (state from the columns, optionally only ``rows``; merge of two states)
+
+def _hex_state(directory, rows=None):
+    partials = mapreduce.hex_partials(directory, hexbin.RADII, rows)
+    return {f"{radius}_{part}": array
+            for radius, merged in partials.items()
+            for part, array in zip(("keys", "counts", "totals"), merged)}
+
+
+def _hex_merge(old, new):
+    state = {}
+    for radius in hexbin.RADII:
+        parts = [tuple(s[f"{radius}_{part}"] for part in ("keys", "counts", "totals")) for s in (old, new)]
+        state.update(zip((f"{radius}_keys", f"{radius}_counts", f"{radius}_totals"), hexbin.merge(parts)))
+    return state
+
+
+def _weapons_state(directory, rows=None):
+    values, counts = mapreduce.value_counts(directory, WEAPONS, rows)
+    return {"values": values, "counts": counts}
+
+
+def _weapons_merge(old, new):
+    values, counts = histogram.merge_value_counts([(s["values"], s["counts"]) for s in (old, new)])
+    return {"values": values, "counts": counts}
+
+
+def _cube_state(directory, rows=None):
+    keys, counts, totals = mapreduce.cube_partial(directory, CUBE_CELL_DEG, rows)
+    return {"keys": keys, "counts": counts, "totals": totals}
+
+
+def _cube_merge(old, new):
+    keys, counts, totals = timecube.merge([(s["keys"], s["counts"], s["totals"]) for s in (old, new)])
+    return {"keys": keys, "counts": counts, "totals": totals}
+
+
+STATES = {
+    "hex": (_hex_state, _hex_merge),
+    "weapons": (_weapons_state, _weapons_merge),
+    "cube": (_cube_state, _cube_merge),
+}
+
+
+def state(directory, name):
+    """The merged partials ``name`` for the current columns, computed if missing."""
+    version = columnar.read_meta(directory)["version"]
+    found = _read(directory, name, version)
+    if found is None:
+        found = STATES[name][0](directory)
+        _write(directory, name, version, found)
+    return found
+
+
+def fold(directory, old_version, start, stop):
+    """Fold rows ``start:stop``, just appended, into every stored state.
+
+    States that did not match ``old_version`` are dropped instead, and are
+    recomputed in full when next needed.
+    """
+    version = columnar.read_meta(directory)["version"]
+    rows = np.arange(start, stop)
+    for name, (compute, merge) in STATES.items():
+        old = _read(directory, name, old_version)
+        if old is None:
+            try:
+                os.remove(_path(directory, name))
+            except OSError:
+                pass
+            continue
+        _write(directory, name, version, merge(old, compute(directory, rows)))
+
+
+def hex_cells(directory, radius):
+    found = state(directory, "hex")
+    return hexbin.cells_frame(found[f"{radius}_keys"], found[f"{radius}_counts"], found[f"{radius}_totals"], radius)
+
+
+def histogram_table(directory, bins=40, log=False):
+    found = state(directory, "weapons")
+    return histogram.table_from_counts(found["values"], found["counts"], bins, log)
+
+
+def time_cube(directory):
+    if DATE not in columnar.read_meta(directory)["columns"]:
+        return None
+    found = state(directory, "cube")
+    return timecube.from_partial(found["keys"], found["counts"], found["totals"], CUBE_CELL_DEG)
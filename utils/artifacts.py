@@ -0,0 +1,108 @@
+"""Read side of the offline data build (see :mod:`utils.build`).
+
+Artifacts live under ``artifacts/<name>/`` with a ``manifest.json`` at the
+root recording, for each artifact, the hash of its inputs, the hash of every
+file it wrote and, for bombing artifacts, the sha256 of the source CSV they
+were built from. Pages use an artifact only when it exists and matches the
+data they would otherwise compute from; otherwise they fall back to computing
+at request time.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils import timecube
+
+ARTIFACT_ROOT = "artifacts"
+MANIFEST_FILE = "manifest.json"
+
+_manifest_cache = {}
+
+
+def path(name, *parts):
+    return os.path.join(ARTIFACT_ROOT, name, *parts)
+
+
+def read_manifest():
+    manifest_path = os.path.join(ARTIFACT_ROOT, MANIFEST_FILE)
+    try:
+        mtime = os.stat(manifest_path).st_mtime_ns
+    except OSError:
+        return {"artifacts": {}}
+    cached = _manifest_cache.get(manifest_path)
+    if cached is None or cached[0] != mtime:
+        with open(manifest_path) as f:
+            cached = (mtime, json.load(f))
+        _manifest_cache[manifest_path] = cached
+    return cached[1]
+
+
+def code_hash(*modules):
+    sources = [inspect.getsource(module) for module in modules]
+    return hashlib.sha256(json.dumps(sources).encode()).hexdigest()
+
+
+def entry(name, source=None, code=None):
+    """Manifest entry for ``name``, or None if missing or stale.
+
+    ``source`` is the sha256 of the CSV the caller would compute from, and
+    ``code`` the module(s) whose data the artifact was built from.
+    """
+    found = read_manifest()["artifacts"].get(name)
+    if found is None:
+        return None
+    if source is not None and found.get("source") != source:
+        return None
+    if code is not None and found.get("code") != code_hash(*code):
+        return None
+    if not all(os.path.exists(path(name, file)) for file in found["files"]):
+        return None
+    return found
+
+
+def table(name, file, source=None, code=None):
+    """A JSON-records artifact as a DataFrame, or None."""
+    if entry(name, source, code) is None:
+        return None
+    with open(path(name, file)) as f:
+        return pd.DataFrame(json.load(f))
+
+
+def document(name, file, source=None, code=None):
+    """A JSON artifact as parsed, or None."""
+    if entry(name, source, code) is None:
+        return None
+    with open(path(name, file)) as f:
+        return json.load(f)
+
+
+def arrays(name, file, source=None):
+    """An .npz artifact as a dict of arrays, or None."""
+    if entry(name, source) is None:
+        return None
+    with np.load(path(name, file)) as data:
+        return dict(data)
+
+
+def hex_cells(radius, source):
+    data = arrays("hex-pyramid", f"hex_{radius}.npz", source)
+    return None if data is None else pd.DataFrame(data)
+
+
+def histogram(log, source):
+    return table("histograms", "log.json" if log else "linear.json", source)
+
+
+def time_cube(source):
+    data = arrays("time-cube", "cube.npz", source)
+    if data is None:
+        return None
+    return timecube.TimeCube(
+        data["months"], data["lat"], data["lon"],
+        data["counts"], data["weapons"], float(data["cell_deg"]),
+    )
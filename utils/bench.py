@@ -0,0 +1,236 @@
+"""Headless render benchmarks for the pages.
+
+Each page runs in a fresh process under Streamlit's ``AppTest``, from a work
+directory holding the dataset, so caches start cold and peak memory is the
+page's own. The script runs once cold and then ``WARM_RUNS`` times with the
+caches warm, and the page is measured in ``--repeat`` processes; timings and
+memory are the median of those runs, so one slow run does not fail the
+comparison. Payload is the serialized size of what the frontend would
+receive, meaning every element proto, with charts, decks and embedded HTML
+also counted separately.
+
+Results are compared with ``benchmarks/baseline.json``. A metric regresses
+when it exceeds ``baseline * ratio + slack`` (see ``THRESHOLDS``).
+
+    python -m utils.bench                       # 1e5 synthetic rows
+    python -m utils.bench --rows 1e5 1e6 5e6 --csv-out scaling.csv
+    python -m utils.bench --source data/vietnam_bombing_trimmed.csv
+    python -m utils.bench --save                # record new baselines
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from utils import synthetic
+
+PAGES = ("pages/1_Weapons.py", "pages/2_Bombs.py", "pages/3_Chemicals.py")
+BASELINE_FILE = "benchmarks/baseline.json"
+WORK_ROOT = "data/.cache/bench"
+SOURCE_NAME = "data/vietnam_bombing_trimmed.csv"
+DATA_FILES = "data/*.json"
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WARM_RUNS = 5
+REPEAT = 3
+
+# metric -> (ratio, slack). Timings are noisy even as medians, payload is not.
+THRESHOLDS = {
+    "seconds": (1.5, 0.25),
+    "warm_seconds": (1.5, 0.1),
+    "peak_mb": (1.15, 20),
+    "payload_bytes": (1.05, 1024),
+    "chart_bytes": (1.05, 1024),
+}
+CHART_TYPES = {"arrow_vega_lite_chart", "deck_gl_json_chart", "plotly_chart", "iframe", "imgs"}
+# Metrics taken as the median over repeated runs.
+TIMED = ("seconds", "warm_seconds", "peak_mb")
+
+
+def payload(node, totals=None):
+    """Serialized proto bytes under an AppTest element tree node."""
+    totals = totals if totals is not None else {"payload_bytes": 0, "chart_bytes": 0}
+    proto = getattr(node, "proto", None)
+    if proto is not None and hasattr(proto, "ByteSize"):
+        size = proto.ByteSize()
+        totals["payload_bytes"] += size
+        if getattr(node, "type", None) in CHART_TYPES:
+            totals["chart_bytes"] += size
+    for child in getattr(node, "children", {}).values():
+        payload(child, totals)
+    return totals
+
+
+def measure(page):
+    """Run ``page`` cold then warm in this process; called in the child."""
+    from streamlit.testing.v1 import AppTest
+
+    from utils.ingest import peak_rss_mb
+
+    app = AppTest.from_file(os.path.join(REPO_ROOT, page), default_timeout=600)
+    start = time.perf_counter()
+    app.run()
+    cold = time.perf_counter() - start
+    warm = []
+    for _ in range(WARM_RUNS):
+        start = time.perf_counter()
+        app.run()
+        warm.append(time.perf_counter() - start)
+
+    result = {
+        "seconds": round(cold, 3),
+        "warm_seconds": round(statistics.median(warm), 3),
+        "peak_mb": round(peak_rss_mb() or 0, 1),
+        **payload(app._tree),
+        "errors": [str(e.value) for e in app.exception],
+    }
+    return result
+
+
+def workdir(rows=None, source=None, seed=0):
+    """Directory laid out like the repo root with the dataset in data/."""
+    if source:
+        name = "csv-" + os.path.splitext(os.path.basename(source))[0]
+    else:
+        name = f"synthetic-{rows}-{seed}"
+    directory = os.path.abspath(os.path.join(WORK_ROOT, name))
+    target = os.path.join(directory, SOURCE_NAME)
+    if source:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if not os.path.exists(target):
+            os.symlink(os.path.abspath(source), target)
+    elif not os.path.exists(target):
+        synthetic.generate(rows, target, seed)
+    # The pages also read the catalogs kept in the repo's data/.
+    for data_file in glob.glob(os.path.join(REPO_ROOT, DATA_FILES)):
+        link = os.path.join(directory, "data", os.path.basename(data_file))
+        if not os.path.exists(link):
+            os.symlink(data_file, link)
+    return directory
+
+
+def _child(args, cwd):
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    proc = subprocess.run(
+        [sys.executable, "-m", "utils.bench", *args],
+        cwd=cwd, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"utils.bench {' '.join(args)} failed:\n{proc.stderr[-2000:]}")
+    return proc.stdout
+
+
+def prepare(directory, build=False):
+    """Ingest (and optionally build artifacts) outside the timed runs."""
+    _child(["--prepare"] + (["--build"] if build else []), directory)
+
+
+def run_page(page, directory, repeat=REPEAT):
+    """Median of ``repeat`` fresh-process runs of ``page``."""
+    runs = [json.loads(_child(["--measure", page], directory).splitlines()[-1]) for _ in range(repeat)]
+    result = dict(runs[-1])
+    for metric in TIMED:
+        result[metric] = statistics.median(run[metric] for run in runs)
+    result["errors"] = sorted({error for run in runs for error in run["errors"]})
+    return result
+
+
+def regressions(result, baseline):
+    found = []
+    for metric, (ratio, slack) in THRESHOLDS.items():
+        if metric in baseline and result.get(metric, 0) > baseline[metric] * ratio + slack:
+            found.append(f"{metric} {result[metric]:,} > {baseline[metric]:,} (x{ratio} + {slack})")
+    return found
+
+
+def read_baseline(path=BASELINE_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_baseline(baseline, path=BASELINE_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("pages", nargs="*", default=list(PAGES))
+    parser.add_argument("--rows", type=float, nargs="+", default=[1e5], help="synthetic dataset sizes")
+    parser.add_argument("--source", help="benchmark against this CSV instead of synthetic data")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="processes per page; timings are their median")
+    parser.add_argument("--build", action="store_true", help="serve the pages from built artifacts")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--csv-out", help="also write one row per page and dataset to this CSV")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--prepare", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--measure", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.prepare:
+        from utils import build, columnar
+
+        columnar.ensure()
+        if args.build:
+            build.run(log=lambda line: None)
+        return
+    if args.measure:
+        print(json.dumps(measure(args.measure)))
+        return
+
+    for page in args.pages:
+        if not os.path.exists(os.path.join(REPO_ROOT, page)):
+            parser.error(f"no such page: {page}")
+
+    datasets = [(f"csv:{os.path.basename(args.source)}", None)] if args.source else [
+        (f"{int(rows)}", int(rows)) for rows in args.rows
+    ]
+    baseline = read_baseline(args.baseline)
+    results = []
+    failed = False
+    for key, rows in datasets:
+        key += "+artifacts" if args.build else ""
+        directory = workdir(rows, args.source, args.seed)
+        prepare(directory, args.build)
+        for page in args.pages:
+            result = run_page(page, directory, args.repeat)
+            results.append({"page": page, "dataset": key, **result})
+            print(f"{page:<22} {key:<18} {result['seconds']:7.2f}s cold {result['warm_seconds']:6.2f}s warm "
+                  f"{result['peak_mb']:7.0f} MB {result['payload_bytes'] / 1e3:9,.0f} kB sent")
+            for error in result["errors"]:
+                failed = True
+                print(f"  error: {error}")
+            for problem in regressions(result, baseline.get(page, {}).get(key, {})):
+                failed = True
+                print(f"  regression: {problem}")
+
+    if args.csv_out:
+        with open(args.csv_out, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["page", "dataset", *THRESHOLDS])
+            writer.writeheader()
+            for result in results:
+                writer.writerow({field: result[field] for field in writer.fieldnames})
+    if args.save:
+        for result in results:
+            baseline.setdefault(result["page"], {})[result["dataset"]] = {
+                metric: result[metric] for metric in THRESHOLDS
+            }
+        write_baseline(baseline, args.baseline)
+        print(f"baseline -> {args.baseline}")
+    elif failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Per-value bitmap index over the categorical columns.
+
+Each value of each indexed dimension (aircraft, country, service, operation
+and year) maps to the set of rows holding it. A common value is stored as a
+packed bit array (``np.packbits``, one bit per row). A value covering fewer
+than one row in 32 is stored as its sorted row numbers, which are then
+smaller than the bits (roaring-style containers).
+
+A filter is a tuple of ``(dimension, values)`` pairs. Values of one
+dimension are OR-ed and dimensions are AND-ed. Only the selected values are
+touched, never the rows themselves, so resolving a filter costs a few
+bitwise passes over ``rows / 8`` bytes.
+
+    index = BitmapIndex.build(columns, labels)
+    rows = index.select(((AIRCRAFT, ("B-52",)), ("year", (1968, 1969))))
+"""
+
+import numpy as np
+
+YEAR = "year"
+
+# Values rarer than one row in this many are kept as row numbers: 4 bytes a
+# row against n / 8 bytes of bits.
+SPARSE_RATIO = 32
+
+
+class BitmapIndex:
+    def __init__(self, n_rows, labels, sets):
+        self.n_rows = n_rows
+        self.labels = labels    # dimension -> [label per code]
+        self.sets = sets        # dimension -> [(kind, data, count) per code]
+        self._codes = {name: {label: code for code, label in enumerate(values)} for name, values in labels.items()}
+
+    @classmethod
+    def build(cls, columns, labels):
+        """Index ``columns`` (dimension -> int codes, -1 for missing)."""
+        n_rows = len(next(iter(columns.values()))) if columns else 0
+        sets = {}
+        for name, codes in columns.items():
+            codes = np.asarray(codes)
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(labels[name]) + 1))
+            sets[name] = [_container(order[start:stop], n_rows) for start, stop in zip(bounds[:-1], bounds[1:])]
+        return cls(n_rows, labels, sets)
+
+    def dimensions(self):
+        return list(self.labels)
+
+    def values(self, name):
+        """``(label, rows)`` of every value of ``name``, most common first."""
+        counts = [(label, entry[2]) for label, entry in zip(self.labels[name], self.sets[name]) if entry[2]]
+        return sorted(counts, key=lambda item: -item[1])
+
+    def _union(self, name, values):
+        entries = [self.sets[name][self._codes[name][value]] for value in values if value in self._codes[name]]
+        total = sum(entry[2] for entry in entries)
+        if total * SPARSE_RATIO < self.n_rows and all(entry[0] == "rows" for entry in entries):
+            # A row holds one value per dimension, so the lists are disjoint.
+            return "rows", np.sort(np.concatenate([entry[1] for entry in entries] or [np.empty(0, np.int64)]))
+        bits = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+        loose = [entry[1] for entry in entries if entry[0] == "rows"]
+        for kind, data, _ in entries:
+            if kind == "bits":
+                np.bitwise_or(bits, data, out=bits)
+        if loose:
+            bits |= _pack(np.concatenate(loose), self.n_rows)
+        return "bits", bits
+
+    def select(self, filters, rows=None):
+        """Sorted row numbers matching ``filters``, optionally within ``rows``.
+
+        Returns ``rows`` unchanged (None meaning every row) when nothing is
+        filtered.
+        """
+        result = None
+        for name, values in filters:
+            found = self._union(name, values)
+            result = found if result is None else _intersect(result, found)
+        if result is None:
+            return rows
+        if rows is not None:
+            result = _intersect(result, ("rows", np.asarray(rows)))
+        if result[0] == "bits":
+            return np.flatnonzero(np.unpackbits(result[1], count=self.n_rows, bitorder="little"))
+        return result[1]
+
+    def count(self, filters):
+        rows = self.select(filters)
+        return self.n_rows if rows is None else len(rows)
+
+
+def _pack(rows, n_rows):
+    mask = np.zeros(n_rows, dtype=bool)
+    mask[rows] = True
+    return np.packbits(mask, bitorder="little")
+
+
+def _container(rows, n_rows):
+    if len(rows) * SPARSE_RATIO < n_rows:
+        return "rows", rows.astype(np.int64), len(rows)
+    return "bits", _pack(rows, n_rows), len(rows)
+
+
+def _test(bits, rows):
+    return (bits[rows >> 3] >> (rows & 7).astype(np.uint8)) & 1 == 1
+
+
+def _intersect(a, b):
+    if a[0] == "bits" and b[0] == "bits":
+        return "bits", a[1] & b[1]
+    if a[0] == "rows" and b[0] == "rows":
+        return "rows", np.intersect1d(a[1], b[1], assume_unique=True)
+    rows, bits = (a[1], b[1]) if a[0] == "rows" else (b[1], a[1])
+    return "rows", rows[_test(bits, rows)]
+
+
+def years(dates):
+    """Year codes (-1 for missing) and their labels for a datetime64 column."""
+    year = np.asarray(dates).astype("datetime64[Y]")
+    valid = ~np.isnat(year)
+    values = year[valid].astype(np.int64)
+    first = int(values.min()) if len(values) else 0
+    codes = np.full(len(year), -1, dtype=np.int16)
+    codes[valid] = values - first
+    n_years = int(values.max()) - first + 1 if len(values) else 0
+    return codes, [1970 + first + i for i in range(n_years)]
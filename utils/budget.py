@@ -0,0 +1,183 @@
+"""Payload budget for the charts a page sends to the browser.
+
+Each page rerun may send ``APP_PAGE_KB`` (default 1024) kilobytes of chart
+specs and spend ``APP_RENDER_MS`` (default 2000) milliseconds building them.
+A chart that can be drawn at several levels of detail -- raw rows, a sample,
+bins, a raster image -- offers them to :func:`show`, most detailed first.
+The first level whose serialized spec fits in what the page has left is
+drawn, and the last level is drawn regardless. A level is skipped without
+being built when its estimated size is too large, or when building it took
+longer than the time left on an earlier rerun. A chart is charged the
+serialized size of the spec it drew, which is also what the profile counts
+as sent (:func:`utils.profiling.sent`).
+
+Every choice, with the reason the finer levels were passed over, is logged
+to the ``utils.budget`` logger and, when profiling is on, to the profile.
+
+    budget.show("scatter", [
+        budget.Level("raw", lambda: chart(rows), draw, estimate=budget.rows_bytes(rows)),
+        budget.Level("sampled", lambda: chart(sample), draw),
+    ], key=(region, filters))
+
+Charts with a single level go through :func:`altair_chart`,
+:func:`vega_lite_chart`, :func:`plotly_chart` and :func:`pydeck_chart`, so
+they are measured and counted against the budget too.
+"""
+
+import collections
+import json
+import logging
+import os
+import threading
+import time
+
+import altair as alt
+import streamlit as st
+
+from utils import profiling
+
+PAGE_KB_ENV = "APP_PAGE_KB"
+RENDER_MS_ENV = "APP_RENDER_MS"
+DEFAULT_PAGE_KB = 1024
+DEFAULT_RENDER_MS = 2000
+
+LEVELS = ("raw", "sampled", "binned", "rasterized")
+
+STATE_KEY = "_payload_budget"
+
+logger = logging.getLogger(__name__)
+
+Level = collections.namedtuple("Level", "name build draw estimate", defaults=(None,))
+
+# (page, chart, key, level) -> seconds its last build took, across sessions.
+# Keys include custom regions and filters, so only the most recently used
+# MAX_TIMINGS are kept.
+MAX_TIMINGS = 1024
+_build_seconds = collections.OrderedDict()
+_timings_lock = threading.Lock()
+
+
+def _took(timing_key):
+    with _timings_lock:
+        if timing_key not in _build_seconds:
+            return None
+        _build_seconds.move_to_end(timing_key)
+        return _build_seconds[timing_key]
+
+
+def _record(timing_key, seconds):
+    with _timings_lock:
+        _build_seconds[timing_key] = seconds
+        _build_seconds.move_to_end(timing_key)
+        while len(_build_seconds) > MAX_TIMINGS:
+            _build_seconds.popitem(last=False)
+
+
+def spec_bytes(spec):
+    """Serialized size of a chart spec (Altair, Vega-Lite, Plotly, pydeck, HTML or text)."""
+    if spec is None:
+        return 0
+    if isinstance(spec, (tuple, list)):
+        return sum(spec_bytes(part) for part in spec)
+    if isinstance(spec, str):
+        return len(spec.encode())
+    if isinstance(spec, bytes):
+        return len(spec)
+    if isinstance(spec, dict):
+        return len(json.dumps(spec))
+    if isinstance(spec, alt.TopLevelMixin):
+        # Streamlit embeds every row itself; Altair's 5,000-row guard would
+        # only stop the measurement, and schema validation only slow it.
+        with alt.data_transformers.disable_max_rows():
+            return len(spec.to_json(validate=False, indent=None))
+    return len(spec.to_json())
+
+
+def rows_bytes(df, sample_rows=200):
+    """Estimated JSON size of ``df`` embedded in a spec, from a sample of rows."""
+    if len(df) == 0:
+        return 0
+    sample = df.iloc[:sample_rows]
+    return int(len(sample.to_json(orient="records")) * len(df) / len(sample))
+
+
+def start(page):
+    """Reset the page's allowance at the start of a full rerun."""
+    st.session_state[STATE_KEY] = {
+        "page": page,
+        "bytes": float(os.environ.get(PAGE_KB_ENV, DEFAULT_PAGE_KB)) * 1000,
+        "seconds": float(os.environ.get(RENDER_MS_ENV, DEFAULT_RENDER_MS)) / 1000,
+        # chart -> (bytes, seconds). A fragment rerun replaces only its own
+        # charts' entries.
+        "spent": {},
+    }
+
+
+def _state():
+    state = st.session_state.get(STATE_KEY)
+    if state is None:
+        start(None)
+        state = st.session_state[STATE_KEY]
+    return state
+
+
+def _kb(size):
+    return f"{size / 1000:,.0f} kB"
+
+
+def show(name, levels, key=None):
+    """Draw chart ``name`` at the most detailed level that fits; returns its name."""
+    state = _state()
+    others = [spent for chart, spent in state["spent"].items() if chart != name]
+    bytes_left = state["bytes"] - sum(size for size, _ in others)
+    seconds_left = state["seconds"] - sum(seconds for _, seconds in others)
+
+    skipped = []
+    for i, level in enumerate(levels):
+        last = i == len(levels) - 1
+        timing_key = (state["page"], name, key, level.name)
+        if not last:
+            if level.estimate is not None and level.estimate > bytes_left:
+                skipped.append(f"{level.name} ~{_kb(level.estimate)} > {_kb(bytes_left)} left")
+                continue
+            took = _took(timing_key)
+            if took is not None and took > seconds_left:
+                skipped.append(f"{level.name} took {took * 1000:,.0f} ms > {seconds_left * 1000:,.0f} ms left")
+                continue
+
+        begin = time.perf_counter()
+        spec = level.build()
+        seconds = time.perf_counter() - begin
+        _record(timing_key, seconds)
+        size = spec_bytes(spec)
+        if not last and size > bytes_left:
+            skipped.append(f"{level.name} {_kb(size)} > {_kb(bytes_left)} left")
+            continue
+
+        level.draw(spec)
+        profiling.sent(size)
+        state["spent"][name] = (size, seconds)
+        reason = "; ".join(skipped) or ("only level" if len(levels) == 1 else "fits")
+        logger.info("%s/%s: %s, %s in %.0f ms (%s)", state["page"], name, level.name, _kb(size), seconds * 1000, reason)
+        profiling.note(f"{name} [{level.name}]", sent_bytes=size, build_seconds=round(seconds, 4), reason=reason)
+        return level.name
+
+
+def altair_chart(name, chart, level="raw", slot=None):
+    target = slot or st
+    return show(name, [Level(level, lambda: chart, lambda spec: target.altair_chart(spec, use_container_width=True))])
+
+
+def vega_lite_chart(name, spec, level="raw", slot=None):
+    target = slot or st
+    return show(name, [Level(level, lambda: spec, lambda spec: target.vega_lite_chart(spec, use_container_width=True))])
+
+
+def plotly_chart(name, figure, level="raw", slot=None):
+    target = slot or st
+    return show(name, [Level(level, lambda: figure, lambda spec: target.plotly_chart(spec, use_container_width=True))])
+
+
+def pydeck_chart(name, deck, level="binned", slot=None):
+    target = slot or st
+    return show(name, [Level(level, lambda: deck, target.pydeck_chart)])
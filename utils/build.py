@@ -0,0 +1,244 @@
+"""Offline data build.
+
+Runs the data shaping the pages would otherwise do at request time and writes
+the results under ``artifacts/`` (read back through :mod:`utils.artifacts`).
+Each artifact's inputs -- the source CSV, the source of the modules that
+produce it and the outputs of artifacts it depends on -- are hashed, and an
+artifact is only rebuilt when that hash changes.
+
+Usage::
+
+    python -m utils.build [--source data/vietnam_bombing_trimmed.csv] [--force] [name ...]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+from utils import artifacts, columnar, herbicides, hexbin, histogram, images, ingest, mapreduce, tiles, timecube, weapons
+from utils.artifacts import ARTIFACT_ROOT, MANIFEST_FILE
+from utils.columnar import DATE, LAT, LON, WEAPONS
+
+# Bump to force a full rebuild when the artifact layout changes.
+BUILD_VERSION = 1
+
+
+def sha256_file(file_path):
+    return columnar.file_hash(file_path)
+
+
+def sha256_json(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+
+def write_json(file_path, records):
+    with open(file_path, "w") as f:
+        json.dump(records, f, separators=(",", ":"))
+
+
+# -- builders ---------------------------------------------------------------
+# Each builder writes its files into ``out`` and returns nothing. ``ctx``
+# carries the source path and the output directories of finished artifacts.
+
+def build_bombing_columns(ctx, out):
+    columnar.build(ctx["source"], out)
+
+
+def _columns(ctx, names):
+    return columnar.load_dir(ctx["dirs"]["bombing-columns"], names)
+
+
+def build_hex_pyramid(ctx, out):
+    pyramid = mapreduce.hex_pyramid(ctx["dirs"]["bombing-columns"])
+    for radius, cells in pyramid.items():
+        cells["norm"] = (cells["count"] / cells["count"].max()).round(3)
+        np.savez(os.path.join(out, f"hex_{radius}.npz"), **{c: cells[c].to_numpy() for c in cells})
+
+
+def build_histograms(ctx, out):
+    tables = mapreduce.histogram_tables(ctx["dirs"]["bombing-columns"], WEAPONS, bins=40)
+    for name, log in (("linear", False), ("log", True)):
+        write_json(os.path.join(out, f"{name}.json"), tables[log].to_dict(orient="records"))
+
+
+def build_time_cube(ctx, out):
+    available = columnar.read_meta(ctx["dirs"]["bombing-columns"])["columns"]
+    if DATE not in available:
+        return
+    cube = mapreduce.time_cube(ctx["dirs"]["bombing-columns"])
+    np.savez(
+        os.path.join(out, "cube.npz"),
+        months=cube.months, lat=cube.lat, lon=cube.lon,
+        counts=cube.counts, weapons=cube.weapons, cell_deg=cube.cell_deg,
+    )
+
+
+def build_tiles(ctx, out):
+    df = _columns(ctx, [LAT, LON, WEAPONS])
+    source = columnar.read_meta(ctx["dirs"]["bombing-columns"])["version"]
+    tiles.build(df[LAT], df[LON], df[WEAPONS], source, root=out)
+
+
+def build_weapons(ctx, out):
+    compiled = weapons.compile_catalog(weapons.load_catalog(), weapons.catalog_hash())
+    write_json(os.path.join(out, "specs.json"), compiled)
+
+
+def build_herbicides(ctx, out):
+    write_json(os.path.join(out, "herbicides.json"), herbicides.herbicide_table().to_dict(orient="records"))
+
+
+def build_images(ctx, out):
+    # Downloads any original missing from assets/images first; one that
+    # cannot be downloaded is left out.
+    images.build(out)
+
+
+# name -> (builder, modules whose source is an input, upstream artifacts, needs the CSV)
+ARTIFACTS = {
+    "bombing-columns": (build_bombing_columns, (ingest, columnar), (), True),
+    "hex-pyramid": (build_hex_pyramid, (hexbin, mapreduce), ("bombing-columns",), True),
+    "histograms": (build_histograms, (histogram, mapreduce), ("bombing-columns",), True),
+    "time-cube": (build_time_cube, (timecube, mapreduce), ("bombing-columns",), True),
+    "tiles": (build_tiles, (tiles,), ("bombing-columns",), True),
+    "weapons": (build_weapons, (weapons,), (), False),
+    "herbicides": (build_herbicides, (herbicides,), (), False),
+    "images": (build_images, (images,), (), False),
+}
+
+
+def read_manifest(root=ARTIFACT_ROOT):
+    try:
+        with open(os.path.join(root, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"version": BUILD_VERSION, "artifacts": {}}
+
+
+def write_manifest(manifest, root=ARTIFACT_ROOT):
+    tmp = os.path.join(root, MANIFEST_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, os.path.join(root, MANIFEST_FILE))
+
+
+# Data files, besides the source CSV, whose contents are an input.
+DATA_FILES = {"weapons": (weapons.CATALOG_FILE,)}
+
+# Artifacts written somewhere other than <root>/<name>; tiles must sit under
+# static/ to be served. Only for the default root: a build into another
+# root (--out) keeps every artifact under it.
+OUTPUT_DIRS = {"tiles": tiles.TILE_ROOT, "images": images.IMAGE_ROOT}
+
+
+def output_dir(name, root=ARTIFACT_ROOT):
+    if os.path.abspath(root) == os.path.abspath(ARTIFACT_ROOT) and name in OUTPUT_DIRS:
+        return OUTPUT_DIRS[name]
+    return os.path.join(root, name)
+
+
+def hash_outputs(out):
+    files = {}
+    for directory, _, names in os.walk(out):
+        for name in names:
+            file_path = os.path.join(directory, name)
+            files[os.path.relpath(file_path, out).replace(os.sep, "/")] = sha256_file(file_path)
+    return dict(sorted(files.items()))
+
+
+def is_current(found, inputs_hash, out):
+    if found is None or found["inputs"] != inputs_hash:
+        return False
+    # Outputs edited or deleted by hand also trigger a rebuild.
+    return all(
+        os.path.exists(os.path.join(out, name)) and sha256_file(os.path.join(out, name)) == digest
+        for name, digest in found["files"].items()
+    )
+
+
+def run(source=columnar.SOURCE_CSV, root=ARTIFACT_ROOT, names=None, force=False, log=print):
+    """Build the requested artifacts (and what they depend on)."""
+    os.makedirs(root, exist_ok=True)
+    manifest = read_manifest(root)
+    if manifest.get("version") != BUILD_VERSION:
+        manifest = {"version": BUILD_VERSION, "artifacts": {}}
+
+    has_source = os.path.exists(source)
+    # The source CSV with its delta files, as columnar.version() reports it.
+    source_hash = columnar.source_version(source) if has_source else None
+    ctx = {"source": source, "dirs": {}}
+
+    wanted = set(names or ARTIFACTS)
+    for name in list(wanted):
+        wanted.update(ARTIFACTS[name][2])
+
+    for name, (builder, modules, after, needs_source) in ARTIFACTS.items():
+        if name not in wanted:
+            continue
+        out = output_dir(name, root)
+        ctx["dirs"][name] = out
+        if needs_source and not has_source:
+            log(f"skip   {name} (no {source})")
+            continue
+        if any(dep not in manifest["artifacts"] for dep in after):
+            log(f"skip   {name} (missing {', '.join(after)})")
+            continue
+
+        inputs = {
+            "build": BUILD_VERSION,
+            "code": artifacts.code_hash(*modules),
+            "source": source_hash if needs_source else None,
+            "after": [manifest["artifacts"][dep]["files"] for dep in after],
+        }
+        if name in DATA_FILES:
+            inputs["data"] = {file: sha256_file(file) for file in DATA_FILES[name]}
+        inputs_hash = sha256_json(inputs)
+        found = manifest["artifacts"].get(name)
+        if not force and is_current(found, inputs_hash, out):
+            log(f"fresh  {name}")
+            continue
+
+        started = time.perf_counter()
+        tmp = f"{out}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        builder(ctx, tmp)
+        shutil.rmtree(out, ignore_errors=True)
+        os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+        os.replace(tmp, out)
+
+        manifest["artifacts"][name] = {
+            "inputs": inputs_hash,
+            "source": source_hash if needs_source else None,
+            "code": artifacts.code_hash(*modules),
+            "files": hash_outputs(out),
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        write_manifest(manifest, root)
+        log(f"built  {name} in {time.perf_counter() - started:.2f}s")
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the app's data artifacts.")
+    parser.add_argument("names", nargs="*", metavar="name",
+                        help=f"artifacts to build (default: all of {', '.join(ARTIFACTS)})")
+    parser.add_argument("--source", default=columnar.SOURCE_CSV)
+    parser.add_argument("--out", default=ARTIFACT_ROOT,
+                        help=f"artifact root; only with the default, {ARTIFACT_ROOT}, do tiles and images go under static/")
+    parser.add_argument("--force", action="store_true", help="rebuild even if up to date")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.names if name not in ARTIFACTS]
+    if unknown:
+        parser.error(f"unknown artifacts: {', '.join(unknown)}")
+    run(args.source, args.out, args.names or None, args.force)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
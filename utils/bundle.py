@@ -0,0 +1,147 @@
+"""Prepare the static in-browser (stlite) deployment.
+
+Downloads the stlite release pinned in ``stlite.json`` into
+``vendor/stlite/``, deck.gl (pinned under ``deck_gl``) into
+``static/vendor/deck.gl/`` and the wheels listed under ``lazy_requirements``
+into ``vendor/wheels/`` (with an ``index.json`` for :mod:`utils.lazydeps`).
+The SRI hashes of stlite's entry files and of deck.gl are recorded in
+``stlite.json``, and the ``files`` list that index.html mounts is refreshed.
+Serve the repository root as static files afterwards; nothing is fetched
+from a CDN at runtime except Pyodide's own packages.
+
+Without this step index.html falls back to the same pinned stlite release
+on jsDelivr, checked against the recorded hashes when there are any, and the
+Bombs page explains that no data is deployed.
+
+Usage::
+
+    python -m utils.bundle
+"""
+
+import base64
+import glob
+import hashlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import urllib.request
+
+CONFIG_FILE = "stlite.json"
+VENDOR_DIR = "vendor"
+NPM_TARBALL = "https://registry.npmjs.org/@stlite/browser/-/browser-{version}.tgz"
+# Loaded by index.html; their hashes also guard the CDN fallback there.
+STLITE_ENTRY_FILES = ("stlite.js", "stlite.css")
+DECK_TARBALL = "https://registry.npmjs.org/deck.gl/-/deck.gl-{version}.tgz"
+DECK_DIR = "static/vendor/deck.gl"
+
+# Files index.html mounts into the browser filesystem.
+FILE_PATTERNS = (
+    "Home.py",
+    "pages/*.py",
+    "utils/*.py",
+    "data/*.json",
+    "artifacts/manifest.json",
+    "artifacts/*/*",
+    "static/*/meta.json",
+    ".streamlit/config.toml",
+    "vendor/wheels/index.json",
+    CONFIG_FILE,
+)
+
+
+def read_config():
+    with open(CONFIG_FILE) as f:
+        return json.load(f)
+
+
+def write_config(config):
+    with open(CONFIG_FILE, "w") as f:
+        json.dump(config, f, indent=4)
+        f.write("\n")
+
+
+def integrity(data):
+    return "sha384-" + base64.b64encode(hashlib.sha384(data).digest()).decode("ascii")
+
+
+def vendor_stlite(version, out):
+    """Extract stlite's browser build into ``out``; returns the SRI hashes of its entry files."""
+    with urllib.request.urlopen(NPM_TARBALL.format(version=version)) as response:
+        data = response.read()
+    shutil.rmtree(out, ignore_errors=True)
+    hashes = {}
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        for member in tar.getmembers():
+            if not member.isfile() or not member.name.startswith("package/build/"):
+                continue
+            name = member.name[len("package/build/"):]
+            target = os.path.join(out, name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with tar.extractfile(member) as src:
+                content = src.read()
+            with open(target, "wb") as dst:
+                dst.write(content)
+            if name in STLITE_ENTRY_FILES:
+                hashes[name] = integrity(content)
+    return hashes
+
+
+def vendor_deck(version, out):
+    """Extract deck.gl's standalone bundle into ``out``; returns its SRI hash."""
+    with urllib.request.urlopen(DECK_TARBALL.format(version=version)) as response:
+        data = response.read()
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        script = tar.extractfile("package/dist.min.js").read()
+    shutil.rmtree(out, ignore_errors=True)
+    os.makedirs(out)
+    with open(os.path.join(out, "dist.min.js"), "wb") as f:
+        f.write(script)
+    return integrity(script)
+
+
+def vendor_wheels(lazy, out):
+    shutil.rmtree(out, ignore_errors=True)
+    os.makedirs(out)
+    pins = [spec["pin"] for spec in lazy.values()]
+    subprocess.run(
+        [sys.executable, "-m", "pip", "download", "--no-deps", "--only-binary=:all:", "-d", out, *pins],
+        check=True,
+    )
+    index = {}
+    for wheel in sorted(os.listdir(out)):
+        dist = wheel.split("-")[0].replace("_", "-").lower()
+        for name in lazy:
+            if name.replace("_", "-").lower() == dist:
+                index[name] = wheel
+    with open(os.path.join(out, "index.json"), "w") as f:
+        json.dump(index, f, indent=2)
+    return index
+
+
+def mounted_files():
+    files = set()
+    for pattern in FILE_PATTERNS:
+        files.update(path for path in glob.glob(pattern) if os.path.isfile(path))
+    return sorted(path.replace(os.sep, "/") for path in files)
+
+
+def main():
+    config = read_config()
+    config["stlite_integrity"] = vendor_stlite(config["stlite"], os.path.join(VENDOR_DIR, "stlite"))
+    print(f"stlite {config['stlite']} -> {VENDOR_DIR}/stlite")
+    deck = config["deck_gl"]
+    deck["integrity"] = vendor_deck(deck["version"], f"{DECK_DIR}/{deck['version']}")
+    print(f"deck.gl {deck['version']} -> {DECK_DIR}/{deck['version']} ({deck['integrity']})")
+    index = vendor_wheels(config["lazy_requirements"], os.path.join(VENDOR_DIR, "wheels"))
+    print(f"wheels: {', '.join(index.values())}")
+    config["files"] = mounted_files()
+    write_config(config)
+    print(f"{len(config['files'])} files listed in {CONFIG_FILE}")
+
+
+if __name__ == "__main__":
+    main()
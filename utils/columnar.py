@@ -0,0 +1,308 @@
+"""Columnar on-disk cache for the bombing dataset.
+
+The CSV is streamed once through :mod:`utils.ingest` into one ``.npy`` file
+per column under ``data/.cache/``. The cache is keyed on the source file's
+size, mtime and content hash, so every later rerun (and every other session
+or server process) only maps the columns it needs in compact dtypes. Delta
+files of new records are appended to it (see :mod:`utils.delta`).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from utils import ingest
+from utils.ingest import AIRCRAFT, COUNTRY, DATE, LAT, LON, OPERATION, SERVICE, WEAPONS
+
+try:
+    import fcntl
+except ImportError:  # Windows / Pyodide
+    fcntl = None
+
+SOURCE_CSV = "data/vietnam_bombing_trimmed.csv"
+CACHE_ROOT = "data/.cache"
+
+# Columns shipped by the offline build (python -m utils.build). Used instead
+# of parsing when they were built from the same CSV, or when the CSV itself
+# is not deployed.
+PREBUILT_DIR = "artifacts/bombing-columns"
+
+META_FILE = "meta.json"
+
+# Bump when the on-disk layout or the rows ingest keeps change, so old
+# caches (and the artifacts keyed on their version) are rebuilt.
+FORMAT_VERSION = 6
+# Pyodide has no real mmap; elsewhere columns are mapped, not read.
+MMAP_MODE = None if sys.platform == "emscripten" else "r"
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_dir(path=SOURCE_CSV):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_ROOT, name)
+
+
+def read_meta(directory):
+    try:
+        with open(os.path.join(directory, META_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_meta(directory, meta):
+    tmp = os.path.join(directory, META_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, os.path.join(directory, META_FILE))
+
+
+def build(path=SOURCE_CSV, out=None, chunk_rows=ingest.CHUNK_ROWS, progress=None):
+    """Stream the CSV and its deltas into one .npy per column and record their fingerprints."""
+    from utils import delta
+
+    out = out or cache_dir(path)
+    stat = os.stat(path)
+
+    # Write into a directory private to this call and swap it in, so a
+    # concurrent reader never sees a half-written cache.
+    tmp = f"{out}.tmp-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    stats = ingest.ingest_csv(path, tmp, chunk_rows, progress)
+    digest = file_hash(path)
+    write_meta(tmp, {
+        "format": FORMAT_VERSION,
+        "source": os.path.abspath(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": digest,
+        # The source hash under this format, chained with each delta applied
+        # (see utils.delta).
+        "version": base_version(digest),
+        "rows": stats["rows"],
+        "columns": stats["columns"],
+        "ingest": stats,
+        "deltas": [],
+    })
+    delta.apply(tmp, path, chunk_rows)
+    publish(tmp, out)
+    return out
+
+
+def publish(tmp, out):
+    """Swap the directory ``tmp`` in as ``out``.
+
+    The old ``out`` is renamed aside first and deleted after, so ``out`` is
+    only missing between two renames, never while a tree is removed, and
+    columns already mapped from it stay valid.
+    """
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    aside = f"{out}.old-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    try:
+        os.replace(out, aside)
+    except FileNotFoundError:
+        aside = None
+    os.replace(tmp, out)
+    if aside is not None:
+        shutil.rmtree(aside, ignore_errors=True)
+
+
+_lock_guard = threading.Lock()
+_thread_locks = {}
+
+
+class CacheLock:
+    """Exclusive lock on checking and (re)building the cache at ``out``.
+
+    Held between threads, and between server processes where the platform
+    has flock. The lock file sits next to the cache directory, so it
+    survives the directory being swapped.
+    """
+
+    def __init__(self, out):
+        self.path = f"{out}.lock"
+        with _lock_guard:
+            self.thread_lock = _thread_locks.setdefault(os.path.abspath(self.path), threading.Lock())
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        self.file = None
+        try:
+            if fcntl is not None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self.file = open(self.path, "a")
+                fcntl.flock(self.file, fcntl.LOCK_EX)
+        except BaseException:
+            self.thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        if self.file is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+            self.file.close()
+        self.thread_lock.release()
+
+
+_prebuilt_matches = {}
+
+
+def prebuilt_for(path):
+    """True if the shipped prebuilt columns were built from ``path``."""
+    from utils import delta
+
+    prebuilt = read_meta(PREBUILT_DIR)
+    if path != SOURCE_CSV or prebuilt is None or prebuilt.get("format") != FORMAT_VERSION:
+        return False
+    if delta.status(prebuilt, path)[0] != "current":
+        return False
+    if not os.path.exists(path):
+        return True
+    stat = os.stat(path)
+    if prebuilt["size"] != stat.st_size:
+        return False
+    if prebuilt["mtime_ns"] == stat.st_mtime_ns:
+        return True
+    # Hash at most once per process for a given file state.
+    key = (stat.st_size, stat.st_mtime_ns, prebuilt["sha256"])
+    if key not in _prebuilt_matches:
+        _prebuilt_matches[key] = file_hash(path) == prebuilt["sha256"]
+    return _prebuilt_matches[key]
+
+
+def has_source(path=SOURCE_CSV):
+    """True if there is something to load: the CSV, or prebuilt columns of it."""
+    return os.path.exists(path) or prebuilt_for(path)
+
+
+def ensure(path=SOURCE_CSV):
+    """Return the cache directory for ``path``, rebuilding it if stale."""
+    if prebuilt_for(path):
+        return PREBUILT_DIR
+
+    out = cache_dir(path)
+    # Every rerun comes through here, so a current cache is answered without
+    # the lock; anything else is checked again, and fixed, under it.
+    if _is_current(path, read_meta(out)):
+        return out
+    with CacheLock(out):
+        return _refresh(path, out)
+
+
+def _is_current(path, meta):
+    from utils import delta
+
+    if meta is None or meta.get("format") != FORMAT_VERSION:
+        return False
+    stat = os.stat(path)
+    if meta["size"] != stat.st_size or meta["mtime_ns"] != stat.st_mtime_ns:
+        return False
+    return delta.status(meta, path)[0] == "current"
+
+
+def _refresh(path, out):
+    # Another caller may have built or updated the cache while this one
+    # waited for the lock.
+    meta = read_meta(out)
+    if meta is None or meta.get("format") != FORMAT_VERSION:
+        return build(path, out)
+
+    stat = os.stat(path)
+    if meta["size"] == stat.st_size and meta["mtime_ns"] == stat.st_mtime_ns:
+        return _with_deltas(path, out, meta)
+
+    # Same size but a new mtime (e.g. a fresh checkout): only rebuild if the
+    # contents actually changed.
+    if meta["size"] == stat.st_size and meta["sha256"] == file_hash(path):
+        meta["mtime_ns"] = stat.st_mtime_ns
+        write_meta(out, meta)
+        return _with_deltas(path, out, meta)
+    return build(path, out)
+
+
+def _with_deltas(path, out, meta):
+    from utils import delta
+
+    state, _ = delta.status(meta, path)
+    if state == "current":
+        return out
+    # New delta files cost their own rows only; anything else rebuilds.
+    if state == "pending" and delta.apply(out, path) is not None:
+        return out
+    return build(path, out)
+
+
+def base_version(digest):
+    # A format change (e.g. which rows ingest keeps) must also move the
+    # version, or artifacts built from the old columns would still match.
+    return hashlib.sha256(f"format-{FORMAT_VERSION}:{digest}".encode()).hexdigest()
+
+
+def source_version(path=SOURCE_CSV):
+    """The version a cache of ``path`` and its current deltas will have."""
+    from utils import delta
+
+    version = base_version(file_hash(path))
+    for delta_path in delta.delta_files(path):
+        version = delta.chain(version, delta.file_hash(delta_path))
+    return version
+
+
+def version(path=SOURCE_CSV):
+    """Content hash of the cached source and its deltas, for keying derived results."""
+    return read_meta(ensure(path))["version"]
+
+
+def available(path=SOURCE_CSV):
+    """Names of the columns the cached source provides."""
+    return list(read_meta(ensure(path))["columns"])
+
+
+def load_column(directory, name, rows=None):
+    """One cached column, memory-mapped read-only where the platform allows.
+
+    Every process mapping the same file shares the OS page cache instead of
+    holding its own copy, and opening a column costs no parsing or reading.
+    The column is cut to ``rows``, by default the row count in ``meta.json``:
+    a delta being applied swaps in longer files before it raises the count.
+
+    Category columns with fewer than 128 values are the exception:
+    ``Categorical.from_codes`` narrows their int16 codes to int8, so they
+    come back as a private copy of one byte a row rather than a mapping.
+    """
+    if rows is None:
+        rows = read_meta(directory)["rows"]
+    values = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=MMAP_MODE)[:rows]
+    if ingest.SCHEMA[name] != "category":
+        return values
+    with open(os.path.join(directory, f"{name}.categories.json")) as f:
+        categories = json.load(f)
+    return pd.Categorical.from_codes(values, categories)
+
+
+def load_dir(directory, columns=None):
+    # One read of the metadata, so every column has the same length.
+    meta = read_meta(directory)
+    columns = columns or list(meta["columns"])
+    # copy=False keeps the numeric and date columns as views of the mapped
+    # files; category codes are copied (see load_column).
+    return pd.DataFrame({name: load_column(directory, name, meta["rows"]) for name in columns}, copy=False)
+
+
+def load_columns(columns=None, path=SOURCE_CSV):
+    """Load the requested cached columns as a DataFrame."""
+    return load_dir(ensure(path), columns)
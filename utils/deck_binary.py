@@ -0,0 +1,227 @@
+"""Binary transport for large deck.gl point layers.
+
+``st.pydeck_chart`` serializes its data as a JSON array of row objects, which
+for hundreds of thousands of strikes dominates both server encoding and
+browser parsing. Here the columns are packed into contiguous little-endian
+buffers -- float32 positions and uint16 weapon counts -- base64-encoded into
+a small standalone deck.gl page and handed to the layer as binary attributes,
+so no per-row objects exist on either side.
+
+The same page can carry the rows as JSON objects instead
+(``transport="json"``), so both transports are measured the same way: the
+page reports its payload size and time to first frame in an overlay, and
+:func:`scatter_html` returns the server-side encode time.
+
+deck.gl is not fetched from a CDN. ``python -m utils.bundle`` vendors the
+version pinned under ``deck_gl`` in ``stlite.json`` into ``static/vendor/``
+and records its SRI hash; until then, or if the file no longer matches the
+hash, :func:`deck_script` is None and the pages leave the all-strikes modes
+out. Streamlit's ``app/static`` handler serves ``.js`` as ``text/plain``
+with ``nosniff``, which browsers refuse to run, so the server hands the
+directory out as a component path instead, which is served with a
+JavaScript type. No basemap is drawn unless ``APP_BASEMAP`` names a raster
+tile URL template.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+CONFIG_FILE = "stlite.json"
+DECK_ROOT = "static/vendor/deck.gl"
+BASEMAP_ENV = "APP_BASEMAP"
+
+_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8" />
+<script>window.__t0 = performance.now();</script>
+<script src="%(deck_script)s" integrity="%(integrity)s" crossorigin="anonymous"></script>
+<style>
+  html, body, #map { margin: 0; width: 100%%; height: 100%%; overflow: hidden; background: #f4f4f2; }
+  #stats { position: absolute; left: 8px; bottom: 8px; padding: 2px 6px; font: 12px sans-serif;
+           background: rgba(255, 255, 255, 0.8); border-radius: 3px; }
+</style>
+</head>
+<body>
+<div id="map"></div>
+<div id="stats"></div>
+<script>
+const payload = %(payload)s;
+const basemapUrl = %(basemap)s;
+function decode(b64, Type) {
+  const bytes = Uint8Array.from(atob(b64), (c) => c.charCodeAt(0));
+  return new Type(bytes.buffer);
+}
+let data, weapons, accessors;
+if (payload.transport === "binary") {
+  weapons = decode(payload.weapons, Uint16Array);
+  data = {length: payload.length, attributes: {getPosition: {value: decode(payload.positions, Float32Array), size: 2}}};
+  accessors = {};
+} else {
+  // Row objects, as st.pydeck_chart sends them.
+  weapons = payload.rows.map((row) => row.weapons);
+  data = payload.rows;
+  accessors = {getPosition: (row) => [row.lon, row.lat]};
+}
+const maxWeapons = Math.max(payload.max_weapons, 1);
+
+const layers = [];
+if (basemapUrl) {
+  layers.push(new deck.TileLayer({
+    id: "basemap",
+    data: basemapUrl,
+    tileSize: 256,
+    renderSubLayers: (props) => {
+      const [[west, south], [east, north]] = props.tile.boundingBox;
+      return new deck.BitmapLayer(props, {data: null, image: props.data, bounds: [west, south, east, north]});
+    },
+  }));
+}
+layers.push(new deck.ScatterplotLayer({
+  id: "strikes",
+  data,
+  ...accessors,
+  getFillColor: (_, {index}) => [255, 180 - 180 * Math.min(weapons[index] / maxWeapons, 1), 0, 160],
+  getRadius: 2,
+  radiusUnits: "pixels",
+  pickable: true,
+}));
+
+let firstFrame = null;
+new deck.Deck({
+  parent: document.getElementById("map"),
+  initialViewState: %(view_state)s,
+  controller: true,
+  layers,
+  getTooltip: ({index, layer}) => layer && layer.id === "strikes" && index >= 0
+    ? `Weapons Delivered: ${weapons[index]}` : null,
+  onAfterRender: () => {
+    if (firstFrame !== null) return;
+    firstFrame = performance.now() - window.__t0;
+    document.getElementById("stats").textContent =
+      `${payload.length.toLocaleString()} strikes, ${(%(payload_bytes)d / 1e6).toFixed(2)} MB ${payload.transport}, ` +
+      `first frame ${firstFrame.toFixed(0)} ms`;
+  },
+});
+</script>
+</body>
+</html>
+"""
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+_verified = {}
+_components = {}
+
+
+def _matches(file_path, integrity):
+    # Hashed once per file state; a tampered or half-copied file is refused
+    # here rather than by the browser.
+    stat = os.stat(file_path)
+    key = (file_path, stat.st_size, stat.st_mtime_ns, integrity)
+    if key not in _verified:
+        algorithm, _, digest = integrity.partition("-")
+        with open(file_path, "rb") as f:
+            actual = base64.b64encode(hashlib.new(algorithm, f.read()).digest()).decode("ascii")
+        _verified[key] = actual == digest
+    return _verified[key]
+
+
+def _component_url(directory):
+    # Files of a declared component are served with their real MIME type.
+    import streamlit.components.v1 as components
+
+    if directory not in _components:
+        _components[directory] = components.declare_component("deck_gl", path=directory).name
+    return f"component/{_components[directory]}"
+
+
+def deck_script():
+    """``(url, integrity)`` of the vendored deck.gl bundle, or None if not vendored."""
+    pinned = _read_json(CONFIG_FILE).get("deck_gl", {})
+    if not pinned.get("version") or not pinned.get("integrity"):
+        return None
+    directory = f"{DECK_ROOT}/{pinned['version']}"
+    # stlite has no server: the browser fetches the file relative to the
+    # page hosting index.html, from a static host that sends a JavaScript
+    # type (and the file is not in the Pyodide filesystem to check).
+    if sys.platform == "emscripten":
+        return f"{directory}/dist.min.js", pinned["integrity"]
+    file_path = f"{directory}/dist.min.js"
+    if not os.path.exists(file_path) or not _matches(file_path, pinned["integrity"]):
+        return None
+    return f"{_component_url(os.path.abspath(directory))}/dist.min.js", pinned["integrity"]
+
+
+def encode(values, dtype):
+    return base64.b64encode(np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder("<")).tobytes()).decode("ascii")
+
+
+def _weapon_counts(weapons):
+    return np.clip(np.nan_to_num(np.asarray(weapons, dtype=np.float64)), 0, np.iinfo(np.uint16).max)
+
+
+def pack(lat, lon, weapons):
+    """The binary payload for a set of strikes, as JSON text."""
+    positions = np.column_stack((np.asarray(lon, dtype=np.float32), np.asarray(lat, dtype=np.float32)))
+    counts = _weapon_counts(weapons)
+    return json.dumps({
+        "transport": "binary",
+        "length": len(positions),
+        "positions": encode(positions, np.float32),
+        "weapons": encode(counts, np.uint16),
+        "max_weapons": int(np.percentile(counts, 99)) if len(counts) else 0,
+    })
+
+
+def pack_rows(lat, lon, weapons):
+    """The same strikes as JSON row objects, the way pydeck would send them."""
+    counts = _weapon_counts(weapons)
+    rows = pd.DataFrame({"lon": np.asarray(lon, dtype=np.float64), "lat": np.asarray(lat, dtype=np.float64),
+                         "weapons": counts.astype(np.int64)})
+    header = json.dumps({"transport": "json", "length": len(rows),
+                         "max_weapons": int(np.percentile(counts, 99)) if len(counts) else 0})
+    return header[:-1] + ', "rows": ' + rows.to_json(orient="records") + "}"
+
+
+def scatter_html(lat, lon, weapons, view_state, transport="binary"):
+    """Standalone deck.gl page plotting every strike; returns ``(html, stats)``.
+
+    ``stats`` holds the payload bytes and the seconds spent encoding it.
+    """
+    script = deck_script()
+    if script is None:
+        raise RuntimeError("deck.gl is not vendored; run python -m utils.bundle")
+    started = time.perf_counter()
+    payload = pack(lat, lon, weapons) if transport == "binary" else pack_rows(lat, lon, weapons)
+    seconds = time.perf_counter() - started
+    html = _TEMPLATE % {
+        "deck_script": script[0],
+        "integrity": script[1],
+        "payload": payload,
+        "payload_bytes": len(payload),
+        "basemap": json.dumps(os.environ.get(BASEMAP_ENV) or None),
+        "view_state": json.dumps(view_state),
+    }
+    return html, {"transport": transport, "bytes": len(payload), "seconds": seconds}
+
+
+def html_bytes(n_rows):
+    """Size of the binary :func:`scatter_html` page for ``n_rows`` strikes, without building it."""
+    empty = len(_TEMPLATE) + len(pack([], [], [])) + 256
+    # 8 bytes of position and 2 of weapons per strike, base64-encoded.
+    return empty + 4 * -(-8 * n_rows // 3) + 4 * -(-2 * n_rows // 3)
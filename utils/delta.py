@@ -0,0 +1,277 @@
+"""Incremental ingestion of new mission records.
+
+New records for a source CSV arrive as further CSV files with the same
+columns, dropped into ``data/deltas/<source name>/``. They are applied in
+file-name order, so name them to sort after the ones already there (a date
+prefix works). The column cache keeps a watermark: the name, size and
+sha256 of every delta file already folded in. Only files past it are read.
+
+A pending file is streamed through :mod:`utils.ingest` on its own. Its rows
+are appended to copies of the cached ``.npy`` columns, with category codes
+mapped onto the cache's dictionaries, and each copy is renamed over its
+column. Readers that mapped a column keep the file they opened, and the
+loaders cut every column to the row count in ``meta.json``, which is only
+raised once all of them are swapped in. The same rows are then folded into
+the stored aggregates (:mod:`utils.aggregates`). The cache version moves on
+to the hash of the previous version and the new file, so everything keyed
+on it is recomputed once, from the grown columns and the folded aggregates.
+
+Deltas are append-only. If a file behind the watermark is edited, removed or
+preceded by a new one, the cache is rebuilt from scratch (source plus every
+delta), as it is when the source CSV itself changes.
+
+Run ``python -m utils.delta [--source <csv>]`` to apply pending deltas by
+hand and print what was folded in.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from utils import columnar, ingest
+
+try:
+    import fcntl
+except ImportError:  # Windows / Pyodide
+    fcntl = None
+
+DELTA_ROOT = "data/deltas"
+LOCK_FILE = ".lock"
+
+# Missing value per column kind, for columns a delta does not carry.
+MISSING = {"coord": np.nan, "count": np.nan, "date": np.datetime64("NaT"), "category": -1}
+
+_lock = threading.Lock()
+_hashes = {}
+
+
+def delta_dir(path=columnar.SOURCE_CSV):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(DELTA_ROOT, name)
+
+
+def delta_files(path=columnar.SOURCE_CSV):
+    directory = delta_dir(path)
+    try:
+        names = sorted(name for name in os.listdir(directory) if name.endswith(".csv"))
+    except OSError:
+        return []
+    return [os.path.join(directory, name) for name in names]
+
+
+def file_hash(path):
+    # Hash at most once per process for a given file state.
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _hashes:
+        _hashes[key] = columnar.file_hash(path)
+    return _hashes[key]
+
+
+def chain(version, digest):
+    """Version of a cache at ``version`` once the delta hashing to ``digest`` is applied."""
+    return hashlib.sha256(f"{version}:{digest}".encode()).hexdigest()
+
+
+def status(meta, path=columnar.SOURCE_CSV):
+    """``("current" | "pending" | "stale", pending files)`` of a cache's watermark."""
+    files = delta_files(path)
+    applied = meta.get("deltas", [])
+    if meta.get("applying") or len(files) < len(applied):
+        return "stale", []
+    for entry, file_path in zip(applied, files):
+        if entry["file"] != os.path.basename(file_path):
+            return "stale", []
+        if os.stat(file_path).st_size != entry["size"] or file_hash(file_path) != entry["sha256"]:
+            return "stale", []
+    pending = files[len(applied):]
+    return ("pending" if pending else "current"), pending
+
+
+def grow_npy(file_path, values):
+    """Write ``file_path`` plus ``values`` to a copy next to it; returns the copy's path.
+
+    The original is left untouched for readers that have it mapped; rename
+    the copy over it to publish the new rows. Headers written by numpy leave
+    room for the row count to grow without moving the data.
+    """
+    tmp = f"{file_path}.tmp-{os.getpid()}"
+    shutil.copyfile(file_path, tmp)
+    with open(tmp, "r+b") as f:
+        version = np.lib.format.read_magic(f)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, fortran_order, dtype = read_header(f)
+        offset = f.tell()
+        f.seek(0, os.SEEK_END)
+        np.ascontiguousarray(values, dtype=dtype).tofile(f)
+
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(header, {
+            "descr": np.lib.format.dtype_to_descr(dtype),
+            "fortran_order": fortran_order,
+            "shape": (shape[0] + len(values),),
+        })
+        if header.tell() != offset:
+            os.remove(tmp)
+            raise ValueError(f"cannot grow the header of {file_path} in place")
+        f.seek(0)
+        f.write(header.getvalue())
+    return tmp
+
+
+def _category_lookup(directory, batch_dir, name):
+    """Map a batch's category codes onto the cache's, extending its dictionary."""
+    with open(os.path.join(directory, f"{name}.categories.json")) as f:
+        categories = json.load(f)
+    with open(os.path.join(batch_dir, f"{name}.categories.json")) as f:
+        batch = json.load(f)
+    codes = {value: code for code, value in enumerate(categories)}
+    lookup = np.empty(len(batch) + 1, dtype=ingest.DTYPES["category"])
+    lookup[-1] = -1
+    for i, value in enumerate(batch):
+        if value not in codes:
+            if len(categories) > np.iinfo(lookup.dtype).max:
+                raise ValueError(f"too many distinct values in {name}")
+            codes[value] = len(categories)
+            categories.append(value)
+        lookup[i] = codes[value]
+    return lookup, categories
+
+
+def _batch_columns(directory, batch_dir, meta, rows):
+    """The batch's values for every cached column, plus grown dictionaries."""
+    values, dictionaries = {}, {}
+    for name in meta["columns"]:
+        kind = ingest.SCHEMA[name]
+        batch_file = os.path.join(batch_dir, f"{name}.npy")
+        if not os.path.exists(batch_file):
+            values[name] = np.full(rows, MISSING[kind], dtype=ingest.DTYPES[kind])
+            continue
+        values[name] = np.load(batch_file)
+        if kind == "category":
+            lookup, dictionaries[name] = _category_lookup(directory, batch_dir, name)
+            values[name] = lookup[values[name]]
+    return values, dictionaries
+
+
+def _apply_file(directory, file_path, chunk_rows):
+    from utils import aggregates
+
+    meta = columnar.read_meta(directory)
+    batch_dir = f"{directory}.delta-{os.getpid()}"
+    shutil.rmtree(batch_dir, ignore_errors=True)
+    try:
+        stats = ingest.ingest_csv(file_path, batch_dir, chunk_rows)
+        values, dictionaries = _batch_columns(directory, batch_dir, meta, stats["rows"])
+    finally:
+        shutil.rmtree(batch_dir, ignore_errors=True)
+
+    # Every grown column is written before any is swapped in. A crash while
+    # they are swapped leaves this mark behind, and the next ensure()
+    # rebuilds instead of trusting columns of uneven length; until then the
+    # loaders still cut them to the old row count.
+    grown = {name: grow_npy(os.path.join(directory, f"{name}.npy"), batch) for name, batch in values.items()}
+    meta["applying"] = os.path.basename(file_path)
+    columnar.write_meta(directory, meta)
+    # Dictionaries only grow at the end, so old codes still read the same.
+    for name, categories in dictionaries.items():
+        tmp = os.path.join(directory, f"{name}.categories.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(categories, f)
+        os.replace(tmp, os.path.join(directory, f"{name}.categories.json"))
+    for name, tmp in grown.items():
+        os.replace(tmp, os.path.join(directory, f"{name}.npy"))
+
+    start, old_version = meta["rows"], meta["version"]
+    digest = file_hash(file_path)
+    del meta["applying"]
+    meta["rows"] += stats["rows"]
+    meta["version"] = chain(old_version, digest)
+    meta.setdefault("deltas", []).append({
+        "file": os.path.basename(file_path),
+        "size": os.stat(file_path).st_size,
+        "sha256": digest,
+        "rows_read": stats["rows_read"],
+        "rows": stats["rows"],
+        "dropped": stats["dropped"],
+        "cleared": stats["cleared"],
+    })
+    columnar.write_meta(directory, meta)
+    aggregates.fold(directory, old_version, start, meta["rows"])
+    return stats
+
+
+class _DirectoryLock:
+    # Serializes appends between threads, and between server processes
+    # where the platform has flock.
+    def __init__(self, directory):
+        self.path = os.path.join(directory, LOCK_FILE)
+
+    def __enter__(self):
+        _lock.acquire()
+        self.file = None
+        if fcntl is not None:
+            self.file = open(self.path, "a")
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self.file is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+            self.file.close()
+        _lock.release()
+
+
+def apply(directory, path=columnar.SOURCE_CSV, chunk_rows=ingest.CHUNK_ROWS, progress=None):
+    """Fold the deltas of ``path`` past the watermark of ``directory`` into it.
+
+    Returns the ingest stats of each file applied, or None if the watermark
+    no longer matches the delta files and the cache must be rebuilt.
+    """
+    with _DirectoryLock(directory):
+        # Another process may have applied them while this one waited.
+        state, pending = status(columnar.read_meta(directory), path)
+        if state == "stale":
+            return None
+        applied = []
+        for file_path in pending:
+            started = time.perf_counter()
+            applied.append(_apply_file(directory, file_path, chunk_rows))
+            if progress is not None:
+                progress(file_path, applied[-1], time.perf_counter() - started)
+        return applied
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply pending delta CSVs to the column cache.")
+    parser.add_argument("--source", default=columnar.SOURCE_CSV)
+    parser.add_argument("--chunk-rows", type=int, default=ingest.CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    directory = columnar.cache_dir(args.source)
+    meta = columnar.read_meta(directory)
+    if meta is None or meta.get("format") != columnar.FORMAT_VERSION:
+        print(f"no current cache for {args.source}; building it with its deltas")
+        columnar.ensure(args.source)
+        return
+
+    def progress(file_path, stats, seconds):
+        print(f"{os.path.basename(file_path)}: {stats['rows']:,} rows in {seconds:.2f}s")
+
+    with columnar.CacheLock(directory):
+        if apply(directory, args.source, args.chunk_rows, progress) is None:
+            print("delta files changed behind the watermark; rebuilding")
+            columnar.build(args.source, directory)
+    meta = columnar.read_meta(directory)
+    print(f"{meta['rows']:,} rows, {len(meta.get('deltas', []))} deltas, version {meta['version'][:12]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Herbicide usage and TCDD contamination (table 3-1) for the Chemicals page."""
+
+import pandas as pd
+
+HERBICIDES = [
+    {
+        "Name": "Agent Green",
+        "Formulation": "2,4,5-T",
+        "AmountSprayedLiters": 75920,
+        "PeriodStart": 1962,
+        "PeriodEnd": 1964,
+        "TCDDppmMin": 65.6,
+        "TCDDppmMax": 65.6
+    },
+    {
+        "Name": "Agent Pink",
+        "Formulation": "2,4,5-T",
+        "AmountSprayedLiters": 273520,
+        "PeriodStart": 1962,
+        "PeriodEnd": 1964,
+        "TCDDppmMin": 65.6,
+        "TCDDppmMax": 65.6
+    },
+    {
+        "Name": "Agent Purple",
+        "Formulation": "2,4-D, 2,4,5-T",
+        "AmountSprayedLiters": 2594800,
+        "PeriodStart": 1962,
+        "PeriodEnd": 1964,
+        "TCDDppmMin": 0,
+        "TCDDppmMax": 45
+    },
+    {
+        "Name": "Agent Blue",
+        "Formulation": "Cacodylic acid, sodium cacodylate",
+        "AmountSprayedLiters": 6100640,
+        "PeriodStart": 1962,
+        "PeriodEnd": 1971,
+        "TCDDppmMin": 0,
+        "TCDDppmMax": 0
+    },
+    {
+        "Name": "Agent Orange",
+        "Formulation": "2,4-D (50%), 2,4,5-T (50%)",
+        "AmountSprayedLiters": 43332640,
+        "PeriodStart": 1965,
+        "PeriodEnd": 1970,
+        "TCDDppmMin": 0.05,
+        "TCDDppmMax": 50
+    },
+    {
+        "Name": "Agent White",
+        "Formulation": "2,4-D (39.6%), picloram (10.2%)",
+        "AmountSprayedLiters": 21798400,
+        "PeriodStart": 1965,
+        "PeriodEnd": 1971,
+        "TCDDppmMin": 0,
+        "TCDDppmMax": 0
+    },
+]
+
+
+def herbicide_table():
+    """The herbicide table with the derived PercentOfTotal and TCDDppmAvg columns."""
+    df = pd.DataFrame(HERBICIDES)
+    total_sum = df["AmountSprayedLiters"].sum()
+    df["PercentOfTotal"] = round((df["AmountSprayedLiters"] / total_sum) * 100, 2)
+    df["TCDDppmAvg"] = (df["TCDDppmMin"] + df["TCDDppmMax"]) / 2
+    return df
@@ -0,0 +1,100 @@
+"""Server-side histogram binning.
+
+Charts get a fixed-size table of ``bin_start``, ``bin_end`` and ``count``
+instead of the raw rows, so the spec sent to the browser stays the same size
+however many values are binned.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def value_range(values):
+    """``(low, high, lowest positive)`` of the finite values (NaN if none)."""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return (np.nan, np.nan, np.nan)
+    positive = values[values > 0]
+    low_pos = float(positive.min()) if len(positive) else np.nan
+    return (float(values.min()), float(values.max()), low_pos)
+
+
+def merge_ranges(ranges):
+    """Combine :func:`value_range` results of disjoint batches."""
+    lows, highs, low_pos = np.array(ranges, dtype=np.float64).reshape(-1, 3).T
+    return (float(np.fmin.reduce(lows)), float(np.fmax.reduce(highs)), float(np.fmin.reduce(low_pos)))
+
+
+def edges_for(value_range, bins=40, log=False):
+    """Bin edges for values spanning ``value_range``; see :func:`bin_edges`."""
+    low, high, low_pos = value_range
+    if np.isnan(low):
+        return np.array([0.0, 1.0])
+    if not log:
+        if low == high:
+            high = low + 1
+        return np.linspace(low, high, bins + 1)
+
+    if np.isnan(low_pos):
+        return np.array([0.0, 1.0])
+    high = max(high, low_pos * 10)
+    edges = np.geomspace(low_pos, high, bins + 1)
+    if low < low_pos:
+        edges = np.concatenate(([min(low, 0.0)], edges))
+    return edges
+
+
+def bin_edges(values, bins=40, log=False):
+    """Linear or log-spaced edges covering the finite values.
+
+    Log edges start at the smallest positive value; zeros (and anything
+    smaller) fall into an extra leading bin starting at 0.
+    """
+    return edges_for(value_range(values), bins, log)
+
+
+def bin_counts(values, edges, weights=None):
+    """Counts (or summed ``weights``) of the finite values per bin."""
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)[finite]
+    counts, _ = np.histogram(values[finite], bins=edges, weights=weights)
+    return counts
+
+
+def value_counts(values):
+    """Distinct finite values and how often each occurs, as ``(values, counts)``.
+
+    Counts of disjoint batches combine exactly with :func:`merge_value_counts`,
+    and any binning can be read off them with :func:`table_from_counts`.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    return np.unique(values[np.isfinite(values)], return_counts=True)
+
+
+def merge_value_counts(parts):
+    values, inverse = np.unique(np.concatenate([part[0] for part in parts]), return_inverse=True)
+    counts = np.bincount(inverse, weights=np.concatenate([part[1] for part in parts]), minlength=len(values))
+    return values, counts.astype(np.int64)
+
+
+def table_from_counts(values, counts, bins=40, log=False):
+    """Same table as :func:`bin_table` over the values ``counts`` describes."""
+    edges = edges_for(value_range(values), bins, log)
+    return table(edges, bin_counts(values, edges, counts).astype(np.int64))
+
+
+def table(edges, counts):
+    return pd.DataFrame({
+        "bin_start": edges[:-1],
+        "bin_end": edges[1:],
+        "count": counts,
+    })
+
+
+def bin_table(values, bins=40, log=False, weights=None):
+    """Bin ``values`` and return one row per bin."""
+    edges = bin_edges(values, bins, log)
+    return table(edges, bin_counts(values, edges, weights))
@@ -0,0 +1,133 @@
+"""Local, pre-resized copies of the pages' images.
+
+The originals are not committed: the offline build
+(``python -m utils.build images``) downloads any missing from
+``assets/images/`` from their source URL (:func:`fetch`), then writes WebP
+variants at each display width, and at twice that for high-DPI screens, to
+``static/img/``. Streamlit serves that directory as static files. Each URL
+carries a ``?v=`` content hash, so browsers may cache it for good.
+
+An image whose original could not be downloaded is left out of the build,
+and a page whose variants have not been built falls back to the remote
+image.
+"""
+
+import hashlib
+import html
+import json
+import os
+import sys
+import urllib.request
+
+import streamlit as st
+
+ASSET_DIR = "assets/images"
+IMAGE_ROOT = "static/img"
+META_FILE = "meta.json"
+QUALITY = 80
+
+# name -> source URL and the CSS widths it is displayed at. The hero fills the
+# main column of the default centered layout (704px).
+IMAGES = {
+    "home-hero": {
+        "url": "https://www.usni.org/sites/default/files/styles/hero_image/public/Morris-NH-JA-20%201.jpg?itok=zwwjgYdT",
+        "widths": (704,),
+    },
+    "topo-map": {
+        "url": "https://preview.redd.it/4ovwkaqdqfg61.jpg?auto=webp&s=5fc960c9b4d813cceafc2a71665fe0e2b06f0dff",
+        "widths": (400,),
+    },
+}
+
+
+def original_path(name):
+    return os.path.join(ASSET_DIR, f"{name}.jpg")
+
+
+def fetch(names=None, timeout=30):
+    """Download the originals not yet under ``assets/images/``; returns the names available."""
+    available = []
+    for name in names or IMAGES:
+        path = original_path(name)
+        if not os.path.exists(path):
+            os.makedirs(ASSET_DIR, exist_ok=True)
+            request = urllib.request.Request(IMAGES[name]["url"], headers={"User-Agent": "Mozilla/5.0"})
+            try:
+                with urllib.request.urlopen(request, timeout=timeout) as response:
+                    data = response.read()
+            except OSError as error:
+                print(f"images: could not download {name}: {error}", file=sys.stderr)
+                continue
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+        available.append(name)
+    return available
+
+
+def build(root=IMAGE_ROOT):
+    """Write the WebP variants of every image and their index to ``root``."""
+    from PIL import Image
+
+    meta = {}
+    for name in fetch():
+        spec = IMAGES[name]
+        with Image.open(original_path(name)) as original:
+            original = original.convert("RGB")
+            widths = sorted({min(w * scale, original.width) for w in spec["widths"] for scale in (1, 2)})
+            files = {}
+            for width in widths:
+                height = round(original.height * width / original.width)
+                file_name = f"{name}-{width}.webp"
+                variant = original if width == original.width else original.resize((width, height), Image.LANCZOS)
+                variant.save(os.path.join(root, file_name), "WEBP", quality=QUALITY, method=6)
+                with open(os.path.join(root, file_name), "rb") as f:
+                    files[width] = {"file": file_name, "v": hashlib.sha256(f.read()).hexdigest()[:12]}
+            meta[name] = {"width": original.width, "height": original.height, "variants": files}
+    with open(os.path.join(root, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+_meta_cache = {}
+
+
+def read_meta(root=IMAGE_ROOT):
+    path = os.path.join(root, META_FILE)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return {}
+    if _meta_cache.get(path, (None,))[0] != mtime:
+        with open(path) as f:
+            _meta_cache[path] = (mtime, json.load(f))
+    return _meta_cache[path][1]
+
+
+def url(file_name, version):
+    # Same layout as the tiles: Streamlit mounts static/ under app/static,
+    # stlite fetches relative to index.html.
+    prefix = "" if sys.platform == "emscripten" else "app/"
+    return f"{prefix}{IMAGE_ROOT}/{file_name}?v={version}"
+
+
+def show(name, caption=None, width=None):
+    """Display image ``name`` like ``st.image``, from the local variants if built."""
+    entry = read_meta().get(name)
+    if entry is None:
+        st.image(IMAGES[name]["url"], caption=caption, width=width)
+        return
+
+    variants = sorted((int(w), v) for w, v in entry["variants"].items())
+    srcset = ", ".join(f"{url(v['file'], v['v'])} {w}w" for w, v in variants)
+    display = width or IMAGES[name]["widths"][0]
+    smallest = variants[0][1]
+    alt = html.escape(caption or name, quote=True)
+    size = f'width="{width}" ' if width else ""
+    style = "max-width:100%;height:auto" + ("" if width else ";width:100%")
+    st.markdown(
+        f'<img src="{url(smallest["file"], smallest["v"])}" srcset="{srcset}" '
+        f'sizes="(max-width: {display}px) 100vw, {display}px" {size}alt="{alt}" style="{style}">',
+        unsafe_allow_html=True,
+    )
+    if caption:
+        st.caption(caption)
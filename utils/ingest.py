@@ -0,0 +1,235 @@
+"""Bounded-memory streaming ingestion of THOR bombing CSVs.
+
+The source is read in fixed-size chunks with narrow dtypes. Each chunk's
+coordinates are validated, and the chunk is appended to one raw file per
+column. Rows with a missing coordinate, the (0, 0) placeholder or a point
+outside the Indochina theatre are dropped and counted in the stats.
+Categorical columns are dictionary-encoded into small integer codes as they
+stream past. Memory use depends on the chunk size and the number of distinct
+category values, never on the number of rows.
+
+Run ``python -m utils.ingest <csv> [<out_dir>]`` to ingest a file by hand and
+print throughput.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows / Pyodide
+    resource = None
+
+LAT = "TGTLATDD_DDD_WGS84"
+LON = "TGTLONDDD_DDD_WGS84"
+WEAPONS = "NUMWEAPONSDELIVERED"
+DATE = "MSNDATE"
+AIRCRAFT = "VALID_AIRCRAFT_ROOT"
+COUNTRY = "COUNTRYFLYINGMISSION"
+OPERATION = "OPERATIONSUPPORTED"
+SERVICE = "MILSERVICE"
+
+# Column -> kind. Only LAT and LON are required; the rest are ingested when
+# the source has them.
+SCHEMA = {
+    LAT: "coord",
+    LON: "coord",
+    WEAPONS: "count",
+    DATE: "date",
+    AIRCRAFT: "category",
+    COUNTRY: "category",
+    OPERATION: "category",
+    SERVICE: "category",
+}
+REQUIRED = (LAT, LON)
+
+# Weapon counts stay float32 so missing values remain NaN instead of turning
+# into zeros; categories are int16 codes with -1 for missing. Dates are stored
+# in seconds, pandas' coarsest native unit, so a mapped column needs no
+# conversion.
+DTYPES = {
+    "coord": np.dtype(np.float32),
+    "count": np.dtype(np.float32),
+    "date": np.dtype("datetime64[s]"),
+    "category": np.dtype(np.int16),
+}
+
+# Vietnam, Laos, Cambodia, the Thai bases and the Gulf of Tonkin, with some
+# margin.
+THEATRE_BOUNDS = {LAT: (5.0, 28.0), LON: (95.0, 115.0)}
+
+# The war, from the US advisory group to the fall of Saigon. A date outside
+# it is a typo; it is cleared so it cannot stretch the monthly timeline.
+THEATRE_DATES = (np.datetime64("1955-11-01", "s"), np.datetime64("1975-05-01", "s"))
+
+CHUNK_ROWS = 250_000
+
+
+def source_columns(path):
+    header = pd.read_csv(path, nrows=0).columns
+    missing = [name for name in REQUIRED if name not in header]
+    if missing:
+        raise ValueError(f"{path} is missing required columns: {', '.join(missing)}")
+    return [name for name in SCHEMA if name in header]
+
+
+class ColumnWriter:
+    """Appends chunks of one column to a raw file, finalized into a .npy."""
+
+    def __init__(self, directory, name, kind):
+        self.directory = directory
+        self.name = name
+        self.kind = kind
+        self.dtype = DTYPES[kind]
+        self.rows = 0
+        self.categories = {}
+        self._raw_path = os.path.join(directory, f"{name}.bin")
+        self._raw = open(self._raw_path, "wb")
+
+    def encode(self, values):
+        if self.kind == "coord" or self.kind == "count":
+            return pd.to_numeric(values, errors="coerce").to_numpy(dtype=self.dtype, na_value=np.nan)
+        if self.kind == "date":
+            return pd.to_datetime(values, errors="coerce").to_numpy(dtype=self.dtype)
+
+        # Map each chunk's distinct values through the running dictionary.
+        inverse, uniques = pd.factorize(values.astype("string").str.strip())
+        lookup = np.empty(len(uniques) + 1, dtype=self.dtype)
+        lookup[-1] = -1  # factorize marks missing values as -1
+        for i, value in enumerate(uniques):
+            if value == "":
+                lookup[i] = -1
+                continue
+            code = self.categories.get(value)
+            if code is None:
+                code = len(self.categories)
+                if code > np.iinfo(self.dtype).max:
+                    raise ValueError(f"too many distinct values in {self.name}")
+                self.categories[value] = code
+            lookup[i] = code
+        return lookup[inverse]
+
+    def append(self, values):
+        np.ascontiguousarray(values, dtype=self.dtype).tofile(self._raw)
+        self.rows += len(values)
+
+    def finalize(self):
+        self._raw.close()
+        npy_path = os.path.join(self.directory, f"{self.name}.npy")
+        with open(npy_path, "wb") as out, open(self._raw_path, "rb") as raw:
+            np.lib.format.write_array_header_1_0(out, {
+                "descr": np.lib.format.dtype_to_descr(self.dtype),
+                "fortran_order": False,
+                "shape": (self.rows,),
+            })
+            shutil.copyfileobj(raw, out, 1 << 20)
+        os.remove(self._raw_path)
+        if self.kind == "category":
+            categories = sorted(self.categories, key=self.categories.get)
+            with open(os.path.join(self.directory, f"{self.name}.categories.json"), "w") as f:
+                json.dump(categories, f)
+        return self.dtype.str
+
+
+def valid_coords(lat, lon, dropped):
+    """Mask of rows to keep; adds the rows it drops to the ``dropped`` counts."""
+    missing = np.isnan(lat) | np.isnan(lon)
+    null_island = (lat == 0) & (lon == 0)
+    inside = np.ones(len(lat), dtype=bool)
+    for values, (low, high) in zip((lat, lon), (THEATRE_BOUNDS[LAT], THEATRE_BOUNDS[LON])):
+        inside &= (values >= low) & (values <= high)
+    dropped["missing"] += int(missing.sum())
+    dropped["null_island"] += int(null_island.sum())
+    dropped["outside_theatre"] += int((~inside & ~missing & ~null_island).sum())
+    return inside
+
+
+def valid_dates(dates, cleared):
+    """``dates`` with those outside the war set to NaT; counts them in ``cleared``."""
+    outside = (dates < THEATRE_DATES[0]) | (dates >= THEATRE_DATES[1])
+    cleared["dates_outside_theatre"] += int(outside.sum())
+    return np.where(outside, np.datetime64("NaT", "s"), dates)
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def ingest_csv(path, out, chunk_rows=CHUNK_ROWS, progress=None):
+    """Stream ``path`` into per-column .npy files under ``out``.
+
+    Returns a stats dict with the row counts, the dropped rows by reason,
+    column dtypes, elapsed time, throughput and peak RSS.
+    """
+    started = time.perf_counter()
+    columns = source_columns(path)
+    os.makedirs(out, exist_ok=True)
+    writers = {name: ColumnWriter(out, name, SCHEMA[name]) for name in columns}
+
+    rows_read = 0
+    dropped = {"missing": 0, "null_island": 0, "outside_theatre": 0}
+    cleared = {"dates_outside_theatre": 0}
+    # Numeric columns go through the C parser's float path; a chunk holding
+    # junk comes back as object and is coerced by to_numeric in encode().
+    text = {name: object for name in columns if SCHEMA[name] in ("date", "category")}
+    reader = pd.read_csv(path, usecols=columns, dtype=text, chunksize=chunk_rows)
+    for chunk in reader:
+        rows_read += len(chunk)
+        encoded = {name: writer.encode(chunk[name]) for name, writer in writers.items()}
+
+        keep = valid_coords(encoded[LAT], encoded[LON], dropped)
+        encoded = {name: values[keep] for name, values in encoded.items()}
+        if DATE in encoded:
+            encoded[DATE] = valid_dates(encoded[DATE], cleared)
+        for name, writer in writers.items():
+            writer.append(encoded[name])
+
+        if progress is not None:
+            progress(rows_read, time.perf_counter() - started)
+
+    dtypes = {name: writer.finalize() for name, writer in writers.items()}
+    elapsed = time.perf_counter() - started
+    return {
+        "rows_read": rows_read,
+        "rows": writers[LAT].rows,
+        "dropped": dropped,
+        "cleared": cleared,
+        "columns": dtypes,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows_read / elapsed) if elapsed else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream a THOR CSV into .npy columns.")
+    parser.add_argument("csv")
+    parser.add_argument("out", nargs="?", help="output directory (default: the app's cache)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    def progress(rows, seconds):
+        print(f"\r{rows:,} rows  {rows / seconds:,.0f} rows/s", end="", file=sys.stderr)
+
+    if args.out:
+        stats = ingest_csv(args.csv, args.out, args.chunk_rows, progress)
+    else:
+        from utils import columnar
+        stats = columnar.read_meta(columnar.build(args.csv, chunk_rows=args.chunk_rows, progress=progress))["ingest"]
+    print(file=sys.stderr)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Per-page lazy installation of heavy packages under stlite.
+
+In the browser build only what the landing page needs is installed at boot.
+A page calls :func:`require` before importing e.g. pydeck or plotly; on a
+normal server that is a no-op, while under Pyodide the first visit starts a
+background ``micropip`` install (preferring the wheels vendored by
+``python -m utils.bundle``), shows a loading message and reruns the page once
+the install finishes.
+"""
+
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+
+import streamlit as st
+
+CONFIG_FILE = "stlite.json"
+WHEEL_INDEX = "vendor/wheels/index.json"
+# Written by index.html at mount time: the URL the app is served from, since
+# relative wheel URLs would resolve against the Pyodide worker script instead.
+ENV_FILE = "stlite-env.json"
+
+# Import name -> distribution name, where they differ.
+DISTRIBUTIONS = {"PIL": "Pillow"}
+
+_installs = {}
+
+
+def _read_json(path, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _install_targets(modules):
+    """Wheel URLs (or pinned requirements) for the modules and their deps."""
+    lazy = _read_json(CONFIG_FILE, {}).get("lazy_requirements", {})
+    wheels = _read_json(WHEEL_INDEX, {})
+    base_url = _read_json(ENV_FILE, {}).get("base_url")
+    targets = []
+    for module in modules:
+        name = DISTRIBUTIONS.get(module, module)
+        for dist in [name] + lazy.get(name, {}).get("deps", []):
+            if dist in wheels and base_url:
+                targets.append(f"{base_url}{os.path.dirname(WHEEL_INDEX)}/{wheels[dist]}")
+            else:
+                targets.append(lazy.get(dist, {}).get("pin", dist))
+    return list(dict.fromkeys(targets))
+
+
+def _start(modules):
+    import micropip
+
+    key = tuple(modules)
+    if key not in _installs:
+        _installs[key] = asyncio.ensure_future(micropip.install(_install_targets(modules)))
+    return _installs[key]
+
+
+def require(*modules):
+    """Make sure ``modules`` are importable, installing them under stlite."""
+    missing = [module for module in modules if importlib.util.find_spec(module) is None]
+    if not missing:
+        return
+    if sys.platform != "emscripten":
+        raise ModuleNotFoundError(f"missing packages: {', '.join(missing)}")
+
+    task = _start(missing)
+    if task.done() and task.exception() is not None:
+        st.error(f"Could not load {', '.join(missing)}: {task.exception()}")
+        st.stop()
+
+    @st.fragment(run_every=0.5)
+    def wait():
+        if task.done():
+            st.rerun()
+        st.info(f"Loading {', '.join(missing)} for this page...")
+
+    wait()
+    st.stop()
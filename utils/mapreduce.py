@@ -0,0 +1,196 @@
+"""Chunked map-reduce over the cached columns.
+
+The rows are split into chunks. A process pool computes a partial aggregate
+per chunk: hex cells, histogram counts or time-cube cells. The partials are
+then merged. Workers get only a column directory and a row range, or a chunk
+of row indices, and map the ``.npy`` files themselves, so no column data is
+pickled across processes.
+
+Small inputs, Pyodide and ``workers=1`` run the same chunks serially in
+process. The results are identical either way.
+
+Run ``python -m utils.mapreduce [--workers 1 2 4]`` to time the aggregates
+against the local dataset and print the speedup per worker count.
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utils import columnar, hexbin, histogram, timecube
+from utils.columnar import DATE, LAT, LON, WEAPONS
+
+CHUNK_ROWS = 500_000
+# Below this many rows the pool's dispatch overhead outweighs the gain.
+PARALLEL_MIN_ROWS = 1_000_000
+WORKERS_ENV = "APP_WORKERS"
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def default_workers():
+    if sys.platform == "emscripten":
+        return 1
+    return int(os.environ.get(WORKERS_ENV, 0)) or os.cpu_count() or 1
+
+
+def _pool(workers):
+    # One long-lived pool per size. Spawned rather than forked, because the
+    # Streamlit server is multi-threaded; the lock keeps two sessions from
+    # each starting a pool of the same size.
+    with _pools_lock:
+        if workers not in _pools:
+            _pools[workers] = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pools[workers]
+
+
+def _load(directory, columns, chunk):
+    if isinstance(chunk, tuple):
+        start, stop = chunk
+        return {name: columnar.load_column(directory, name)[start:stop] for name in columns}
+    return {name: columnar.load_column(directory, name)[chunk] for name in columns}
+
+
+def _apply(task):
+    mapper, directory, columns, chunk, params = task
+    return mapper(_load(directory, columns, chunk), **params)
+
+
+def chunks(n_rows, rows=None, chunk_rows=CHUNK_ROWS):
+    """Row ranges over all rows, or slices of the ``rows`` index array."""
+    if rows is None:
+        return [(start, min(start + chunk_rows, n_rows)) for start in range(0, n_rows, chunk_rows)]
+    return [rows[start:start + chunk_rows] for start in range(0, len(rows), chunk_rows)]
+
+
+def map_chunks(mapper, directory, columns, rows=None, params=None, workers=None, chunk_rows=CHUNK_ROWS):
+    """Apply ``mapper(columns_dict, **params)`` to every chunk; returns the partials.
+
+    ``mapper`` must be a module-level function so it can be sent to workers.
+    """
+    directory = os.path.abspath(directory)
+    n_rows = columnar.read_meta(directory)["rows"] if rows is None else len(rows)
+    tasks = [(mapper, directory, columns, chunk, params or {})
+             for chunk in chunks(n_rows, rows, chunk_rows)] or [(mapper, directory, columns, [], params or {})]
+    workers = workers or default_workers()
+    if workers == 1 or len(tasks) == 1 or n_rows < PARALLEL_MIN_ROWS:
+        return [_apply(task) for task in tasks]
+    return list(_pool(workers).map(_apply, tasks))
+
+
+# -- mappers -----------------------------------------------------------------
+
+def _hex_partials(frame, radii):
+    return {radius: hexbin.partial(frame[LAT], frame[LON], frame[WEAPONS], radius) for radius in radii}
+
+
+def _value_range(frame, column):
+    return histogram.value_range(frame[column])
+
+
+def _bin_counts(frame, column, edges):
+    return histogram.bin_counts(frame[column], edges)
+
+
+def _value_counts(frame, column):
+    return histogram.value_counts(frame[column])
+
+
+def _cube_partial(frame, cell_deg):
+    return timecube.partial(frame[LAT], frame[LON], frame[DATE], frame[WEAPONS], cell_deg)
+
+
+# -- aggregates ---------------------------------------------------------------
+
+def hex_partials(directory, radii=hexbin.RADII, rows=None, workers=None):
+    """``{radius: merged hexbin partial}``, in one pass over the rows."""
+    parts = map_chunks(_hex_partials, directory, (LAT, LON, WEAPONS), rows, {"radii": tuple(radii)}, workers)
+    return {radius: hexbin.merge([part[radius] for part in parts]) for radius in radii}
+
+
+def hex_pyramid(directory, radii=hexbin.RADII, rows=None, workers=None):
+    """``{radius: cells DataFrame}`` for every radius, in one pass over the rows."""
+    partials = hex_partials(directory, radii, rows, workers)
+    return {radius: hexbin.cells_frame(*partials[radius], radius) for radius in radii}
+
+
+def hex_cells(directory, radius, rows=None, workers=None):
+    return hex_pyramid(directory, (radius,), rows, workers)[radius]
+
+
+def histogram_tables(directory, column=WEAPONS, bins=40, logs=(False, True), rows=None, workers=None):
+    """``{log: bin table}``; one pass for the value range, one for the counts."""
+    ranges = map_chunks(_value_range, directory, (column,), rows, {"column": column}, workers)
+    value_range = histogram.merge_ranges(ranges)
+    tables = {}
+    for log in logs:
+        edges = histogram.edges_for(value_range, bins, log)
+        counts = map_chunks(_bin_counts, directory, (column,), rows, {"column": column, "edges": edges}, workers)
+        tables[log] = histogram.table(edges, np.sum(counts, axis=0))
+    return tables
+
+
+def histogram_table(directory, column=WEAPONS, bins=40, log=False, rows=None, workers=None):
+    return histogram_tables(directory, column, bins, (log,), rows, workers)[log]
+
+
+def value_counts(directory, column=WEAPONS, rows=None, workers=None):
+    parts = map_chunks(_value_counts, directory, (column,), rows, {"column": column}, workers)
+    return histogram.merge_value_counts(parts)
+
+
+def cube_partial(directory, cell_deg=0.25, rows=None, workers=None):
+    parts = map_chunks(_cube_partial, directory, (LAT, LON, DATE, WEAPONS), rows, {"cell_deg": cell_deg}, workers)
+    return timecube.merge(parts)
+
+
+def time_cube(directory, cell_deg=0.25, rows=None, workers=None):
+    return timecube.from_partial(*cube_partial(directory, cell_deg, rows, workers), cell_deg)
+
+
+AGGREGATES = {
+    "hex pyramid": lambda directory, workers: hex_pyramid(directory, workers=workers),
+    "histograms": lambda directory, workers: histogram_tables(directory, workers=workers),
+    "time cube": lambda directory, workers: time_cube(directory, workers=workers),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--source", default=columnar.SOURCE_CSV)
+    parser.add_argument("--workers", type=int, nargs="+")
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    args = parser.parse_args()
+
+    directory = columnar.ensure(args.source)
+    rows = columnar.read_meta(directory)["rows"]
+    cores = os.cpu_count() or 1
+    counts = args.workers or sorted({1, 2, cores // 2 or 1, cores})
+    print(f"{rows:,} rows, {cores} cores, chunks of {CHUNK_ROWS:,}")
+
+    for name, run in AGGREGATES.items():
+        serial = None
+        for workers in counts:
+            run(directory, workers)  # warm the pool and the page cache
+            best = min(_timed(run, directory, workers) for _ in range(args.repeat))
+            serial = serial or best
+            print(f"{name:<12} {workers:>3} workers {best:7.3f}s  speedup {serial / best:4.1f}x")
+    for pool in _pools.values():
+        pool.shutdown()
+
+
+def _timed(run, directory, workers):
+    start = time.perf_counter()
+    run(directory, workers)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Per-section timing for the pages.
+
+Profiling is off unless the app runs with ``APP_PROFILE=1``, which profiles
+every rerun, or ``APP_PROFILE=url``, which profiles the reruns of pages
+opened with ``?profile=1``; visitors cannot turn it on by themselves. When
+it is off, ``section()`` costs one context lookup and returns a shared no-op
+context manager. When it is on, every section records:
+
+* wall time,
+* peak Python/NumPy allocation (tracemalloc),
+* bytes of the chart specs sent while the section ran, as counted by
+  :func:`utils.budget.show` through :func:`sent`.
+
+tracemalloc traces the whole process, so it runs only while at least one
+profiled rerun is in progress, and its peak is shared: a section that
+overlaps another profiled rerun records no allocation figure.
+
+``report()`` shows the numbers in a sidebar panel and appends them to a
+JSONL log (``APP_PROFILE_LOG``, default ``data/.cache/profile.jsonl``).
+
+    profiling.start("Bombs")
+    with profiling.section("map"):
+        ...
+    profiling.report()
+
+Sections written as ``@profiling.fragment(page)`` are also profiled when
+they rerun on their own.
+"""
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from utils import store
+
+PROFILE_ENV = "APP_PROFILE"
+URL_MODE = "url"
+LOG_ENV = "APP_PROFILE_LOG"
+LOG_FILE = "data/.cache/profile.jsonl"
+
+_NULL = contextlib.nullcontext()
+
+_lock = threading.Lock()
+# Profiled reruns in progress, and how many have started; a section whose
+# start count changed, or that ran beside another rerun, shared the peak.
+_tracing = {"active": 0, "started": 0, "owned": False}
+
+
+def _ctx():
+    return get_script_run_ctx(suppress_warning=True)
+
+
+def _state():
+    ctx = _ctx()
+    return getattr(ctx, "_profile", None) if ctx is not None else None
+
+
+def _wanted():
+    mode = os.environ.get(PROFILE_ENV, "")
+    if mode in ("", "0"):
+        return False
+    if mode != URL_MODE:
+        return True
+    try:
+        return st.query_params.get("profile", "0") not in ("", "0")
+    except Exception:
+        return False
+
+
+def _acquire():
+    with _lock:
+        if _tracing["active"] == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing["owned"] = True
+        _tracing["active"] += 1
+        _tracing["started"] += 1
+
+
+def _release():
+    with _lock:
+        _tracing["active"] -= 1
+        if _tracing["active"] == 0 and _tracing["owned"]:
+            tracemalloc.stop()
+            _tracing["owned"] = False
+
+
+def _shared():
+    # (start count, whether another profiled rerun is in progress)
+    with _lock:
+        return _tracing["started"], _tracing["active"] > 1
+
+
+def start(page):
+    """Begin a profiled rerun of ``page`` if profiling is requested."""
+    ctx = _ctx()
+    if ctx is None:
+        return
+    if getattr(ctx, "_profile", None) is not None:
+        # The previous rerun ended without reaching report().
+        _release()
+        ctx._profile = None
+    if not _wanted():
+        return
+    _acquire()
+    ctx._profile = {"page": page, "session": ctx.session_id, "started": time.time(),
+                    "bytes": 0, "stack": [], "records": []}
+
+
+@contextlib.contextmanager
+def _measure(state, name):
+    stack = state["stack"]
+    started, overlapped = _shared()
+    current, peak = tracemalloc.get_traced_memory()
+    if stack:
+        stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+    if not overlapped:
+        tracemalloc.reset_peak()
+    label = " / ".join([f["name"] for f in stack] + [name])
+    frame = {"name": name, "peak": current}
+    stack.append(frame)
+    sent = state["bytes"]
+    begin = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - begin
+        stack.pop()
+        _, peak = tracemalloc.get_traced_memory()
+        peak = max(frame["peak"], peak)
+        if stack:
+            stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+        now_started, now_overlapped = _shared()
+        overlapped = overlapped or now_overlapped or now_started != started
+        if not overlapped:
+            tracemalloc.reset_peak()
+        state["records"].append({
+            "section": label,
+            "seconds": round(seconds, 4),
+            "alloc_mb": None if overlapped else round((peak - current) / 2**20, 2),
+            "payload_bytes": state["bytes"] - sent,
+        })
+
+
+def section(name):
+    """Context manager timing the code under ``name`` (no-op when disabled)."""
+    state = _state()
+    if state is None:
+        return _NULL
+    return _measure(state, name)
+
+
+def sent(size):
+    """Count ``size`` bytes sent to the browser by the current section (no-op when disabled)."""
+    state = _state()
+    if state is not None:
+        state["bytes"] += size
+
+
+def note(name, **fields):
+    """Add a record for ``name`` under the current section (no-op when disabled)."""
+    state = _state()
+    if state is None:
+        return
+    label = " / ".join([f["name"] for f in state["stack"]] + [name])
+    state["records"].append({"section": label, **fields})
+
+
+def timed(name=None):
+    """Decorator form of ``section``; defaults to the function's name."""
+    def decorator(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            state = _state()
+            if state is None:
+                return func(*args, **kwargs)
+            with _measure(state, label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def fragment(page, name=None):
+    """``st.fragment`` timed as a section, including its own reruns.
+
+    A fragment rerun runs only the fragment, so it starts and reports its
+    own profile. Its records go to the log only, since fragments cannot
+    write to the sidebar.
+    """
+    def decorator(func):
+        label = name or func.__name__
+
+        @st.fragment
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            ctx = _ctx()
+            rerun = ctx is not None and bool(ctx.fragment_ids_this_run)
+            if rerun:
+                start(page)
+            try:
+                with section(label):
+                    return func(*args, **kwargs)
+            finally:
+                if rerun:
+                    report(panel=False)
+        return wrapper
+    return decorator
+
+
+def report(panel=True):
+    """Show this rerun's sections in the sidebar and append them to the log."""
+    ctx = _ctx()
+    state = getattr(ctx, "_profile", None) if ctx is not None else None
+    if state is None:
+        return
+    ctx._profile = None
+    _release()
+    records = state["records"]
+    if not records:
+        return
+
+    path = os.environ.get(LOG_ENV, LOG_FILE)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as f:
+        for record in records:
+            f.write(json.dumps({"ts": state["started"], "page": state["page"],
+                                "session": state["session"], **record}) + "\n")
+
+    if not panel:
+        return
+    total = time.time() - state["started"]
+    with st.sidebar.expander("Profile", expanded=True):
+        st.caption(f"{state['page']}: {total:.2f}s this rerun, {state['bytes'] / 1e3:,.0f} kB sent")
+        st.dataframe(records, hide_index=True, use_container_width=True)
+        cache = store.stats()
+        st.caption(
+            f"Shared cache: {cache['entries']} entries, {cache['mb']} / {cache['budget_mb']} MB, "
+            f"{cache['hits']} hits, {cache['misses']} misses, {cache['waits']} waits, "
+            f"{cache['evictions']} evictions"
+        )
@@ -0,0 +1,229 @@
+"""Queries over the bombing columns and the herbicide table, without Streamlit.
+
+The Bombs and Chemicals pages, notebooks and the local HTTP service
+(:mod:`utils.serve`) all go through these functions, so each aggregate is
+computed once per process and shared through :mod:`utils.store`. Results are
+cached objects and must be treated as read-only.
+
+A bombing query selects strikes by:
+
+* ``region`` -- None for every strike, a name from ``spatial.REGIONS``, or a
+  ``(kind, params)`` shape as in :mod:`utils.spatial`;
+* ``filters`` -- ``{dimension: values}`` or ``((column, values), ...)`` over
+  :data:`FILTERS`, where a dimension is its column or its label. The year
+  dimension is the time filter.
+
+``version`` is the column cache version and keys every cached result. It
+defaults to the current one.
+
+    from utils import query
+    query.hex_cells(5000, "DMZ (17th parallel)", {"year": [1968, 1969]})
+    query.histogram(True, filters={"service": ["USAF"]})
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils import aggregates, artifacts, bitmap, columnar, herbicides as herbicide_data, hexbin, mapreduce, spatial, store
+from utils.columnar import AIRCRAFT, COUNTRY, DATE, LAT, LON, OPERATION, SERVICE, WEAPONS
+
+FILTERS = ((AIRCRAFT, "Aircraft"), (COUNTRY, "Country"), (SERVICE, "Service"), (OPERATION, "Operation"), (bitmap.YEAR, "Year"))
+HISTOGRAM_BINS = 40
+REGION_KINDS = ("bbox", "polygon", "radius")
+
+
+def normalize_region(region):
+    """The ``(kind, params)`` shape of ``region``, or None for every strike."""
+    if region is None:
+        return None
+    if isinstance(region, str):
+        if region not in spatial.REGIONS:
+            raise ValueError(f"unknown region {region!r}; expected one of {', '.join(spatial.REGIONS)}")
+        return spatial.REGIONS[region]
+    kind, params = region
+    if kind not in REGION_KINDS:
+        raise ValueError(f"unknown region kind {kind!r}; expected one of {', '.join(REGION_KINDS)}")
+    if kind == "polygon":
+        return kind, tuple((float(lon), float(lat)) for lon, lat in params)
+    return kind, tuple(float(value) for value in params)
+
+
+def normalize_filters(filters, version=None):
+    """``((column, sorted values), ...)`` in :data:`FILTERS` order; () for none."""
+    pairs = filters.items() if isinstance(filters, dict) else filters or ()
+    pairs = [(name, (values,) if isinstance(values, (str, int)) else values) for name, values in pairs]
+    pairs = [(name, values) for name, values in pairs if len(values)]
+    if not pairs:
+        return ()
+    lookup = filter_labels(version or columnar.version())
+    dimensions = {name.lower(): name for name, _ in FILTERS}
+    dimensions.update({label.lower(): name for name, label in FILTERS})
+    chosen = {}
+    for name, values in pairs:
+        column = dimensions.get(str(name).lower())
+        if column is None or column not in lookup:
+            raise ValueError(f"unknown filter {name!r}; expected one of {', '.join(sorted(lookup))}")
+        labels = lookup[column]
+        for value in values:
+            label = labels.get(value, labels.get(str(value)))
+            if label is None:
+                raise ValueError(f"unknown {column} value {value!r}")
+            chosen.setdefault(column, set()).add(label)
+    return tuple((name, tuple(sorted(chosen[name]))) for name, _ in FILTERS if name in chosen)
+
+
+# Everything below is cached once per process in utils.store and shared by
+# every caller; cached values must not be mutated.
+
+@store.cached()
+def column(name, version):
+    return columnar.load_columns([name])[name]
+
+
+@store.cached()
+def grid_index(version):
+    return spatial.GridIndex(column(LAT, version), column(LON, version))
+
+
+@store.cached()
+def region_rows(region, version):
+    return grid_index(version).query(region)
+
+
+@store.cached()
+def bitmaps(version):
+    available = columnar.available()
+    columns, labels = {}, {}
+    for name, _ in FILTERS:
+        if name in available:
+            values = column(name, version)
+            columns[name], labels[name] = values.cat.codes.to_numpy(), list(values.cat.categories)
+    if DATE in available:
+        columns[bitmap.YEAR], labels[bitmap.YEAR] = bitmap.years(column(DATE, version).to_numpy())
+    return bitmap.BitmapIndex.build(columns, labels)
+
+
+@store.cached()
+def filter_labels(version):
+    # column -> {label or str(label): label}, so query strings match too.
+    return {
+        name: {**{str(label): label for label in labels}, **{label: label for label in labels}}
+        for name, labels in bitmaps(version).labels.items()
+    }
+
+
+@store.cached()
+def selected_rows(region, filters, version):
+    # Rows in the region that pass every filter; None means all rows.
+    rows = region_rows(region, version)
+    return bitmaps(version).select(filters, rows) if filters else rows
+
+
+@store.cached()
+def _strikes(columns, region, filters, version):
+    df = pd.DataFrame({name: column(name, version) for name in columns}, copy=False)
+    rows = selected_rows(region, filters, version)
+    return df if rows is None else df.iloc[rows]
+
+
+def strikes(columns=(LAT, LON, WEAPONS), region=None, filters=(), version=None):
+    """The selected strikes' ``columns``."""
+    version = version or columnar.version()
+    return _strikes(tuple(columns), normalize_region(region), normalize_filters(filters, version), version)
+
+
+def count(region=None, filters=(), version=None):
+    """Number of selected strikes."""
+    version = version or columnar.version()
+    region, filters = normalize_region(region), normalize_filters(filters, version)
+    rows = selected_rows(region, filters, version)
+    return len(column(LAT, version)) if rows is None else len(rows)
+
+
+def filter_values(version=None):
+    """``dimension, label, value, count`` of every filter value, most common first."""
+    index = bitmaps(version or columnar.version())
+    return pd.DataFrame(
+        [(name, label, value, rows) for name, label in FILTERS if name in index.labels for value, rows in index.values(name)],
+        columns=["dimension", "label", "value", "count"],
+    )
+
+
+@store.cached()
+def _hex_cells(radius, region, filters, version):
+    # Every strike in the selection is binned, not a sample.
+    if region is None and not filters:
+        cells = artifacts.hex_cells(radius, version)
+        if cells is not None:
+            return cells
+        # Kept next to the columns and grown by each delta (utils.delta).
+        cells = aggregates.hex_cells(columnar.ensure(), radius)
+    else:
+        # Selection aggregates are chunked over a process pool for large inputs.
+        cells = mapreduce.hex_cells(columnar.ensure(), radius, selected_rows(region, filters, version))
+    cells["norm"] = (cells["count"] / cells["count"].max()).round(3)
+    return cells
+
+
+def hex_cells(radius, region=None, filters=(), version=None):
+    """Strikes and weapons per hexagon of ``radius`` meters (one of ``hexbin.RADII``)."""
+    if radius not in hexbin.RADII:
+        raise ValueError(f"radius must be one of {', '.join(map(str, hexbin.RADII))} meters")
+    version = version or columnar.version()
+    return _hex_cells(int(radius), normalize_region(region), normalize_filters(filters, version), version)
+
+
+@store.cached()
+def _histogram(log, region, filters, version):
+    if region is None and not filters:
+        bins = artifacts.histogram(log, version)
+        if bins is not None:
+            return bins
+        return aggregates.histogram_table(columnar.ensure(), HISTOGRAM_BINS, log)
+    return mapreduce.histogram_table(columnar.ensure(), WEAPONS, HISTOGRAM_BINS, log, selected_rows(region, filters, version))
+
+
+def histogram(log=False, region=None, filters=(), version=None):
+    """Strikes per bin of weapons delivered, on linear or log-scaled bins."""
+    version = version or columnar.version()
+    return _histogram(bool(log), normalize_region(region), normalize_filters(filters, version), version)
+
+
+@store.cached()
+def _time_cube(region, filters, version):
+    if DATE not in columnar.available():
+        raise ValueError("the loaded dataset has no MSNDATE column")
+    if region is None and not filters:
+        cube = artifacts.time_cube(version)
+        if cube is not None:
+            return cube
+        return aggregates.time_cube(columnar.ensure())
+    return mapreduce.time_cube(columnar.ensure(), rows=selected_rows(region, filters, version))
+
+
+def time_cube(region=None, filters=(), version=None):
+    """The month x grid cell :class:`~utils.timecube.TimeCube` of the selection."""
+    version = version or columnar.version()
+    return _time_cube(normalize_region(region), normalize_filters(filters, version), version)
+
+
+def monthly(region=None, filters=(), version=None):
+    """Strikes and weapons delivered per month."""
+    return time_cube(region, filters, version).totals()
+
+
+@store.cached()
+def herbicides():
+    """Liters sprayed and TCDD per agent, with ``PercentOfTotal`` of all liters."""
+    df = artifacts.table("herbicides", "herbicides.json", code=[herbicide_data])
+    return herbicide_data.herbicide_table() if df is None else df
+
+
+def herbicide_totals(by="Name"):
+    """Liters sprayed and percent of the total, grouped by an herbicide column."""
+    df = herbicides()
+    if by not in df.columns:
+        raise ValueError(f"unknown herbicide column {by!r}; expected one of {', '.join(df.columns)}")
+    totals = df.groupby(by, sort=False, as_index=False)["AmountSprayedLiters"].sum()
+    totals["PercentOfTotal"] = np.round(totals["AmountSprayedLiters"] / totals["AmountSprayedLiters"].sum() * 100, 2)
+    return totals
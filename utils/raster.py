@@ -0,0 +1,91 @@
+"""Datashader-style rasterization of strike locations.
+
+Every strike is binned into a ``width x height`` grid with NumPy, the grid is
+shaded through a color map and encoded as a PNG, so the browser receives one
+fixed-size image no matter how many strikes are drawn.
+"""
+
+import base64
+import io
+
+import numpy as np
+
+# ColorBrewer "Reds", light to dark (matches the old scatter's scheme).
+REDS = ["#fff5f0", "#fee0d2", "#fcbba1", "#fc9272", "#fb6a4a", "#ef3b2c", "#cb181d", "#a50f15", "#67000d"]
+
+
+def extent_of(lat, lon, pad=0.02, trim=0.1):
+    """(west, south, east, north) around the points, padded by a fraction.
+
+    The bounds are the ``trim`` and ``100 - trim`` percentiles, so a few
+    stray points can't stretch the raster over empty space.
+    """
+    if len(lat) == 0:
+        return (100.0, 8.0, 110.0, 24.0)
+    west, east = (float(value) for value in np.percentile(lon, (trim, 100 - trim)))
+    south, north = (float(value) for value in np.percentile(lat, (trim, 100 - trim)))
+    dx = max(east - west, 1e-3) * pad
+    dy = max(north - south, 1e-3) * pad
+    return (west - dx, south - dy, east + dx, north + dy)
+
+
+def rasterize(lat, lon, extent, width=600, height=600, weights=None):
+    """Sum of ``weights`` (or the count) per pixel; row 0 is the north edge."""
+    west, south, east, north = extent
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    px = np.floor((lon - west) / (east - west) * width).astype(np.int64)
+    py = np.floor((north - lat) / (north - south) * height).astype(np.int64)
+    inside = (px >= 0) & (px < width) & (py >= 0) & (py < height)
+    if weights is not None:
+        weights = np.nan_to_num(np.asarray(weights, dtype=np.float64))[inside]
+    grid = np.bincount(py[inside] * width + px[inside], weights=weights, minlength=width * height)
+    return grid.reshape(height, width)
+
+
+def colormap(colors=REDS, size=256):
+    """RGB lookup table interpolated between hex ``colors``."""
+    anchors = np.array([[int(c[i:i + 2], 16) for i in (1, 3, 5)] for c in colors], dtype=np.float64)
+    positions = np.linspace(0, 1, len(colors))
+    steps = np.linspace(0, 1, size)
+    return np.column_stack([np.interp(steps, positions, anchors[:, i]) for i in range(3)]).astype(np.uint8)
+
+
+def shade(grid, how="log", colors=REDS):
+    """RGBA image of the grid; empty pixels are transparent.
+
+    ``how`` is ``"linear"``, ``"log"`` or ``"eq_hist"`` (histogram
+    equalization, which spreads dense and sparse areas evenly over the
+    color map).
+    """
+    filled = grid > 0
+    values = grid[filled].astype(np.float64)
+    if how == "log":
+        values = np.log1p(values)
+    elif how == "eq_hist":
+        ranks = np.unique(values, return_inverse=True)[1].ravel()
+        values = ranks.astype(np.float64)
+
+    norm = np.zeros(grid.shape)
+    if len(values):
+        low, high = values.min(), values.max()
+        norm[filled] = (values - low) / (high - low) if high > low else 1.0
+    lut = colormap(colors)
+    rgba = np.zeros(grid.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = lut[np.rint(norm * (len(lut) - 1)).astype(np.int64)]
+    # Start light pixels partly transparent so single strikes stay visible
+    # without washing out the axes.
+    rgba[..., 3] = np.where(filled, 160 + np.rint(norm * 95).astype(np.int64), 0)
+    return rgba
+
+
+def to_png(rgba):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.fromarray(rgba, mode="RGBA").save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def data_url(png):
+    return "data:image/png;base64," + base64.b64encode(png).decode("ascii")
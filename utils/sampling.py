@@ -0,0 +1,112 @@
+"""Deterministic spatially-stratified sampling.
+
+Rows are grouped into strata by a lat/lon grid cell (and optionally a time
+bucket). Every stratum keeps a share of its rows proportional to its size,
+but never fewer than ``min_per_stratum``, so sparse regions survive the
+downsample. Each kept row gets a weight of ``stratum size / rows kept`` so
+weighted sums over the sample estimate totals over the full data.
+
+A ``budget`` is a hard cap. Every non-empty stratum first gets its floor
+(at least one row), and what is left of the budget is split in proportion
+to the rows each stratum has left. When the budget cannot give every
+stratum its floor, the largest strata give theirs up first, so the rare
+ones survive, and the weights are scaled up by ``all rows / rows in the
+kept strata``.
+"""
+
+import numpy as np
+
+
+def _offset(values):
+    values = values - values.min()
+    return values, int(values.max()) + 1
+
+
+def _compact(key, span):
+    # Dense relabelling is a single O(n) pass; fall back to a sort only when
+    # the key space is too sparse for a lookup table.
+    if span <= max(4 * len(key), 1 << 22):
+        occupied = np.bincount(key, minlength=span) > 0
+        return (np.cumsum(occupied) - 1)[key]
+    return np.unique(key, return_inverse=True)[1].ravel()
+
+
+def strata(lat, lon, cell_deg=0.5, time=None, time_bucket=None):
+    """Integer stratum id (0..k-1) for every row."""
+    lat_cell, lat_span = _offset(np.floor(np.asarray(lat, dtype=np.float64) / cell_deg).astype(np.int64))
+    lon_cell, lon_span = _offset(np.floor(np.asarray(lon, dtype=np.float64) / cell_deg).astype(np.int64))
+    key, span = lat_cell * lon_span + lon_cell, lat_span * lon_span
+    if time is not None:
+        buckets = np.asarray(time).astype(f"datetime64[{time_bucket or 'M'}]").astype(np.int64)
+        bucket, bucket_span = _offset(buckets)
+        key, span = key * bucket_span + bucket, span * bucket_span
+    return _compact(key, span)
+
+
+def allocate(sizes, ratio, min_per_stratum=1):
+    """Rows to keep per stratum at a given sampling ratio."""
+    keep = np.rint(sizes * ratio).astype(np.int64)
+    return np.minimum(sizes, np.maximum(keep, min_per_stratum))
+
+
+def _floors(sizes, budget, min_per_stratum):
+    # Smallest strata first, so when the floors don't all fit the budget the
+    # largest strata are the ones left out.
+    floors = np.minimum(sizes, max(min_per_stratum, 1))
+    if floors.sum() <= budget:
+        return floors
+    order = np.argsort(sizes, kind="stable")
+    fits = order[np.cumsum(floors[order]) <= budget]
+    keep = np.zeros(len(sizes), dtype=np.int64)
+    keep[fits] = floors[fits]
+    return keep
+
+
+def _split(room, extra):
+    # Largest-remainder split of ``extra`` rows in proportion to ``room``,
+    # never more than ``room`` per stratum.
+    if extra >= room.sum():
+        return room
+    share = room * (extra / room.sum())
+    keep = np.floor(share).astype(np.int64)
+    leftover = extra - int(keep.sum())
+    keep[np.argsort(keep - share, kind="stable")[:leftover]] += 1
+    return keep
+
+
+def stratified_sample(lat, lon, ratio=None, budget=None, cell_deg=0.5,
+                      time=None, time_bucket=None, min_per_stratum=1, seed=0):
+    """Pick a stratified sample.
+
+    Give either ``ratio`` (fraction of rows to keep) or ``budget`` (maximum
+    number of rows, never exceeded). Returns ``(indices, weights)``; indices
+    are sorted so the sample keeps the source order.
+    """
+    if (ratio is None) == (budget is None):
+        raise ValueError("pass exactly one of ratio or budget")
+
+    if len(lat) == 0 or (budget is not None and budget < 1):
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    ids = strata(lat, lon, cell_deg, time, time_bucket)
+    n = len(ids)
+    sizes = np.bincount(ids)
+    rng = np.random.default_rng(seed)
+    scale = 1.0
+    if budget is None:
+        keep = allocate(sizes, ratio, min_per_stratum)
+    else:
+        keep = _floors(sizes, budget, min_per_stratum)
+        if keep.all():
+            keep = keep + _split(sizes - keep, budget - int(keep.sum()))
+        else:
+            scale = n / sizes[keep > 0].sum()
+
+    # Sorting on id + U[0, 1) groups rows by stratum in a seeded random order.
+    order = np.argsort(ids + rng.random(n))
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    rank = np.arange(n) - starts[ids[order]]
+    chosen = order[rank < keep[ids[order]]]
+    chosen.sort()
+
+    weights = (sizes / np.maximum(keep, 1))[ids[chosen]] * scale
+    return chosen, weights
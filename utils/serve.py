@@ -0,0 +1,262 @@
+"""Local HTTP service over :mod:`utils.query`, for notebooks and reports.
+
+    python -m utils.serve --port 8600
+    curl 'localhost:8600/hex?radius=5000&region=DMZ (17th parallel)&year=1968'
+
+Endpoints (GET):
+
+    /hex?radius=...           strikes and weapons per hexagon (hexbin.RADII)
+    /histogram?log=1          strikes per bin of weapons delivered
+    /monthly                  strikes and weapons per month
+    /count                    number of selected strikes
+    /filters                  every filter value with its strike count
+    /herbicides?by=Name       liters sprayed and percent of total per group
+    /metrics                  request counts, latency percentiles, caches
+
+Bombing endpoints take ``region`` -- a name from ``spatial.REGIONS``,
+``bbox:south,west,north,east`` or ``radius:lat,lon,km`` -- and one parameter
+per filter dimension (``aircraft``, ``country``, ``service``, ``operation``,
+``year``), repeated for several values.
+
+Tables come back as JSON records, or as an Arrow IPC stream with
+``format=arrow`` or ``Accept: application/vnd.apache.arrow.stream``.
+Responses are cached in memory (``APP_RESPONSE_MB``, default 256) under the
+normalized query and the column cache version, so parameter order, value
+order and a region's name or shape share one entry. The ETag is a hash of
+the body, and a matching ``If-None-Match`` is answered 304 Not Modified.
+"""
+
+import argparse
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from utils import columnar, query, store
+
+RESPONSE_MB_ENV = "APP_RESPONSE_MB"
+DEFAULT_RESPONSE_MB = 256
+LATENCY_SAMPLES = 1000
+JSON_TYPE = "application/json"
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+BOMBING_PARAMS = {"region", "format"} | {label.lower() for _, label in query.FILTERS}
+
+# Region parameter kind -> how many numbers it takes.
+REGION_SHAPES = {"bbox": 4, "radius": 3}
+
+RESPONSES = store.Store(float(os.environ.get(RESPONSE_MB_ENV, DEFAULT_RESPONSE_MB)))
+
+
+def parse_region(value):
+    """A region parameter as a name, a ``(kind, params)`` shape or None."""
+    if value is None or value == "all":
+        return None
+    kind, sep, params = value.partition(":")
+    if not sep or kind not in REGION_SHAPES:
+        return value
+    try:
+        params = tuple(float(part) for part in params.split(","))
+    except ValueError:
+        raise ValueError(f"bad region parameters {params!r}") from None
+    if len(params) != REGION_SHAPES[kind]:
+        raise ValueError(f"{kind} regions take {REGION_SHAPES[kind]} numbers")
+    return kind, params
+
+
+def _selection(params, version):
+    region = query.normalize_region(parse_region(_one(params, "region")))
+    filters = [(label, params[label.lower()]) for _, label in query.FILTERS if label.lower() in params]
+    return region, query.normalize_filters(filters, version)
+
+
+def _one(params, name, default=None):
+    values = params.get(name)
+    return values[-1] if values else default
+
+
+def _int(params, name, default):
+    value = _one(params, name, default)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer") from None
+
+
+# Each endpoint: (parameter names, key(params) -> normalized query,
+# compute(*normalized query) -> table or dict).
+
+def _bombing(compute, extra=None, extra_params=()):
+    # Keyed by the column cache version, the selection and extra parameters.
+    def key(params):
+        version = columnar.version()
+        return (version, *_selection(params, version), *(extra(params) if extra else ()))
+    return BOMBING_PARAMS | set(extra_params), key, compute
+
+
+ENDPOINTS = {
+    "/hex": _bombing(
+        lambda version, region, filters, radius: query.hex_cells(radius, region, filters, version),
+        lambda params: (_int(params, "radius", None),), ("radius",),
+    ),
+    "/histogram": _bombing(
+        lambda version, region, filters, log: query.histogram(log, region, filters, version),
+        lambda params: (_one(params, "log", "0") not in ("0", "false", ""),), ("log",),
+    ),
+    "/monthly": _bombing(lambda version, region, filters: query.monthly(region, filters, version)),
+    "/count": _bombing(lambda version, region, filters: {"strikes": query.count(region, filters, version)}),
+    "/filters": ({"format"}, lambda params: (columnar.version(),), lambda version: query.filter_values(version)),
+    "/herbicides": (
+        {"by", "format"},
+        lambda params: (_one(params, "by", "Name"),),
+        lambda by: query.herbicide_totals(by),
+    ),
+}
+
+
+def to_json(result):
+    if isinstance(result, pd.DataFrame):
+        return result.to_json(orient="records", date_format="iso").encode()
+    return json.dumps(result, default=lambda value: value.item() if isinstance(value, np.generic) else str(value)).encode()
+
+
+def to_arrow(result):
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(result if isinstance(result, pd.DataFrame) else pd.DataFrame([result]), preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def respond(path, params, content_type):
+    """``(etag, body, content type)`` for a query, from the response cache."""
+    allowed, key, compute = ENDPOINTS[path]
+    unknown = sorted(set(params) - allowed)
+    if unknown:
+        raise ValueError(f"unknown parameters {', '.join(unknown)} for {path}")
+    normalized = key(params)
+
+    def render():
+        result = compute(*normalized)
+        body = to_arrow(result) if content_type == ARROW_TYPE else to_json(result)
+        return f'"{hashlib.sha256(body).hexdigest()[:32]}"', body, content_type
+
+    return RESPONSES.get((path, normalized, content_type), render)
+
+
+class Metrics:
+    """Per-endpoint request counts and recent latencies."""
+
+    def __init__(self, samples=LATENCY_SAMPLES):
+        self._lock = threading.Lock()
+        self._latencies = collections.defaultdict(lambda: collections.deque(maxlen=samples))
+        self._counts = collections.defaultdict(collections.Counter)
+
+    def record(self, path, status, seconds):
+        with self._lock:
+            self._latencies[path].append(seconds)
+            self._counts[path][str(status)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = {}
+            for path, latencies in self._latencies.items():
+                ms = np.asarray(latencies) * 1000
+                endpoints[path] = {
+                    "requests": sum(self._counts[path].values()),
+                    "status": dict(self._counts[path]),
+                    "p50_ms": round(float(np.percentile(ms, 50)), 2),
+                    "p95_ms": round(float(np.percentile(ms, 95)), 2),
+                    "max_ms": round(float(ms.max()), 2),
+                }
+        return {"endpoints": endpoints, "responses": RESPONSES.stats(), "store": store.stats()}
+
+
+METRICS = Metrics()
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "VietnamWarQuery/1"
+
+    def do_GET(self):
+        started = time.perf_counter()
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        status = 500
+        try:
+            if url.path == "/metrics":
+                status = self._send(200, *self._json(METRICS.snapshot()))
+            elif url.path not in ENDPOINTS:
+                status = self._send(404, *self._json({"error": f"no endpoint {url.path}", "endpoints": sorted(ENDPOINTS)}))
+            else:
+                wants_arrow = _one(params, "format") == "arrow" or ARROW_TYPE in self.headers.get("Accept", "")
+                etag, body, content_type = respond(url.path, params, ARROW_TYPE if wants_arrow else JSON_TYPE)
+                if etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]:
+                    status = self._send(304, b"", None, etag)
+                else:
+                    status = self._send(200, body, content_type, etag)
+        except ValueError as error:
+            status = self._send(400, *self._json({"error": str(error)}))
+        except Exception as error:
+            self.log_error("%s failed: %r", self.path, error)
+            status = self._send(500, *self._json({"error": "internal error"}))
+        finally:
+            if url.path != "/metrics":
+                # Unknown paths share one entry, so probes can't grow the table.
+                path = url.path if url.path in ENDPOINTS else "other"
+                METRICS.record(path, status, time.perf_counter() - started)
+
+    def _json(self, value):
+        return to_json(value), JSON_TYPE
+
+    def _send(self, status, body, content_type, etag=None):
+        self.send_response(status)
+        if etag is not None:
+            self.send_header("ETag", etag)
+            # Revalidate every time; the version can change under the URL.
+            self.send_header("Cache-Control", "no-cache")
+        if content_type is not None:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return status
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(host="127.0.0.1", port=8600, quiet=False):
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.quiet = quiet
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the bombing and herbicide aggregates over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--quiet", action="store_true", help="don't log each request")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port, args.quiet)
+    print(f"serving on http://{args.host}:{server.server_port}/ ({', '.join(sorted(ENDPOINTS))}, /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Uniform-grid spatial index over strike coordinates.
+
+Points are bucketed into ``cell_deg`` grid cells and sorted by cell, with an
+offsets array marking where each cell starts (CSR layout). A query only
+touches the cells overlapping its bounding box. The region's outline is
+rasterized onto the grid; cells away from it are wholly inside or outside,
+decided by testing their center, and the exact per-point test only runs in
+cells next to the boundary.
+
+Regions are described as hashable tuples so they can key Streamlit caches:
+
+* ``("bbox", (south, west, north, east))``
+* ``("radius", (lat, lon, km))``
+* ``("polygon", ((lon, lat), ...))``
+"""
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG = np.pi * EARTH_RADIUS_KM / 180
+
+REGIONS = {
+    "Ho Chi Minh Trail corridor": ("polygon", (
+        (104.8, 18.6), (106.0, 18.2), (106.9, 16.8), (107.6, 15.0),
+        (107.6, 12.0), (106.8, 11.3), (106.0, 12.0), (106.3, 14.5),
+        (105.6, 16.3), (104.5, 17.8),
+    )),
+    "Within 50 km of Khe Sanh": ("radius", (16.63, 106.73, 50.0)),
+    "DMZ (17th parallel)": ("bbox", (16.8, 106.0, 17.3, 107.2)),
+    "Within 60 km of Hanoi": ("radius", (21.03, 105.85, 60.0)),
+}
+
+
+# Upper bound on grid cells, so a few far-off outliers can't blow up the
+# offsets array; the cell size doubles until the grid fits.
+MAX_CELLS = 1 << 22
+
+
+def _coords(values):
+    # Float columns are kept as they come -- the float32 cache columns stay
+    # views of the mapped files rather than private float64 copies.
+    values = np.asarray(values)
+    return values if values.dtype.kind == "f" else values.astype(np.float64)
+
+
+class GridIndex:
+    def __init__(self, lat, lon, cell_deg=0.05):
+        self.lat = _coords(lat)
+        self.lon = _coords(lon)
+        self.lat0 = float(self.lat.min()) if len(self.lat) else 0.0
+        self.lon0 = float(self.lon.min()) if len(self.lon) else 0.0
+        lat_span = float(self.lat.max()) - self.lat0 if len(self.lat) else 0.0
+        lon_span = float(self.lon.max()) - self.lon0 if len(self.lon) else 0.0
+        while (lat_span / cell_deg + 1) * (lon_span / cell_deg + 1) > MAX_CELLS:
+            cell_deg *= 2
+        self.cell_deg = cell_deg
+        rows = self._row(self.lat)
+        cols = self._col(self.lon)
+        self.n_rows = int(rows.max()) + 1 if len(rows) else 1
+        self.n_cols = int(cols.max()) + 1 if len(cols) else 1
+
+        cells = rows * self.n_cols + cols
+        del rows, cols
+        # The order is held for the life of the index, so it is narrowed to
+        # int32 whenever the row count allows.
+        order_dtype = np.int32 if len(cells) < np.iinfo(np.int32).max else np.int64
+        self.order = np.argsort(cells, kind="stable").astype(order_dtype, copy=False)
+        counts = np.bincount(cells, minlength=self.n_rows * self.n_cols)
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _row(self, lat):
+        return np.floor((lat - self.lat0) / self.cell_deg).astype(np.int64)
+
+    def _col(self, lon):
+        return np.floor((lon - self.lon0) / self.cell_deg).astype(np.int64)
+
+    def _cells(self, south, west, north, east):
+        row0, row1 = np.clip(self._row(np.array([south, north])), 0, self.n_rows - 1)
+        col0, col1 = np.clip(self._col(np.array([west, east])), 0, self.n_cols - 1)
+        return row0, row1, col0, col1
+
+    def _gather(self, cells):
+        # Concatenate order[offsets[c]:offsets[c + 1]] for every cell without a
+        # Python loop.
+        starts = self.offsets[cells]
+        lengths = self.offsets[cells + 1] - starts
+        total = int(lengths.sum())
+        shift = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return self.order[shift + np.arange(total)]
+
+    def _select(self, south, west, north, east, contains, outline):
+        """Indices of points in the box for which ``contains(lat, lon)`` holds.
+
+        ``outline`` is the region boundary as closed (lon, lat) vertices.
+        """
+        if north < self.lat0 or east < self.lon0 or len(self) == 0:
+            return np.empty(0, dtype=np.int64)
+        row0, row1, col0, col1 = self._cells(south, west, north, east)
+        shape = (row1 - row0 + 1, col1 - col0 + 1)
+
+        # Sample the outline at a quarter cell and mark the cells it passes
+        # through, grown by one cell so nothing on the boundary is missed.
+        lon, lat = densify(outline, self.cell_deg / 4).T
+        rows = np.clip(self._row(lat) - row0, 0, shape[0] - 1)
+        cols = np.clip(self._col(lon) - col0, 0, shape[1] - 1)
+        edge = np.zeros((shape[0] + 2, shape[1] + 2), dtype=bool)
+        for dr in (0, 1, 2):
+            for dc in (0, 1, 2):
+                edge[rows + dr, cols + dc] = True
+        edge = edge[1:-1, 1:-1]
+
+        center_lat = self.lat0 + (np.arange(row0, row1 + 1) + 0.5) * self.cell_deg
+        center_lon = self.lon0 + (np.arange(col0, col1 + 1) + 0.5) * self.cell_deg
+        grid_lat, grid_lon = np.meshgrid(center_lat, center_lon, indexing="ij")
+        full = ~edge & contains(grid_lat, grid_lon)
+
+        grid_rows, grid_cols = np.meshgrid(np.arange(row0, row1 + 1), np.arange(col0, col1 + 1), indexing="ij")
+        cells = grid_rows * self.n_cols + grid_cols
+        sure = self._gather(cells[full])
+        maybe = self._gather(cells[edge])
+        maybe = maybe[contains(self.lat[maybe], self.lon[maybe])]
+        return self._sorted(np.concatenate((sure, maybe)))
+
+    def _sorted(self, idx):
+        # For large results a mask scan is cheaper than sorting.
+        if len(idx) * 16 < len(self):
+            return np.sort(idx).astype(np.int64, copy=False)
+        mask = np.zeros(len(self), dtype=bool)
+        mask[idx] = True
+        return np.flatnonzero(mask)
+
+    def bbox(self, south, west, north, east):
+        def contains(lat, lon):
+            return (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+        outline = [(west, south), (east, south), (east, north), (west, north)]
+        return self._select(south, west, north, east, contains, outline)
+
+    def radius(self, lat, lon, km):
+        def contains(lats, lons):
+            return haversine_km(lat, lon, lats, lons) <= km
+        outline = circle(lat, lon, km)
+        west, south = outline.min(axis=0)
+        east, north = outline.max(axis=0)
+        return self._select(south, west, north, east, contains, outline)
+
+    def polygon(self, vertices):
+        vertices = np.asarray(vertices, dtype=np.float64)
+        west, south = vertices.min(axis=0)
+        east, north = vertices.max(axis=0)
+
+        def contains(lat, lon):
+            return points_in_polygon(lon, lat, vertices)
+        return self._select(south, west, north, east, contains, vertices)
+
+    def query(self, region):
+        """Row indices inside a region tuple, or None for the whole dataset."""
+        if region is None:
+            return None
+        kind, args = region
+        if kind == "bbox":
+            return self.bbox(*args)
+        if kind == "radius":
+            return self.radius(*args)
+        if kind == "polygon":
+            return self.polygon(args)
+        raise ValueError(f"unknown region kind: {kind}")
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def circle(lat, lon, km, points=256):
+    """(lon, lat) vertices of the circle of ``km`` around a point, slightly
+    padded so the polygon contains the true circle."""
+    delta = km * 1.001 / EARTH_RADIUS_KM
+    bearing = np.linspace(0, 2 * np.pi, points, endpoint=False)
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2 = np.arcsin(np.sin(lat1) * np.cos(delta) + np.cos(lat1) * np.sin(delta) * np.cos(bearing))
+    lon2 = lon1 + np.arctan2(
+        np.sin(bearing) * np.sin(delta) * np.cos(lat1),
+        np.cos(delta) - np.sin(lat1) * np.sin(lat2),
+    )
+    return np.column_stack((np.degrees(lon2), np.degrees(lat2)))
+
+
+def densify(vertices, step):
+    """Points along a closed polyline, no more than ``step`` apart."""
+    vertices = np.asarray(vertices, dtype=np.float64)
+    start, end = vertices, np.roll(vertices, -1, axis=0)
+    counts = np.maximum(np.ceil(np.hypot(*(end - start).T) / step).astype(np.int64), 1)
+    segment = np.repeat(np.arange(len(vertices)), counts)
+    t = (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)) / counts[segment]
+    return start[segment] + (end - start)[segment] * t[:, None]
+
+
+def points_in_polygon(x, y, vertices):
+    """Even-odd ray casting, vectorized over points."""
+    inside = np.zeros(np.shape(x), dtype=bool)
+    x0, y0 = vertices[-1]
+    for x1, y1 in vertices:
+        crosses = (y1 > y) != (y0 > y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_at = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+        inside ^= crosses & (x < x_at)
+        x0, y0 = x1, y1
+    return inside
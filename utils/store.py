@@ -0,0 +1,173 @@
+"""Process-wide store for the base columns and the views derived from them.
+
+One ``Store`` is shared by every session in the server process. Values are
+kept by key under a memory budget (``APP_CACHE_MB``, default 1024), and the
+least recently used entries are evicted until a new one fits. Values larger
+than the whole budget are returned but not kept.
+
+Unlike ``st.cache_data``, a hit returns the stored object itself rather than
+an unpickled copy, so the pages must treat cached values as read-only. When
+several sessions ask for the same missing key, only one of them computes it
+and the others wait for that result (single flight). They share its
+exceptions too, but not a Streamlit stop or rerun: if the computing session
+is interrupted, a waiting one computes the value itself.
+
+    @store.cached()
+    def load_hex_cells(radius, region, version):
+        ...
+"""
+
+import collections
+import functools
+import mmap
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+BUDGET_ENV = "APP_CACHE_MB"
+DEFAULT_BUDGET_MB = 1024
+
+
+def _mapped(array):
+    # Views of a memory-mapped file (pandas keeps them as plain ndarrays).
+    # Copies of a memmap are np.memmap instances too, but hold no mapping.
+    while array is not None:
+        if isinstance(array, mmap.mmap) or getattr(array, "_mmap", None) is not None:
+            return True
+        array = getattr(array, "base", None)
+    return False
+
+
+def _mapped_bytes(values):
+    # Bytes of a column's storage that are memory-mapped rather than held.
+    values = values.codes if isinstance(values, pd.Categorical) else np.asarray(values)
+    return values.nbytes if _mapped(values) else 0
+
+
+def sizeof(value):
+    """Approximate bytes held by ``value`` (arrays, frames, plain objects)."""
+    if isinstance(value, np.ndarray):
+        # Memory-mapped columns live in the page cache, not the heap.
+        return 0 if _mapped(value) else value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(index=True, deep=True)
+        if isinstance(value, pd.Series):
+            return int(usage) - _mapped_bytes(value.array)
+        return int(usage.sum()) - sum(_mapped_bytes(value.iloc[:, i].array) for i in range(value.shape[1]))
+    if isinstance(value, pd.Categorical):
+        return value.nbytes - _mapped_bytes(value)
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    if isinstance(value, (tuple, list)):
+        return sum(sizeof(item) for item in value) + sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sum(sizeof(item) for item in value.values()) + sys.getsizeof(value)
+    if hasattr(value, "__dict__"):
+        return sum(sizeof(item) for item in vars(value).values())
+    return sys.getsizeof(value)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.aborted = False
+
+
+class Store:
+    def __init__(self, budget_mb=DEFAULT_BUDGET_MB):
+        self.budget = int(budget_mb * 2**20)
+        self._entries = collections.OrderedDict()  # key -> (value, size)
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.size = 0
+        self.counters = {"hits": 0, "misses": 0, "waits": 0, "evictions": 0, "uncached": 0}
+
+    def get(self, key, compute):
+        """Return the value for ``key``, computing it at most once at a time."""
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return self._entries[key][0]
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight()
+                    self.counters["misses"] += 1
+                else:
+                    self.counters["waits"] += 1
+            if leader:
+                return self._lead(key, flight, compute)
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            if not flight.aborted:
+                return flight.value
+            # The leader was stopped (st.stop(), a rerun, Ctrl-C) rather than
+            # failing; that is not this caller's to raise, so compute it here.
+
+    def _lead(self, key, flight, compute):
+        try:
+            flight.value = compute()
+        except Exception as error:
+            flight.error = error
+            raise
+        except BaseException:
+            flight.aborted = True
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                if flight.error is None and not flight.aborted:
+                    self._put(key, flight.value)
+            flight.done.set()
+        return flight.value
+
+    def _put(self, key, value):
+        size = sizeof(value)
+        if size > self.budget:
+            self.counters["uncached"] += 1
+            return
+        while self._entries and self.size + size > self.budget:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= evicted
+            self.counters["evictions"] += 1
+        self._entries[key] = (value, size)
+        self.size += size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, "entries": len(self._entries),
+                    "mb": round(self.size / 2**20, 1), "budget_mb": round(self.budget / 2**20)}
+
+
+STORE = Store(float(os.environ.get(BUDGET_ENV, DEFAULT_BUDGET_MB)))
+
+
+def cached(store=None):
+    """Decorator keying calls by function and (hashable) arguments."""
+    def decorator(func):
+        # Pages all run as __main__, so the file tells them apart.
+        name = f"{func.__code__.co_filename}:{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())))
+            return (store or STORE).get(key, lambda: func(*args, **kwargs))
+        return wrapper
+    return decorator
+
+
+def stats():
+    return STORE.stats()
@@ -0,0 +1,151 @@
+"""Synthetic stand-ins for ``data/vietnam_bombing_trimmed.csv``.
+
+Strikes are drawn around the places the real THOR records concentrate on:
+the Ho Chi Minh Trail, the DMZ, Khe Sanh, the Red River delta and the Plain
+of Jars, plus a thin uniform background over Indochina. Weapon counts are
+heavy-tailed, dates follow the intensity of the air campaigns, and a small
+fraction of rows has missing or out-of-range coordinates the way the source
+does. Rows are written in chunks, so 5 million of them take no more memory
+than 250 thousand.
+
+Run ``python -m utils.synthetic <rows> [<out.csv>] [--seed N]``.
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.ingest import AIRCRAFT, COUNTRY, DATE, LAT, LON, OPERATION, SERVICE, WEAPONS
+
+CHUNK_ROWS = 250_000
+
+# (lat, lon, sd_lat, sd_lon, share)
+CLUSTERS = [
+    (17.0, 106.4, 0.35, 0.30, 0.14),  # DMZ / Route Package 1
+    (16.65, 106.73, 0.12, 0.12, 0.05),  # Khe Sanh
+    (21.0, 105.85, 0.30, 0.35, 0.07),  # Hanoi
+    (20.85, 106.68, 0.15, 0.20, 0.04),  # Haiphong
+    (19.4, 103.2, 0.40, 0.45, 0.06),  # Plain of Jars
+    (11.5, 106.4, 0.60, 0.50, 0.08),  # War Zones C/D and the Cambodian border
+    (10.2, 105.8, 0.50, 0.60, 0.04),  # Mekong delta
+]
+# The trail is a polyline strikes scatter along; it takes what the clusters
+# and the background leave.
+TRAIL = np.array([
+    (18.0, 105.6), (17.4, 105.9), (16.8, 106.3), (16.0, 106.7),
+    (15.2, 107.0), (14.5, 107.1), (13.6, 107.3), (12.6, 107.2),
+])
+TRAIL_SD = 0.18
+BACKGROUND = 0.05
+BOUNDS = (8.5, 100.5, 23.0, 109.5)  # south, west, north, east
+BAD_COORDS = 0.001
+
+START = np.datetime64("1965-01-01")
+END = np.datetime64("1973-08-15")
+# Relative strike intensity per year, 1965..1973.
+YEAR_WEIGHTS = [0.4, 0.8, 1.0, 1.2, 1.1, 0.9, 0.8, 1.0, 0.3]
+
+AIRCRAFT_MIX = {"F-4": 0.35, "F-105": 0.12, "A-4": 0.12, "B-52": 0.08, "A-1": 0.08, "F-100": 0.08, "A-7": 0.07, "A-6": 0.05, "AC-130": 0.05}
+COUNTRY_MIX = {"UNITED STATES OF AMERICA": 0.9, "VIETNAM (SOUTH)": 0.07, "AUSTRALIA": 0.02, "KOREA (SOUTH)": 0.01}
+OPERATION_MIX = {"": 0.35, "ROLLING THUNDER": 0.2, "STEEL TIGER": 0.15, "TIGER HOUND": 0.1, "BARREL ROLL": 0.1, "COMMANDO HUNT": 0.07, "LINEBACKER": 0.03}
+SERVICE_MIX = {"USAF": 0.55, "USN": 0.25, "USMC": 0.12, "VNAF": 0.06, "RAAF": 0.02}
+
+
+def _choice(rng, mix, n):
+    names = list(mix)
+    shares = np.array(list(mix.values()), dtype=np.float64)
+    return np.array(names, dtype=object)[rng.choice(len(names), n, p=shares / shares.sum())]
+
+
+def _coords(rng, n):
+    lat = np.empty(n)
+    lon = np.empty(n)
+    shares = [c[4] for c in CLUSTERS] + [BACKGROUND]
+    shares.append(1.0 - sum(shares))
+    source = rng.choice(len(shares), n, p=shares)
+
+    for i, (clat, clon, sd_lat, sd_lon, _) in enumerate(CLUSTERS):
+        rows = source == i
+        lat[rows] = rng.normal(clat, sd_lat, rows.sum())
+        lon[rows] = rng.normal(clon, sd_lon, rows.sum())
+
+    rows = source == len(CLUSTERS)
+    south, west, north, east = BOUNDS
+    lat[rows] = rng.uniform(south, north, rows.sum())
+    lon[rows] = rng.uniform(west, east, rows.sum())
+
+    rows = np.flatnonzero(source == len(CLUSTERS) + 1)
+    segment = rng.integers(0, len(TRAIL) - 1, len(rows))
+    t = rng.random(len(rows))[:, None]
+    points = TRAIL[segment] * (1 - t) + TRAIL[segment + 1] * t
+    lat[rows] = points[:, 0] + rng.normal(0, TRAIL_SD, len(rows))
+    lon[rows] = points[:, 1] + rng.normal(0, TRAIL_SD, len(rows))
+
+    bad = rng.random(n) < BAD_COORDS
+    lat[bad] = np.where(rng.random(bad.sum()) < 0.5, np.nan, 0.0)
+    lon[bad] = np.where(np.isnan(lat[bad]), np.nan, 0.0)
+    return lat, lon
+
+
+def _dates(rng, n):
+    days = np.arange(START, END + 1)
+    years = days.astype("datetime64[Y]").astype(int) + 1970
+    weights = np.asarray(YEAR_WEIGHTS)[years - 1965]
+    return days[rng.choice(len(days), n, p=weights / weights.sum())]
+
+
+def _weapons(rng, n):
+    weapons = np.rint(rng.lognormal(1.6, 1.1, n))
+    weapons[rng.random(n) < 0.1] = 0
+    # B-52 style area strikes in the long tail.
+    heavy = rng.random(n) < 0.01
+    weapons[heavy] = rng.integers(50, 600, heavy.sum())
+    weapons[rng.random(n) < 0.02] = np.nan
+    return weapons
+
+
+def chunk(rng, n):
+    lat, lon = _coords(rng, n)
+    return pd.DataFrame({
+        DATE: _dates(rng, n),
+        LAT: np.round(lat, 6),
+        LON: np.round(lon, 6),
+        WEAPONS: _weapons(rng, n),
+        AIRCRAFT: _choice(rng, AIRCRAFT_MIX, n),
+        COUNTRY: _choice(rng, COUNTRY_MIX, n),
+        OPERATION: _choice(rng, OPERATION_MIX, n),
+        SERVICE: _choice(rng, SERVICE_MIX, n),
+    })
+
+
+def generate(rows, path, seed=0, chunk_rows=CHUNK_ROWS):
+    """Write ``rows`` synthetic strikes to ``path``; returns ``path``."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", newline="") as f:
+        for start in range(0, rows, chunk_rows):
+            frame = chunk(rng, min(chunk_rows, rows - start))
+            frame.to_csv(f, index=False, header=start == 0)
+    os.replace(tmp, path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("rows", type=float, help="number of rows, e.g. 1e6")
+    parser.add_argument("out", nargs="?", default="data/vietnam_bombing_trimmed.csv")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    generate(int(args.rows), args.out, args.seed)
+    print(f"{int(args.rows):,} rows -> {args.out} ({os.path.getsize(args.out) / 1e6:.0f} MB, "
+          f"{time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
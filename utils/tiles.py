@@ -0,0 +1,140 @@
+"""Quadtree tile pyramid of strikes for the deck.gl TileLayer.
+
+Tiles follow the standard Web Mercator ``{z}/{x}/{y}`` scheme and are written
+as small GeoJSON files, so the map only fetches the tiles covering the
+viewport at the current zoom. Below ``RAW_ZOOM`` each tile holds strikes
+aggregated into a ``BINS x BINS`` grid (one point per occupied bin, at the
+centroid of its strikes); at ``RAW_ZOOM`` tiles hold the raw strikes, and
+deck.gl over-zooms them beyond that.
+
+The files are plain static assets: Streamlit serves ``static/`` when
+``server.enableStaticServing`` is on, and under stlite they are fetched from
+next to index.html.
+"""
+
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+
+TILE_ROOT = "static/tiles"
+MIN_ZOOM = 4
+RAW_ZOOM = 10
+BINS = 64
+
+
+def url_template():
+    # Streamlit mounts static/ under app/static; stlite has no server, so the
+    # browser fetches the files relative to the page hosting index.html.
+    prefix = "" if sys.platform == "emscripten" else "app/"
+    return prefix + TILE_ROOT + "/{z}/{x}/{y}.json"
+
+
+META_FILE = "meta.json"
+
+
+def available(source, root=TILE_ROOT):
+    """True if tiles built from the data with sha256 ``source`` are on disk."""
+    try:
+        with open(os.path.join(root, META_FILE)) as f:
+            return json.load(f)["source"] == source
+    except (OSError, ValueError, KeyError):
+        return False
+
+
+def tile_coords(lat, lon, zoom):
+    """Fractional Web Mercator tile coordinates at ``zoom``."""
+    scale = 2.0 ** zoom
+    lat = np.radians(np.clip(np.asarray(lat, dtype=np.float64), -85.0511, 85.0511))
+    x = (np.asarray(lon, dtype=np.float64) + 180.0) / 360.0 * scale
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0 * scale
+    return x, y
+
+
+def _features(lat, lon, count, weapons, radius, norm):
+    template = (
+        '{"type":"Feature","geometry":{"type":"Point","coordinates":[%.5f,%.5f]},'
+        '"properties":{"count":%d,"weapons":%d,"r":%.1f,"n":%.3f}}'
+    )
+    return ",".join(
+        template % row for row in zip(lon.tolist(), lat.tolist(), count.tolist(),
+                                      weapons.tolist(), radius.tolist(), norm.tolist())
+    )
+
+
+def _write(root, zoom, keys, order, boundaries, scale, columns):
+    lat, lon, count, weapons, radius, norm = columns
+    for start, stop in zip(boundaries[:-1], boundaries[1:]):
+        key = int(keys[order[start]])
+        x, y = key // scale, key % scale
+        rows = order[start:stop]
+        directory = os.path.join(root, str(zoom), str(x))
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{y}.json"), "w") as f:
+            f.write('{"type":"FeatureCollection","features":[')
+            f.write(_features(lat[rows], lon[rows], count[rows], weapons[rows], radius[rows], norm[rows]))
+            f.write("]}")
+
+
+def _groups(keys):
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    boundaries = np.flatnonzero(np.diff(sorted_keys)) + 1
+    return order, np.concatenate(([0], boundaries, [len(keys)]))
+
+
+def write_level(lat, lon, weapons, zoom, root=TILE_ROOT):
+    """Write every occupied tile at one zoom level; returns the tile count."""
+    if len(lat) == 0:
+        return 0
+    scale = 1 << zoom
+    x, y = tile_coords(lat, lon, zoom)
+    tx = np.clip(x.astype(np.int64), 0, scale - 1)
+    ty = np.clip(y.astype(np.int64), 0, scale - 1)
+    tile = tx * scale + ty
+
+    if zoom >= RAW_ZOOM:
+        n = len(lat)
+        columns = (lat, lon, np.ones(n, dtype=np.int64), weapons.astype(np.int64),
+                   np.full(n, 2.0), np.zeros(n))
+        order, boundaries = _groups(tile)
+        _write(root, zoom, tile, order, boundaries, scale, columns)
+        return len(boundaries) - 1
+
+    bx = np.clip(((x - tx) * BINS).astype(np.int64), 0, BINS - 1)
+    by = np.clip(((y - ty) * BINS).astype(np.int64), 0, BINS - 1)
+    cells, inverse = np.unique(tile * BINS * BINS + by * BINS + bx, return_inverse=True)
+    inverse = inverse.ravel()
+    count = np.bincount(inverse)
+    columns = (
+        np.bincount(inverse, weights=lat) / count,
+        np.bincount(inverse, weights=lon) / count,
+        count,
+        np.rint(np.bincount(inverse, weights=weapons)).astype(np.int64),
+        np.clip(np.sqrt(count), 2.0, 12.0),
+        count / count.max(),
+    )
+    cell_tile = cells // (BINS * BINS)
+    order, boundaries = _groups(cell_tile)
+    _write(root, zoom, cell_tile, order, boundaries, scale, columns)
+    return len(boundaries) - 1
+
+
+def build(lat, lon, weapons, source, root=TILE_ROOT, min_zoom=MIN_ZOOM, raw_zoom=RAW_ZOOM):
+    """Write the whole pyramid; returns {zoom: tile count}.
+
+    ``source`` is the sha256 of the data the strikes came from, recorded so
+    the page can tell whether the tiles on disk are current.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    weapons = np.nan_to_num(np.asarray(weapons, dtype=np.float64))
+    shutil.rmtree(root, ignore_errors=True)
+    # Made up front: a selection with no strikes writes no tiles, only meta.
+    os.makedirs(root)
+    counts = {zoom: write_level(lat, lon, weapons, zoom, root) for zoom in range(min_zoom, raw_zoom + 1)}
+    with open(os.path.join(root, META_FILE), "w") as f:
+        json.dump({"source": source, "tiles": counts}, f)
+    return counts
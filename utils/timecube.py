@@ -0,0 +1,123 @@
+"""Precomputed spatio-temporal cube of strike counts and weapons.
+
+Strikes are binned once into (month, grid cell) over the occupied cells only.
+A map frame is then a single row slice of the cube, so scrubbing or animating
+the timeline never touches the raw rows.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class TimeCube:
+    def __init__(self, months, lat, lon, counts, weapons, cell_deg):
+        self.months = months          # datetime64[M], one per cube row
+        self.lat = lat                # cell centers, one per cube column
+        self.lon = lon
+        self.counts = counts          # int32 (months x cells)
+        self.weapons = weapons        # float32 (months x cells)
+        self.cell_deg = cell_deg
+
+    def __len__(self):
+        return len(self.months)
+
+    @property
+    def labels(self):
+        return [str(month) for month in self.months]
+
+    @property
+    def max_count(self):
+        return int(self.counts.max()) if self.counts.size else 0
+
+    def frame(self, index):
+        """Occupied cells for one month as a DataFrame."""
+        counts = self.counts[index]
+        cells = np.flatnonzero(counts)
+        return pd.DataFrame({
+            "lat": self.lat[cells],
+            "lon": self.lon[cells],
+            "count": counts[cells],
+            "weapons": self.weapons[index, cells].astype(np.int64),
+        })
+
+    def totals(self):
+        """Strikes and weapons per month across all cells."""
+        return pd.DataFrame({
+            "month": self.months.astype("datetime64[ns]"),
+            "count": self.counts.sum(axis=1),
+            "weapons": self.weapons.sum(axis=1),
+        })
+
+
+# (month, lat cell, lon cell) are packed into one int64 key, 21 bits each.
+_BITS = 21
+_OFFSET = 1 << (_BITS - 1)
+_MASK = (1 << _BITS) - 1
+
+
+def partial(lat, lon, dates, weapons, cell_deg=0.25):
+    """Occupied (month, cell) pairs of one batch as ``(keys, counts, weapons)``.
+
+    Rows without a date are skipped. Batches binned separately combine
+    exactly with :func:`merge`.
+    """
+    months = np.asarray(dates).astype("datetime64[M]")
+    valid = ~np.isnat(months)
+    lat_cell = np.floor(np.asarray(lat, dtype=np.float64)[valid] / cell_deg).astype(np.int64)
+    lon_cell = np.floor(np.asarray(lon, dtype=np.float64)[valid] / cell_deg).astype(np.int64)
+    month = months[valid].astype(np.int64)
+    weapons = np.nan_to_num(np.asarray(weapons, dtype=np.float64)[valid])
+
+    key = ((month + _OFFSET) << (2 * _BITS)) | ((lat_cell + _OFFSET) << _BITS) | (lon_cell + _OFFSET)
+    keys, inverse = np.unique(key, return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(keys))
+    totals = np.bincount(inverse, weights=weapons, minlength=len(keys))
+    return keys, counts, totals
+
+
+def merge(parts):
+    """Combine :func:`partial` results of disjoint batches."""
+    keys = np.concatenate([part[0] for part in parts])
+    unique, inverse = np.unique(keys, return_inverse=True)
+    counts = np.bincount(inverse, weights=np.concatenate([part[1] for part in parts]), minlength=len(unique))
+    totals = np.bincount(inverse, weights=np.concatenate([part[2] for part in parts]), minlength=len(unique))
+    return unique, counts.astype(np.int64), totals
+
+
+def from_partial(keys, counts, totals, cell_deg=0.25):
+    """Lay out merged (month, cell) sums as a dense cube over occupied cells.
+
+    The cube spans the first to the last month; ingest clears dates outside
+    ``ingest.THEATRE_DATES``, so one stray year cannot inflate it.
+    """
+    if len(keys) == 0:
+        empty = np.empty((0, 0))
+        return TimeCube(np.array([], dtype="datetime64[M]"), np.empty(0), np.empty(0),
+                        empty.astype(np.int32), empty.astype(np.float32), cell_deg)
+
+    month = (keys >> (2 * _BITS)) - _OFFSET
+    cell_key = keys & ((1 << (2 * _BITS)) - 1)
+    cells, cell_index = np.unique(cell_key, return_inverse=True)
+    first = month.min()
+    n_months = int(month.max() - first) + 1
+
+    flat = (month - first) * len(cells) + cell_index.ravel()
+    size = n_months * len(cells)
+    cube_counts = np.bincount(flat, weights=counts, minlength=size).reshape(n_months, len(cells))
+    cube_totals = np.bincount(flat, weights=totals, minlength=size).reshape(n_months, len(cells))
+
+    cell_lat = ((cells >> _BITS) - _OFFSET + 0.5) * cell_deg
+    cell_lon = ((cells & _MASK) - _OFFSET + 0.5) * cell_deg
+    return TimeCube(
+        np.datetime64(int(first), "M") + np.arange(n_months),
+        cell_lat.astype(np.float32),
+        cell_lon.astype(np.float32),
+        cube_counts.astype(np.int32),
+        cube_totals.astype(np.float32),
+        cell_deg,
+    )
+
+
+def build(lat, lon, dates, weapons, cell_deg=0.25):
+    """Bin strikes into a (month x cell) cube; rows without a date are skipped."""
+    return from_partial(*partial(lat, lon, dates, weapons, cell_deg), cell_deg)
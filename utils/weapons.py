@@ -0,0 +1,158 @@
+"""Weapon catalog and the comparison charts of the Weapons page.
+
+The catalog (``data/weapons.json``) holds each weapon's specifications and
+yearly series, and the comparisons the page shows: which weapons, and which
+charts of them. :func:`compile_catalog` turns every comparison into
+Vega-Lite spec dicts once per catalog version (its sha256); the page keeps
+them cached and draws them with ``st.vega_lite_chart``, so Altair never runs
+on a rerun. A new
+comparison, chart or paragraph of its ``analysis`` (Markdown, one string per
+paragraph) is a catalog edit. Charts marked ``"draft": true`` stay hidden
+until their figures are confirmed.
+
+Chart types:
+
+* ``bars`` -- grouped bars of ``specs``. Each spec is scaled to its largest
+  value among the compared weapons, so kg, m and m/s share one axis. The
+  tooltip keeps the raw value.
+* ``bubble`` -- ``x`` against ``y``, sized by ``size``.
+* ``line`` -- each weapon's yearly ``series``.
+* ``pie`` -- each weapon's share of ``series`` in year ``at``.
+"""
+
+import hashlib
+import json
+import os
+
+import altair as alt
+import pandas as pd
+
+CATALOG_FILE = "data/weapons.json"
+
+_hashes = {}
+
+
+def catalog_hash(path=CATALOG_FILE):
+    mtime = os.stat(path).st_mtime_ns
+    if _hashes.get(path, (None,))[0] != mtime:
+        with open(path, "rb") as f:
+            _hashes[path] = (mtime, hashlib.sha256(f.read()).hexdigest())
+    return _hashes[path][1]
+
+
+def load_catalog(path=CATALOG_FILE):
+    with open(path) as f:
+        return json.load(f)
+
+
+def spec_title(catalog, key):
+    spec = catalog["specs"][key]
+    return f"{spec['label']} ({spec['unit']})"
+
+
+def bars(catalog, names, chart, label):
+    rows = []
+    for key in chart["specs"]:
+        values = {name: catalog["weapons"][name]["specs"].get(key) for name in names}
+        largest = max((abs(value) for value in values.values() if value is not None), default=0) or 1
+        for name, value in values.items():
+            if value is not None:
+                rows.append({"Spec": spec_title(catalog, key), "Weapon": name,
+                             "Value": value, "Relative": value / largest})
+    return (
+        alt.Chart(pd.DataFrame(rows), title=chart["title"])
+        .mark_bar()
+        .encode(
+            x=alt.X("Spec:N", sort=None, title="Specification"),
+            xOffset="Weapon:N",
+            y=alt.Y("Relative:Q", title="Share of the largest", axis=alt.Axis(format="%"), stack=None),
+            color=alt.Color("Weapon:N", scale=alt.Scale(scheme=chart.get("scheme", "tableau10")), title=label),
+            tooltip=["Weapon", "Spec", alt.Tooltip("Value:Q", format=",")],
+        )
+        .properties(width="container", height=300)
+    )
+
+
+def bubble(catalog, names, chart, label):
+    keys = [chart["x"], chart["y"], chart["size"]] + chart.get("tooltip", [])
+    df = pd.DataFrame([
+        {"Name": name, **{key: catalog["weapons"][name]["specs"].get(key) for key in keys}}
+        for name in names
+    ])
+    return (
+        alt.Chart(df, title=chart["title"])
+        .mark_circle()
+        .encode(
+            x=alt.X(f"{chart['x']}:Q", title=spec_title(catalog, chart["x"])),
+            y=alt.Y(f"{chart['y']}:Q", title=spec_title(catalog, chart["y"])),
+            size=alt.Size(f"{chart['size']}:Q", scale=alt.Scale(range=[100, 2000]),
+                          title=spec_title(catalog, chart["size"])),
+            color=alt.Color("Name:N", legend=alt.Legend(title=label)),
+            tooltip=["Name"] + [alt.Tooltip(f"{key}:Q", title=spec_title(catalog, key)) for key in keys],
+        )
+        .properties(width="container", height=300)
+    )
+
+
+def _series(catalog, name, chart):
+    return catalog["weapons"][name].get("series", {}).get(chart["series"], {})
+
+
+def line(catalog, names, chart, label):
+    df = pd.DataFrame([
+        {"Year": year, "Weapon": name, "Units": value}
+        for name in names
+        for year, value in _series(catalog, name, chart).items()
+    ])
+    return (
+        alt.Chart(df, title=chart["title"])
+        .mark_line(point=True)
+        .encode(
+            x=alt.X("Year:O", title=chart.get("x_title", "Year")),
+            y=alt.Y("Units:Q", title=chart.get("y_title", "Units")),
+            color=alt.Color("Weapon:N", scale=alt.Scale(scheme=chart.get("scheme", "tableau10")), title=label),
+            tooltip=["Year:O", "Weapon:N", "Units:Q"],
+        )
+        .properties(width="container", height=300)
+    )
+
+
+def pie(catalog, names, chart, label):
+    df = pd.DataFrame([{"Weapon": name, "Count": _series(catalog, name, chart).get(chart["at"], 0)} for name in names])
+    return (
+        alt.Chart(df, title=chart["title"])
+        .mark_arc()
+        .encode(
+            theta=alt.Theta("Count:Q"),
+            color=alt.Color("Weapon:N", scale=alt.Scale(scheme=chart.get("scheme", "tableau10")),
+                            legend=alt.Legend(title=label)),
+            tooltip=["Weapon", "Count"],
+        )
+        .properties(width="container", height=300)
+    )
+
+
+CHART_TYPES = {"bars": bars, "bubble": bubble, "line": line, "pie": pie}
+
+
+def compile_catalog(catalog, digest):
+    """Vega-Lite specs of every comparison, tagged with the catalog hash."""
+    sections = []
+    for comparison in catalog["comparisons"]:
+        unknown = [name for name in comparison["weapons"] if name not in catalog["weapons"]]
+        if unknown:
+            raise ValueError(f"{comparison['id']}: unknown weapons {', '.join(unknown)}")
+        charts = []
+        for chart in comparison["charts"]:
+            if chart.get("draft"):
+                continue
+            build = CHART_TYPES[chart["type"]]
+            spec = build(catalog, comparison["weapons"], chart, comparison["label"]).to_dict()
+            charts.append({"name": f"{comparison['id']} {chart['type']}", "spec": spec})
+        sections.append({
+            "id": comparison["id"],
+            "title": comparison["title"],
+            "charts": charts,
+            "analysis": "\n\n".join(comparison.get("analysis", [])),
+        })
+    return {"hash": digest, "sections": sections}